@@ -0,0 +1,91 @@
+# backend/app/alert_scheduler.py
+#
+# Verificação diária dos prazos de manutenção (30, 7 e 1 dia de antecedência).
+# Em vez de carregar todos os alertas futuros no ORM, cada prazo é um único
+# UPDATE ... WHERE due_date <= hoje + N AND NOT alert_sent_X RETURNING id, apoiado
+# por um índice parcial em (due_date) só com os alertas ainda não enviados
+# (migração 0007): o custo é proporcional aos alertas que disparam, não à tabela.
+# Roda como job do scheduler interno (scheduler.py), dividido em shards por condomínio;
+# as notificações dos alertas marcados vão para o outbox (notifications.py).
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, notifications
+from .scheduler import Job, scheduler
+
+ALERT_SCHEDULER_INTERVAL = float(os.getenv("ALERT_SCHEDULER_INTERVAL", "86400")) # Diário
+ALERT_SCHEDULER_SHARDS = int(os.getenv("ALERT_SCHEDULER_SHARDS", "4"))
+
+Alert = models.MaintenanceAlert
+
+# (nome, dias de antecedência, coluna do flag)
+ALERT_THRESHOLDS = (
+    ("1month", 30, Alert.alert_sent_1month),
+    ("1week", 7, Alert.alert_sent_1week),
+    ("1day", 1, Alert.alert_sent_1day),
+)
+
+
+async def mark_due_alerts(
+    db: AsyncSession,
+    today: Optional[date] = None,
+    shard: int = 0,
+    shards: int = 1,
+) -> Dict[str, List[int]]:
+    """Marca os alertas que atingiram cada prazo (na transação do chamador).
+
+    Retorna {prazo: [ids marcados agora]}. Um alerta a 1 dia do vencimento que ainda
+    não tinha disparado nada é marcado nos três prazos, como antes.
+    Com shards > 1, só os condomínios com condominium_id % shards == shard.
+    """
+    today = today or date.today()
+    now = datetime.utcnow()
+    fired = {}
+    for name, days, flag in ALERT_THRESHOLDS:
+        conditions = [
+            Alert.due_date >= today, # Alertas vencidos não disparam mais
+            Alert.due_date <= today + timedelta(days=days),
+            flag == False, # noqa: E712 (precisa casar com o predicado do índice parcial)
+        ]
+        if shards > 1:
+            conditions.append(func.coalesce(Alert.condominium_id, 0) % shards == shard)
+        result = await db.execute(
+            update(Alert)
+            .where(*conditions)
+            .values({flag: True, Alert.updated_at: now})
+            .returning(Alert.id)
+            .execution_options(synchronize_session=False)
+        )
+        fired[name] = list(result.scalars().all())
+    return fired
+
+
+def merge_fired(results: List[Dict[str, List[int]]]) -> Dict[str, List[int]]:
+    """Junta os ids marcados por cada shard."""
+    merged = {name: [] for name, _, _ in ALERT_THRESHOLDS}
+    for fired in results:
+        for name, ids in fired.items():
+            merged.setdefault(name, []).extend(ids)
+    return merged
+
+
+async def _run_shard(db: AsyncSession, shard: int, shards: int) -> Dict[str, List[int]]:
+    fired = await mark_due_alerts(db, shard=shard, shards=shards)
+    # A entrega fica com os workers de notificação (outbox na mesma transação)
+    await notifications.enqueue_alerts(db, fired)
+    return fired
+
+
+alerts_job = Job(
+    name="maintenance_alerts",
+    interval=ALERT_SCHEDULER_INTERVAL,
+    run_shard=_run_shard,
+    shards=ALERT_SCHEDULER_SHARDS,
+    merge=merge_fired,
+)
+scheduler.register(alerts_job)
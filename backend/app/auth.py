@@ -1,29 +1,111 @@
 import os
+from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from . import database, models, schemas
+from .core.security import password_hasher, PasswordHashingBusy
+from .core.cache import TTLCache, build_shared_backend
 
 SECRET_KEY = os.getenv("SECRET_KEY", "sua_chave_secreta_padrao_para_teste_local")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 180
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = password_hasher.context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# --- CACHE DE USUÁRIOS AUTENTICADOS ---
+# Evita o SELECT em users a cada request autenticado.
+# AUTH_CACHE_BACKEND_URL (ex: redis://...) liga um cache compartilhado entre workers;
+# nesse caso o cache local vira só uma camada curta (AUTH_CACHE_LOCAL_TTL) na frente dele.
+# invalidate_user() só alcança o processo atual e o backend compartilhado: com vários
+# workers (WEB_CONCURRENCY > 1, lido também pelo uvicorn/gunicorn) e sem backend
+# compartilhado, o TTL local cai para AUTH_CACHE_LOCAL_TTL, que passa a ser o atraso
+# máximo para os outros workers enxergarem mudança de role/condomínio ou usuário removido.
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_BACKEND_URL = os.getenv("AUTH_CACHE_BACKEND_URL")
+AUTH_CACHE_LOCAL_TTL = int(os.getenv("AUTH_CACHE_LOCAL_TTL", "5"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Usuário autenticado (não é um objeto ORM): campos de autorização + perfil de /users/me."""
+    id: int
+    role: Optional[str]
+    condominium_id: Optional[int]
+    email: Optional[str] = None
+    name: Optional[str] = None
+    phone: Optional[str] = None
+    photo_url: Optional[str] = None
+
+shared_principal_cache = build_shared_backend(AUTH_CACHE_BACKEND_URL)
+
+def _local_ttl() -> int:
+    if shared_principal_cache:
+        return min(AUTH_CACHE_TTL, AUTH_CACHE_LOCAL_TTL)
+    if WEB_CONCURRENCY > 1:
+        print(f"AVISO: {WEB_CONCURRENCY} workers sem AUTH_CACHE_BACKEND_URL: cache de usuários "
+              f"limitado a {AUTH_CACHE_LOCAL_TTL}s (invalidações não chegam aos outros workers).")
+        return min(AUTH_CACHE_TTL, AUTH_CACHE_LOCAL_TTL)
+    return AUTH_CACHE_TTL
+
+principal_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=_local_ttl())
+
+# Versão no prefixo: entradas gravadas com outro formato de UserPrincipal são ignoradas
+_SHARED_KEY = "principal:v2:"
+
+async def _get_cached_principal(email: str, issued_at: int) -> Optional[UserPrincipal]:
+    principal = principal_cache.get((email, issued_at))
+    if principal is None and shared_principal_cache:
+        data = await shared_principal_cache.get(f"{_SHARED_KEY}{email}")
+        if data:
+            principal = UserPrincipal(**data)
+            principal_cache.set((email, issued_at), principal)
+    return principal
+
+async def _cache_principal(email: str, issued_at: int, principal: UserPrincipal):
+    principal_cache.set((email, issued_at), principal)
+    if shared_principal_cache:
+        await shared_principal_cache.set(f"{_SHARED_KEY}{email}", asdict(principal), AUTH_CACHE_TTL)
+
+async def invalidate_user(email: str):
+    """Remove o usuário do cache (todas as sessões/tokens). Chamar após alterar role/condomínio."""
+    principal_cache.delete_where(lambda key: key[0] == email)
+    if shared_principal_cache:
+        await shared_principal_cache.delete(f"{_SHARED_KEY}{email}")
+
 def verify_password(plain_password, hashed_password):
-    # Trunca a senha *de entrada* (plain_password) para o limite do bcrypt
-    secure_password = plain_password[:72].encode('utf-8') if plain_password else b''
-    return pwd_context.verify(secure_password, hashed_password)
+    # Versão síncrona (scripts). As rotas usam verify_password_async.
+    valid, _ = password_hasher.verify_sync(plain_password, hashed_password)
+    return valid
 
 def get_password_hash(password):
-    # Trunca a senha *de entrada* para o limite e a codifica para bytes (bcrypt exige bytes)
-    secure_password = password[:72].encode('utf-8') if password else b''
-    return pwd_context.hash(secure_password)
+    # Versão síncrona (scripts). As rotas usam get_password_hash_async.
+    return password_hasher.hash_sync(password)
+
+_busy_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Servidor ocupado processando logins. Tente novamente em instantes.",
+    headers={"Retry-After": "1"},
+)
+
+async def verify_password_async(plain_password, hashed_password):
+    """Verifica a senha fora do event loop. Retorna (senha_ok, novo_hash_ou_None)."""
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except PasswordHashingBusy:
+        raise _busy_exception
+
+async def get_password_hash_async(password):
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHashingBusy:
+        raise _busy_exception
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -31,11 +113,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -48,10 +130,23 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == email).first()
+
+    issued_at = payload.get("iat", 0) # Tokens antigos não têm iat
+    principal = await _get_cached_principal(email, issued_at)
+    if principal is not None:
+        return principal
+
+    user = (await db.execute(
+        select(
+            models.User.id, models.User.role, models.User.condominium_id,
+            models.User.email, models.User.name, models.User.phone, models.User.photo_url,
+        ).where(models.User.email == email)
+    )).first()
     if user is None:
         raise credentials_exception
 
-    return user
+    principal = UserPrincipal(**user._asdict())
+    await _cache_principal(email, issued_at, principal)
+    return principal
 
 
@@ -0,0 +1,79 @@
+# backend/app/condominium_cache.py
+#
+# Cache das respostas de leitura de condomínios (tema white-label e listagem), que o app
+# pede a cada abertura/navegação e que mudam raramente.
+# - O corpo JSON já renderizado fica num LRU em memória (core.cache.TTLCache), com o ETag
+#   (hash do corpo). Em cache hit não há consulta ao banco nem serialização.
+# - If-None-Match igual ao ETag -> 304 sem corpo.
+# - Cache-Control: private (a resposta depende do usuário), max-age curto + revalidação.
+# - Criar/alterar condomínio invalida as entradas afetadas neste processo. Com vários
+#   workers, os outros processos enxergam a mudança em até CONDO_CACHE_TTL segundos.
+
+import hashlib
+import os
+from typing import Awaitable, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+
+from .core.cache import TTLCache
+
+CONDO_CACHE_TTL = int(os.getenv("CONDO_CACHE_TTL", "300"))
+CONDO_CACHE_SIZE = int(os.getenv("CONDO_CACHE_SIZE", "2048"))
+CONDO_CACHE_MAX_AGE = int(os.getenv("CONDO_CACHE_MAX_AGE", "60"))
+
+response_cache = TTLCache(maxsize=CONDO_CACHE_SIZE, ttl=CONDO_CACHE_TTL)
+
+CACHE_CONTROL = f"private, max-age={CONDO_CACHE_MAX_AGE}, must-revalidate"
+
+
+def condominium_key(condominium_id: int) -> tuple:
+    return ("condominium", condominium_id)
+
+
+ALL = "*" # Escopo da listagem completa (Programador)
+
+
+def list_key(scope) -> tuple:
+    """Listagem do usuário: ALL (Programador) ou o id do condomínio vinculado (pode ser None)."""
+    return ("list", scope)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Comparação fraca (RFC 9110): ignora o prefixo W/
+    candidates = (tag.strip() for tag in header.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+
+
+async def cached_response(request: Request, key: Hashable, load: Callable[[], Awaitable[bytes]]) -> Response:
+    """Resposta JSON de `key`: do cache ou de `load()` (que só roda em cache miss).
+
+    Erros de `load` (HTTPException 404 etc.) não são cacheados.
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        body = await load()
+        entry = (body, make_etag(body))
+        response_cache.set(key, entry)
+    body, etag = entry
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=_headers(etag))
+    return Response(content=body, media_type="application/json", headers=_headers(etag))
+
+
+def invalidate(condominium_id: Optional[int] = None):
+    """Descarta o condomínio alterado e todas as listagens (um condomínio novo entra na lista dos Programadores)."""
+    if condominium_id is not None:
+        response_cache.delete(condominium_key(condominium_id))
+    response_cache.delete_where(lambda key: key[0] == "list")
@@ -0,0 +1,161 @@
+# backend/app/core/security.py
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+# --- CUSTO DO BCRYPT ---
+# BCRYPT_ROUNDS fixa o custo (padrão do passlib = 12).
+# BCRYPT_TARGET_MS calibra o custo na subida do worker para que um hash leve ~N ms nesta máquina.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_TARGET_MS = os.getenv("BCRYPT_TARGET_MS")
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 15
+
+# --- POOL DE HASHING ---
+# O bcrypt libera o GIL, então threads bastam para tirá-lo do event loop.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+
+class PasswordHashingBusy(Exception):
+    """A fila de hashing está cheia (pico de logins); o cliente deve tentar novamente."""
+
+
+def calibrate_bcrypt_rounds(target_ms: float, probe_rounds: int = BCRYPT_MIN_ROUNDS) -> int:
+    """Mede um hash com probe_rounds e escolhe o custo cujo tempo fica mais próximo de target_ms.
+
+    Cada round a mais dobra o tempo do bcrypt, então basta um log2 sobre a medição.
+    """
+    probe = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=probe_rounds)
+    started = time.perf_counter()
+    probe.hash(b"calibration")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    rounds = probe_rounds + round(math.log2(max(target_ms, 1) / max(elapsed_ms, 0.001)))
+    return max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, rounds))
+
+
+def build_crypt_context(rounds: int) -> CryptContext:
+    # min/max iguais ao custo atual: o needs_update() marca hashes mais fracos OU mais caros
+    # que o configurado, e eles são refeitos no próximo login.
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def _truncate(password: Optional[str]) -> bytes:
+    # Trunca a senha para o limite do bcrypt (72 bytes) e a codifica (bcrypt exige bytes)
+    return password[:72].encode('utf-8') if password else b''
+
+
+class PasswordHasher:
+    """Executa hash/verify do bcrypt em um pool limitado de threads, com métricas de fila."""
+
+    def __init__(self, rounds: int, workers: int, max_queue: int):
+        self.rounds = rounds
+        self.context = build_crypt_context(rounds)
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0  # Submetidos e ainda não concluídos (fila + em execução)
+        self._running = 0
+        self._max_queue_depth = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    # --- Operações síncronas (executadas dentro do pool) ---
+    def hash_sync(self, password: str) -> str:
+        return self.context.hash(_truncate(password))
+
+    def verify_sync(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Retorna (senha_ok, novo_hash). novo_hash vem preenchido quando o custo do hash salvo
+        difere do configurado e deve ser regravado."""
+        secure_password = _truncate(password)
+        if not self.context.verify(secure_password, hashed):
+            return False, None
+        if self.context.needs_update(hashed):
+            with self._lock:
+                self._rehashed += 1
+            return True, self.context.hash(secure_password)
+        return True, None
+
+    # --- API assíncrona (usada pelas rotas) ---
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.hash_sync, password)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        return await self._submit(self.verify_sync, password, hashed)
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending - self._running >= self.max_queue:
+                self._rejected += 1
+                raise PasswordHashingBusy()
+            self._pending += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._pending - self._running)
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._run, submitted, fn, args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _run(self, submitted: float, fn, args):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._wait_total += started - submitted
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._run_total += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self._completed or 1
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "max_queue_depth": self._max_queue_depth,
+                "max_queue": self.max_queue,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "rehashed": self._rehashed,
+                "wait_avg_ms": round(self._wait_total * 1000 / done, 3),
+                "run_avg_ms": round(self._run_total * 1000 / done, 3),
+            }
+
+
+def _configured_rounds() -> int:
+    if BCRYPT_TARGET_MS:
+        rounds = calibrate_bcrypt_rounds(float(BCRYPT_TARGET_MS))
+        print(f"bcrypt calibrado: {rounds} rounds para ~{BCRYPT_TARGET_MS} ms")
+        return rounds
+    return BCRYPT_ROUNDS
+
+
+password_hasher = PasswordHasher(
+    rounds=_configured_rounds(),
+    workers=PASSWORD_HASH_WORKERS,
+    max_queue=PASSWORD_HASH_MAX_QUEUE,
+)
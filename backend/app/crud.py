@@ -1,13 +1,15 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, insert
 from . import models, schemas, auth
 from datetime import datetime
 from typing import Optional, List
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.User).where(models.User.email == email))
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = auth.get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    hashed_password = await auth.get_password_hash_async(user.password)
     db_user = models.User(
         email=user.email,
         name=user.name,
@@ -17,8 +19,8 @@ def create_user(db: Session, user: schemas.UserCreate):
         condominium_id=user.condominium_id
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 def create_inspection(db: Session, inspection: schemas.InspectionCreate, user_id: int):
@@ -56,7 +58,18 @@ def create_inspection(db: Session, inspection: schemas.InspectionCreate, user_id
     db.commit()
     return db_inspection
 
-def create_work_order(db: Session, title: str, description: str, item_id: int, provider_id: Optional[int] = None):
+async def item_condominium_id(db: AsyncSession, item_id: Optional[int]) -> Optional[int]:
+    """Condomínio do item de vistoria (itens antigos podem tê-lo só na vistoria)."""
+    if not item_id:
+        return None
+    return await db.scalar(
+        select(func.coalesce(models.InspectionItem.condominium_id, models.Inspection.condominium_id))
+        .select_from(models.InspectionItem)
+        .outerjoin(models.Inspection, models.Inspection.id == models.InspectionItem.inspection_id)
+        .where(models.InspectionItem.id == item_id)
+    )
+
+async def create_work_order(db: AsyncSession, title: str, description: str, item_id: int, provider_id: Optional[int] = None, condominium_id: Optional[int] = None):
     
     # 1. Checagem Defensiva (Embora item_id seja int, é bom garantir)
     if not item_id:
@@ -64,11 +77,14 @@ def create_work_order(db: Session, title: str, description: str, item_id: int, p
         print("ALERTA: Tentativa de criar OS sem item_id. Abortando.")
         return None 
         
-    # 2. Criação do Objeto
+    # 2. Criação do Objeto (o condomínio vem do item, se não for informado)
+    if condominium_id is None:
+        condominium_id = await item_condominium_id(db, item_id)
     db_wo = models.WorkOrder(
         title=title,
         description=description,
         item_id=item_id,
+        condominium_id=condominium_id,
         # O provider_id é opcional, mas se for passado como None, deve ser aceito pelo DB.
         provider_id=provider_id, 
         status="Pendente",
@@ -78,15 +94,45 @@ def create_work_order(db: Session, title: str, description: str, item_id: int, p
     # 3. Inserção
     try:
         db.add(db_wo)
-        db.flush() # Tenta inserir. Se falhar, a exceção ocorre aqui.
+        await db.flush() # Tenta inserir. Se falhar, a exceção ocorre aqui.
         print(f"SUCESSO: Criada OS ID {db_wo.id} para item {item_id}.")
         return db_wo
     except Exception as e:
         # Este bloco captura o erro de Foreign Key Violation (o real problema)
-        db.rollback() 
+        await db.rollback() 
         print(f"ERRO CRÍTICO NA CRIAÇÃO DA OS: {e}")
         # Lança uma exceção para o FastAPI retornar um erro 500 (temporariamente)
         raise e
 
+# --- INSERÇÃO EM LOTE (Vistorias com muitos itens) ---
+# Um INSERT multi-linha com RETURNING por tabela, em vez de um flush por item/OS.
+
+async def bulk_create_inspection_items(db: AsyncSession, items: List[dict]):
+    """Insere todos os itens de uma vez e devolve as linhas (id, name, status) criadas.
+
+    Não pedimos RETURNING ordenado: no SQLite isso faria o SQLAlchemy voltar a um INSERT por linha.
+    """
+    if not items:
+        return []
+    result = await db.execute(
+        insert(models.InspectionItem).returning(
+            models.InspectionItem.id, models.InspectionItem.name, models.InspectionItem.status
+        ),
+        items
+    )
+    return result.all()
+
+async def bulk_create_work_orders(db: AsyncSession, work_orders: List[dict]) -> List[int]:
+    """Insere as OSs geradas pela vistoria em lote (mesma transação dos itens)."""
+    if not work_orders:
+        return []
+    now = datetime.utcnow()
+    rows = [{"status": "Pendente", "created_at": now, "provider_id": None, "condominium_id": None, **wo} for wo in work_orders]
+    result = await db.execute(
+        insert(models.WorkOrder).returning(models.WorkOrder.id),
+        rows
+    )
+    return list(result.scalars().all())
+
 
 
@@ -0,0 +1,298 @@
+# backend/app/document_indexer.py
+#
+# Fila de indexação de documentos: o upload só grava o PDF em disco (spool) e
+# devolve o ID; a extração do texto (pool de processos) e a indexação de passagens
+# acontecem aqui, em background, atualizando Document.index_status.
+# Arquivos repetidos (mesmo SHA-256) não passam de novo pelo pypdf: o texto e os trechos
+# vêm do cache em document_contents.
+# Worker que cai no meio da extração deixa o documento em "processando": depois de
+# DOCUMENT_CLAIM_TIMEOUT segundos ele volta para "pendente" e para a fila (na subida e
+# pelo job "document_index_recovery" do scheduler).
+
+import asyncio
+import glob
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import or_, select, update
+from starlette.concurrency import run_in_threadpool
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import database, models, passages
+from .utils.pdf_extractor import extract_pages_parallel, join_pages
+from .scheduler import Job, scheduler
+from .utils.storage import StoredFile, iter_chunks, storage
+
+DOCUMENT_SPOOL_DIR = os.getenv("DOCUMENT_SPOOL_DIR", "spool")
+# Documentos processados ao mesmo tempo (cada um já usa várias páginas em paralelo)
+DOCUMENT_INDEX_CONCURRENCY = int(os.getenv("DOCUMENT_INDEX_CONCURRENCY", "2"))
+# "processando" há mais que isso = worker caiu no meio (maior que a extração mais longa esperada)
+DOCUMENT_CLAIM_TIMEOUT = float(os.getenv("DOCUMENT_CLAIM_TIMEOUT", "1800"))
+
+
+@dataclass
+class SpooledFile:
+    path: str
+    content_hash: str # SHA-256 (hex), calculado durante a cópia
+    size: int
+
+
+def spool_path(document_id: int) -> str:
+    return os.path.join(DOCUMENT_SPOOL_DIR, f"{document_id}.pdf")
+
+
+def content_key(content_hash: str) -> str:
+    """Chave do PDF no storage: uma por conteúdo, não por upload."""
+    return f"documents/{content_hash[:2]}/{content_hash}.pdf"
+
+
+def _copy_to_disk(src, path: str) -> SpooledFile:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as out:
+        for chunk in iter_chunks(src):
+            out.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+    return SpooledFile(path=path, content_hash=digest.hexdigest(), size=size)
+
+
+async def spool_upload(file: UploadFile) -> SpooledFile:
+    """Copia o upload para o disco em blocos (sem carregar o PDF inteiro na memória),
+    calculando o hash do conteúdo na mesma passada."""
+    path = os.path.join(DOCUMENT_SPOOL_DIR, f"{uuid.uuid4().hex}.part")
+    return await run_in_threadpool(_copy_to_disk, file.file, path)
+
+
+async def store_content(db: AsyncSession, spooled: SpooledFile) -> Tuple[str, Optional[StoredFile]]:
+    """Guarda o PDF no storage só se esse conteúdo ainda não estiver lá.
+
+    Retorna (URL, arquivo gravado agora ou None): se a transação do upload falhar, o
+    chamador remove o arquivo novo (ninguém mais o referencia).
+    """
+    existing = await db.scalar(
+        select(models.Document.file_path)
+        .where(models.Document.content_hash == spooled.content_hash, models.Document.file_path.is_not(None))
+        .limit(1)
+    )
+    if existing:
+        return existing, None
+    stored = await storage.save_path(content_key(spooled.content_hash), spooled.path, "application/pdf")
+    return stored.url, stored
+
+
+def discard_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def index_from_cache(db: AsyncSession, doc: models.Document, content: models.DocumentContent) -> int:
+    """Preenche o texto e indexa as passagens a partir do cache (sem pypdf), na transação do chamador."""
+    await db.flush() # Garante o doc.id
+    doc.content_text = join_pages(content.pages or [])
+    count = await passages.index_document(db, doc.id, doc.condominium_id, content.pages or [], content.chunks)
+    doc.index_status = "indexado"
+    doc.index_error = None
+    return count
+
+
+async def _cache_content(db: AsyncSession, content_hash: str, size: int, pages: list):
+    # Dois uploads simultâneos do mesmo arquivo novo: o segundo INSERT é ignorado
+    stmt = database.dialect_insert(models.DocumentContent).values(
+        content_hash=content_hash,
+        storage_key=content_key(content_hash),
+        size_bytes=size,
+        pages=pages,
+        chunks=[list(chunk) for chunk in passages.chunk_pages(pages)],
+    )
+    await db.execute(stmt.on_conflict_do_nothing(index_elements=["content_hash"]))
+
+
+def _stale_claim(now: datetime):
+    """"processando" sem dono vivo: claim mais antigo que o timeout (ou anterior à coluna)."""
+    return (models.Document.index_status == "processando") & or_(
+        models.Document.index_claimed_at.is_(None),
+        models.Document.index_claimed_at < now - timedelta(seconds=DOCUMENT_CLAIM_TIMEOUT),
+    )
+
+
+async def _claim(document_id: int) -> bool:
+    """pendente (ou processando abandonado) -> processando de forma atômica: com vários
+    workers, só um processa o documento."""
+    now = datetime.utcnow()
+    async with database.AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(models.Document)
+            .where(models.Document.id == document_id, or_(models.Document.index_status == "pendente", _stale_claim(now)))
+            .values(index_status="processando", index_claimed_at=now)
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+
+async def _set_status(document_id: int, status: str, error: Optional[str] = None):
+    async with database.AsyncSessionLocal() as db:
+        doc = await db.get(models.Document, document_id)
+        if doc:
+            doc.index_status = status
+            doc.index_error = error
+            await db.commit()
+
+
+async def process_document(document_id: int):
+    """Extrai o texto do PDF em spool, grava no Document e indexa as passagens."""
+    path = spool_path(document_id)
+    if not await _claim(document_id):
+        return
+    try:
+        async with database.AsyncSessionLocal() as db:
+            doc = await db.get(models.Document, document_id)
+            if doc is None:
+                return
+            content = await db.get(models.DocumentContent, doc.content_hash) if doc.content_hash else None
+            if content is None:
+                pages = await extract_pages_parallel(path)
+                if doc.content_hash:
+                    await _cache_content(db, doc.content_hash, os.path.getsize(path), pages)
+                    content = await db.get(models.DocumentContent, doc.content_hash)
+            if content is not None:
+                await index_from_cache(db, doc, content)
+            else:
+                # Documentos antigos (sem hash)
+                doc.content_text = join_pages(pages)
+                await passages.index_document(db, doc.id, doc.condominium_id, pages)
+                doc.index_status = "indexado"
+                doc.index_error = None
+            await db.commit()
+    except Exception as e:
+        print(f"ERRO NA INDEXAÇÃO DO DOCUMENTO {document_id}: {e}")
+        await _set_status(document_id, "erro", str(e)[:500])
+        return
+    # Só apaga o spool quando deu certo (permite reprocessar após um crash)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class DocumentIndexQueue:
+    """Fila em memória com um número fixo de consumidores no event loop."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+
+    def start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def enqueue(self, document_id: int):
+        self.start()
+        self._queue.put_nowait(document_id)
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _worker(self):
+        while True:
+            document_id = await self._queue.get()
+            try:
+                await process_document(document_id)
+            except Exception as e:
+                print(f"ERRO NA FILA DE INDEXAÇÃO (documento {document_id}): {e}")
+            finally:
+                self._queue.task_done()
+
+    async def requeue_unfinished(self):
+        """Na subida do worker: recoloca na fila documentos que ficaram pendentes ou presos em
+        "processando" (ex: deploy/crash no meio) e apaga spools órfãos."""
+        async with database.AsyncSessionLocal() as db:
+            ids = await recover_unfinished(db)
+            await db.commit()
+            unfinished = set(await db.scalars(
+                select(models.Document.id).where(models.Document.index_status.in_(["pendente", "processando"]))
+            ))
+        for document_id in ids:
+            self.enqueue(document_id)
+        await run_in_threadpool(_remove_orphan_spools, unfinished)
+
+
+async def recover_unfinished(db: AsyncSession) -> List[int]:
+    """Volta para "pendente" os "processando" abandonados e retorna os ids a (re)enfileirar.
+
+    Na transação do chamador. Sem o spool só dá para indexar o que já está no cache de
+    conteúdo; o resto vira "erro" (precisa de um novo upload).
+    """
+    now = datetime.utcnow()
+    await db.execute(
+        update(models.Document).where(_stale_claim(now)).values(index_status="pendente", index_claimed_at=None)
+    )
+    ids, lost = [], []
+    for document_id, cached in await db.execute(
+        select(models.Document.id, models.DocumentContent.content_hash)
+        .outerjoin(models.DocumentContent, models.DocumentContent.content_hash == models.Document.content_hash)
+        .where(models.Document.index_status == "pendente")
+    ):
+        (ids if cached or os.path.exists(spool_path(document_id)) else lost).append(document_id)
+    if lost:
+        await db.execute(
+            update(models.Document)
+            .where(models.Document.id.in_(lost), models.Document.index_status == "pendente")
+            .values(index_status="erro", index_error="Arquivo da indexação não encontrado; envie o documento de novo.")
+        )
+    return ids
+
+
+def _remove_orphan_spools(unfinished_ids: set):
+    """Apaga spools de uploads que morreram antes do commit (*.part) ou de documentos já resolvidos.
+
+    Uploads em andamento em outros workers também têm spool (e o documento pode ainda não
+    estar commitado): só arquivos mais antigos que o timeout entram.
+    """
+    cutoff = (datetime.now() - timedelta(seconds=DOCUMENT_CLAIM_TIMEOUT)).timestamp()
+    for path in glob.glob(os.path.join(DOCUMENT_SPOOL_DIR, "*")):
+        name = os.path.basename(path)
+        document_id = int(name[:-4]) if name.endswith(".pdf") and name[:-4].isdigit() else None
+        if document_id in unfinished_ids or not (name.endswith(".part") or document_id is not None):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                discard_file(path)
+        except FileNotFoundError:
+            pass
+
+
+index_queue = DocumentIndexQueue(DOCUMENT_INDEX_CONCURRENCY)
+
+
+async def _run_recovery(db: AsyncSession, shard: int, shards: int) -> Dict[str, int]:
+    # Enfileira no worker que roda o job; _claim aceita o "processando" abandonado mesmo
+    # que o consumidor chegue antes do commit do reset
+    ids = await recover_unfinished(db)
+    for document_id in ids:
+        index_queue.enqueue(document_id)
+    return {"requeued": len(ids)}
+
+
+recovery_job = Job(
+    name="document_index_recovery",
+    interval=DOCUMENT_CLAIM_TIMEOUT,
+    run_shard=_run_recovery,
+)
+scheduler.register(recovery_job)
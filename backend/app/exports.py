@@ -0,0 +1,92 @@
+# backend/app/exports.py
+#
+# Exportações em streaming (relatórios, sincronização com BI).
+# As linhas vêm de um cursor do lado do servidor (yield_per / stream_results) em lotes
+# de EXPORT_BATCH_SIZE e cada lote já sai como NDJSON ou CSV: a memória do worker não
+# cresce com o tamanho do histórico. `updated_since` permite sincronizações incrementais
+# (as linhas saem em ordem de updated_at, id).
+
+import csv
+import io
+import os
+from datetime import date, datetime
+from typing import AsyncIterator, List, Optional, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from sqlalchemy.sql import Select
+
+from . import auth, database
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def export_condominium_id(current_user: auth.UserPrincipal, condominium_id: Optional[int]) -> Optional[int]:
+    """Condomínio a exportar: Programadores escolhem (ou exportam todos, None); os demais só o seu.
+
+    Única regra de escopo de todas as exportações: usuário sem condomínio vinculado (e que
+    não é Programador) não exporta nada, em vez de cair no "todos".
+    """
+    if current_user.role == 'Programador':
+        return condominium_id
+    if current_user.condominium_id is None:
+        raise HTTPException(status_code=403, detail="Usuário sem condomínio vinculado não pode exportar dados.")
+    if condominium_id is not None and condominium_id != current_user.condominium_id:
+        raise HTTPException(status_code=403, detail="Não autorizado a exportar dados deste condomínio.")
+    return current_user.condominium_id
+
+
+async def _partitions(stmt: Select) -> AsyncIterator[Sequence]:
+    # Sessão própria: o stream continua depois que a rota retorna (e as dependências fecham)
+    async with database.AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+
+def incremental(stmt: Select, model, updated_since: Optional[datetime]) -> Select:
+    """Filtro de sincronização incremental + ordem estável (updated_at, id)."""
+    if updated_since is not None:
+        stmt = stmt.where(model.updated_at > updated_since)
+    return stmt.order_by(model.updated_at, model.id)
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+async def _ndjson(columns: List[str], stmt: Select) -> AsyncIterator[bytes]:
+    async for partition in _partitions(stmt):
+        yield b"".join(to_json(dict(zip(columns, row))) + b"\n" for row in partition)
+
+
+async def _csv(columns: List[str], stmt: Select) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for partition in _partitions(stmt):
+        writer.writerows([_csv_value(value) for value in row] for row in partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(stmt: Select, fmt: str, filename: str) -> StreamingResponse:
+    """StreamingResponse com as linhas de `stmt` (as colunas do SELECT viram os campos)."""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido. Use: {', '.join(EXPORT_FORMATS)}.")
+    columns = list(stmt.selected_columns.keys())
+    body = _ndjson(columns, stmt) if fmt == "ndjson" else _csv(columns, stmt)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
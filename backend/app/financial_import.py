@@ -0,0 +1,421 @@
+# backend/app/financial_import.py
+#
+# Importação em lote de extratos (CSV e OFX) para financial_records.
+# - O arquivo é lido em streaming (nada de carregar o extrato inteiro) e validado em
+#   lotes de IMPORT_BATCH_SIZE linhas; linhas inválidas são contadas e reportadas.
+# - Deduplicação: cada lançamento tem dedup_hash = SHA-256(data | valor com sinal |
+#   descrição normalizada | ocorrência). A ocorrência é a n-ésima linha igual dentro do
+#   arquivo: dois pagamentos idênticos no mesmo dia entram os dois, mas reimportar o
+#   mesmo extrato não duplica nada. A checagem usa o índice (condominium_id, dedup_hash).
+# - Carga: no PostgreSQL, COPY (asyncpg) para uma tabela temporária + um único
+#   INSERT ... SELECT ... WHERE NOT EXISTS por lote; nos outros bancos (SQLite nos
+#   testes), executemany. Os totais mensais (financial_rollup) vão na mesma transação.
+# - Progresso (linhas lidas, inseridas, duplicadas, inválidas, linhas/s) a cada lote.
+#
+# CLI (a partir de backend/):
+#     python -m app.financial_import extrato.ofx --condominium-id 1
+#     python -m app.financial_import lancamentos.csv --condominium-id 1 --category Água
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import io
+import os
+import re
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from . import database, financial_rollup, models
+from .money import to_cents
+from .utils.storage import iter_chunks
+
+Record = models.FinancialRecord
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+IMPORT_MAX_ERRORS = 100 # Erros detalhados no resultado (o total é sempre contado)
+IMPORT_FORMATS = ("csv", "ofx")
+
+INCOME, EXPENSE = financial_rollup.INCOME, financial_rollup.EXPENSE
+
+# Cabeçalhos aceitos no CSV (português ou inglês)
+CSV_COLUMNS = {
+    "date": ("data", "date", "dt", "data lançamento", "data lancamento"),
+    "description": ("descrição", "descricao", "description", "histórico", "historico", "memo"),
+    "amount": ("valor", "amount", "value"),
+    "type": ("tipo", "type"),
+    "category": ("categoria", "category"),
+}
+_TYPE_ALIASES = {
+    "receita": INCOME, "credito": INCOME, "crédito": INCOME, "c": INCOME, "credit": INCOME, "income": INCOME,
+    "despesa": EXPENSE, "debito": EXPENSE, "débito": EXPENSE, "d": EXPENSE, "debit": EXPENSE, "expense": EXPENSE,
+}
+
+
+# --- HASH DE DEDUPLICAÇÃO ---
+
+def normalize_description(description: Optional[str]) -> str:
+    return " ".join((description or "").split()).casefold()
+
+
+def record_hash(day: date, signed_cents: int, description: Optional[str], occurrence: int = 0) -> str:
+    key = f"{day.isoformat()}|{signed_cents}|{normalize_description(description)}|{occurrence}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _signed(cents: int, type_: str) -> int:
+    return -cents if type_ == EXPENSE else cents
+
+
+@event.listens_for(Record, "before_insert")
+def _fill_dedup_hash(mapper, connection, target):
+    # Lançamentos criados fora da importação também entram na deduplicação (ocorrência 0)
+    if target.dedup_hash is None and target.date is not None and target.amount_cents is not None:
+        target.dedup_hash = record_hash(target.date, _signed(target.amount_cents, target.type), target.description)
+
+
+# --- LEITURA (streaming) ---
+
+def open_text(binary) -> io.TextIOBase:
+    """Texto a partir do arquivo binário: UTF-8 (com ou sem BOM) ou, se não for, Windows-1252."""
+    head = binary.read(65536)
+    binary.seek(0)
+    try:
+        head.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # Um caractere multibyte cortado no fim do bloco não conta
+        encoding = "utf-8-sig" if e.start >= len(head) - 3 else "cp1252"
+    return io.TextIOWrapper(binary, encoding=encoding, errors="replace", newline="")
+
+
+def _parse_date(value: str) -> date:
+    value = value.strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%Y%m%d"):
+        try:
+            return datetime.strptime(value[:10] if fmt != "%Y%m%d" else value[:8], fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: {value!r}")
+
+
+def read_csv(stream: io.TextIOBase) -> Iterator[Tuple[int, dict]]:
+    """(número da linha, campos brutos) de um CSV com cabeçalho (separador , ou ;)."""
+    header_line = stream.readline()
+    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+    header = next(csv.reader([header_line], delimiter=delimiter))
+    names = [name.strip().casefold() for name in header]
+    columns = {}
+    for field_name, aliases in CSV_COLUMNS.items():
+        for index, name in enumerate(names):
+            if name in aliases:
+                columns[field_name] = index
+                break
+    missing = [name for name in ("date", "amount") if name not in columns]
+    if missing: # Erro de cabeçalho sai já na chamada, antes de começar a importar
+        raise ValueError(f"Colunas obrigatórias ausentes no CSV: {', '.join(missing)}")
+
+    def rows():
+        for line_number, row in enumerate(csv.reader(stream, delimiter=delimiter), start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            yield line_number, {
+                name: row[index] if index < len(row) else None for name, index in columns.items()
+            }
+    return rows()
+
+
+_OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.IGNORECASE | re.DOTALL)
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def read_ofx(stream: io.TextIOBase, chunk_size: int = 1 << 16) -> Iterator[Tuple[int, dict]]:
+    """(número da transação, campos brutos) de um OFX (SGML 1.x ou XML 2.x), lido em blocos."""
+    buffer = ""
+    number = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        last_end = 0
+        for match in _OFX_TRANSACTION.finditer(buffer):
+            number += 1
+            fields = {name.upper(): value.strip() for name, value in _OFX_FIELD.findall(match.group(1))}
+            last_end = match.end()
+            yield number, {
+                "date": fields.get("DTPOSTED"),
+                "description": fields.get("MEMO") or fields.get("NAME"),
+                "amount": fields.get("TRNAMT"),
+                "type": None,
+                "category": None,
+            }
+        buffer = buffer[last_end:]
+        if not chunk:
+            return
+
+
+def validate_row(raw: dict, default_category: Optional[str] = None) -> dict:
+    """Lançamento pronto para gravar (amount_cents positivo; o sinal vira o tipo)."""
+    if not raw.get("date"):
+        raise ValueError("Data ausente.")
+    if raw.get("amount") in (None, ""):
+        raise ValueError("Valor ausente.")
+    day = _parse_date(raw["date"])
+    cents = to_cents(raw["amount"])
+    type_ = _TYPE_ALIASES.get((raw.get("type") or "").strip().casefold())
+    if type_ is None:
+        type_ = EXPENSE if cents < 0 else INCOME
+    description = (raw.get("description") or "").strip() or None
+    return {
+        "date": day,
+        "description": description,
+        "amount_cents": abs(cents),
+        "type": type_,
+        "category": (raw.get("category") or "").strip() or default_category,
+    }
+
+
+# --- PROGRESSO ---
+
+@dataclass
+class ImportProgress:
+    rows_read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    elapsed_s: float = 0.0
+    rows_per_s: float = 0.0
+    done: bool = False
+    errors: List[dict] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# --- CARGA ---
+
+async def _existing_hashes(db: AsyncSession, condominium_id: int, hashes: List[str]) -> set:
+    found = set()
+    for start in range(0, len(hashes), 1000): # Limite de parâmetros do SQLite
+        found.update((await db.execute(
+            select(Record.dedup_hash).where(
+                Record.condominium_id == condominium_id, Record.dedup_hash.in_(hashes[start:start + 1000])
+            )
+        )).scalars())
+    return found
+
+
+async def _copy_batch(db: AsyncSession, rows: List[dict]) -> List[dict]:
+    """PostgreSQL: COPY para uma tabela temporária + INSERT ... SELECT dos que ainda não existem."""
+    columns = ["condominium_id", "date", "description", "amount_cents", "amount", "type", "category", "dedup_hash"]
+    await db.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS financial_import_staging "
+        "(LIKE financial_records INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+    ))
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        "financial_import_staging",
+        records=[tuple(row[column] for column in columns) for row in rows],
+        columns=columns,
+    )
+    column_list = ", ".join(columns)
+    inserted = await db.execute(text(
+        f"INSERT INTO financial_records ({column_list}, updated_at) "
+        f"SELECT {', '.join('s.' + c for c in columns)}, now() AT TIME ZONE 'utc' "
+        "FROM financial_import_staging s WHERE NOT EXISTS ("
+        "SELECT 1 FROM financial_records f WHERE f.condominium_id = s.condominium_id AND f.dedup_hash = s.dedup_hash) "
+        "RETURNING condominium_id, date, type, amount_cents"
+    ))
+    return [dict(row._mapping) for row in inserted]
+
+
+async def _insert_batch(db: AsyncSession, condominium_id: int, rows: List[dict]) -> List[dict]:
+    """Grava os lançamentos novos do lote e devolve os que entraram."""
+    existing = await _existing_hashes(db, condominium_id, [row["dedup_hash"] for row in rows])
+    rows = [row for row in rows if row["dedup_hash"] not in existing]
+    if not rows:
+        return []
+    if not database.IS_SQLITE:
+        return await _copy_batch(db, rows)
+    now = datetime.utcnow()
+    await db.execute(Record.__table__.insert(), [dict(row, updated_at=now) for row in rows])
+    return rows
+
+
+async def import_batches(
+    db: AsyncSession,
+    condominium_id: int,
+    rows: Iterator[Tuple[int, dict]],
+    default_category: Optional[str] = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> AsyncIterator[ImportProgress]:
+    """Importa os lançamentos de `rows` (read_csv/read_ofx), com um commit por lote.
+
+    Gera o progresso acumulado depois de cada lote; o último tem done=True.
+    """
+    progress = ImportProgress()
+    started = time.perf_counter()
+    occurrences: Dict[Tuple[date, int, str], int] = {}
+
+    def next_batch() -> List[dict]:
+        # Leitura + validação do lote (CPU): roda fora do event loop
+        batch = []
+        for line_number, raw in rows:
+            progress.rows_read += 1
+            try:
+                row = validate_row(raw, default_category)
+            except ValueError as e:
+                progress.invalid += 1
+                if len(progress.errors) < IMPORT_MAX_ERRORS:
+                    progress.errors.append({"line": line_number, "error": str(e)})
+                continue
+            signed = _signed(row["amount_cents"], row["type"])
+            key = (row["date"], signed, normalize_description(row["description"]))
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+            row.update(
+                condominium_id=condominium_id,
+                amount=row["amount_cents"] / 100,
+                dedup_hash=record_hash(row["date"], signed, row["description"], occurrence),
+            )
+            batch.append(row)
+            if len(batch) >= batch_size:
+                break
+        return batch
+
+    while True:
+        read_before = progress.rows_read
+        batch = await run_in_threadpool(next_batch)
+        if not batch and progress.rows_read == read_before:
+            break
+        if batch:
+            inserted = await _insert_batch(db, condominium_id, batch)
+            await financial_rollup.apply_deltas(db, financial_rollup.deltas_for(inserted))
+            await db.commit()
+            progress.inserted += len(inserted)
+            progress.duplicates += len(batch) - len(inserted)
+        _tick(progress, started)
+        yield progress
+
+    progress.done = True
+    _tick(progress, started)
+    yield progress
+
+
+def _tick(progress: ImportProgress, started: float):
+    progress.elapsed_s = round(time.perf_counter() - started, 3)
+    progress.rows_per_s = round(progress.rows_read / progress.elapsed_s, 1) if progress.elapsed_s else 0.0
+
+
+async def import_records(
+    db: AsyncSession,
+    condominium_id: int,
+    rows: Iterator[Tuple[int, dict]],
+    default_category: Optional[str] = None,
+    on_progress: Optional[Callable[[ImportProgress], None]] = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> ImportProgress:
+    """import_batches até o fim, chamando on_progress a cada lote. Retorna o resultado final."""
+    async for progress in import_batches(db, condominium_id, rows, default_category, batch_size):
+        if on_progress is not None and not progress.done:
+            on_progress(progress)
+    return progress
+
+
+def detect_format(filename: Optional[str], fmt: Optional[str] = None) -> str:
+    fmt = (fmt or os.path.splitext(filename or "")[1].lstrip(".")).lower()
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Formato inválido. Use: {', '.join(IMPORT_FORMATS)}.")
+    return fmt
+
+
+def read_file(binary, fmt: str) -> Iterator[Tuple[int, dict]]:
+    stream = open_text(binary)
+    return read_csv(stream) if fmt == "csv" else read_ofx(stream)
+
+
+def _copy_to_temp(src) -> BinaryIO:
+    out = tempfile.TemporaryFile(prefix="import-", suffix=".part")
+    try:
+        for chunk in iter_chunks(src):
+            out.write(chunk)
+        out.seek(0)
+    except BaseException:
+        out.close()
+        raise
+    return out
+
+
+async def spool_upload(file) -> BinaryIO:
+    """Copia o upload (UploadFile) para um arquivo temporário anônimo, em blocos, e o devolve aberto.
+
+    O arquivo não tem nome para ser apagado depois: some quando é fechado (ou coletado),
+    mesmo que a resposta em streaming nunca chegue a ser iterada.
+    """
+    return await run_in_threadpool(_copy_to_temp, file.file)
+
+
+# --- BACKFILL (migração 0011) ---
+
+def backfill_hashes(conn):
+    """Calcula dedup_hash dos lançamentos existentes (ocorrência na ordem de id)."""
+    table = Record.__table__
+    occurrences: Dict[tuple, int] = {}
+    updates = []
+    rows = conn.execute(
+        select(table.c.id, table.c.condominium_id, table.c.date, table.c.amount_cents, table.c.type, table.c.description)
+        .where(table.c.date.isnot(None), table.c.amount_cents.isnot(None))
+        .order_by(table.c.id)
+    )
+    for row in rows:
+        signed = _signed(row.amount_cents, row.type)
+        key = (row.condominium_id, row.date, signed, normalize_description(row.description))
+        occurrence = occurrences.get(key, 0)
+        occurrences[key] = occurrence + 1
+        updates.append({"record_id": row.id, "hash": record_hash(row.date, signed, row.description, occurrence)})
+    if updates:
+        conn.execute(
+            table.update().where(table.c.id == bindparam("record_id")).values(dedup_hash=bindparam("hash")),
+            updates,
+        )
+
+
+# --- CLI ---
+
+def _print_progress(progress: ImportProgress):
+    print(
+        f"{progress.rows_read} linhas | {progress.inserted} inseridas | {progress.duplicates} duplicadas | "
+        f"{progress.invalid} inválidas | {progress.rows_per_s:.0f} linhas/s",
+        flush=True,
+    )
+
+
+async def _main(args):
+    fmt = detect_format(args.path, args.format)
+    with open(args.path, "rb") as binary:
+        async with database.AsyncSessionLocal() as db:
+            result = await import_records(
+                db, args.condominium_id, read_file(binary, fmt), args.category,
+                on_progress=_print_progress, batch_size=args.batch_size,
+            )
+    _print_progress(result)
+    for error in result.errors:
+        print(f"  linha {error['line']}: {error['error']}")
+    print(f"Concluído em {result.elapsed_s:.1f}s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa um extrato (CSV/OFX) para financial_records.")
+    parser.add_argument("path")
+    parser.add_argument("--condominium-id", type=int, required=True)
+    parser.add_argument("--format", choices=IMPORT_FORMATS)
+    parser.add_argument("--category", help="Categoria dos lançamentos sem categoria")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,170 @@
+# backend/app/financial_reports.py
+#
+# Relatórios financeiros por período (mês, trimestre, ano) para vários condomínios de uma vez.
+# Os lançamentos vêm do banco em lotes, direto para arrays NumPy por coluna (condomínio,
+# índice do mês, valor com sinal em centavos, categoria): nada de um objeto ORM por linha.
+# As agregações são vetorizadas (ordenação + np.add.reduceat em int64), então os totais
+# são exatos em centavos, inclusive saldo acumulado e quebra por categoria.
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import Integer, case, cast, extract, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+Record = models.FinancialRecord
+
+REPORT_BATCH_SIZE = 50_000
+PERIODS = ("month", "quarter", "year")
+NO_CATEGORY = "Sem categoria"
+
+# Despesas entram negativas; o resto (Receita) positivo
+_SIGNED_CENTS = case((Record.type == "Despesa", -Record.amount_cents), else_=Record.amount_cents)
+# Mês como inteiro (ano * 12 + mês - 1): agrupa sem datas em Python
+_MONTH_INDEX = cast(extract("year", Record.date), Integer) * 12 + cast(extract("month", Record.date), Integer) - 1
+
+
+def _period_index(month_index: np.ndarray, period: str) -> np.ndarray:
+    if period == "month":
+        return month_index
+    if period == "quarter":
+        return month_index // 3
+    return month_index // 12
+
+
+def _period_label(index: int, period: str) -> str:
+    if period == "month":
+        return f"{index // 12:04d}-{index % 12 + 1:02d}"
+    if period == "quarter":
+        return f"{index // 4:04d}-T{index % 4 + 1}"
+    return f"{index:04d}"
+
+
+def _group_sums(keys: List[np.ndarray], values: List[np.ndarray]):
+    """Soma `values` por combinação de `keys` (ordenação lexicográfica + reduceat, tudo int64).
+
+    Retorna (chaves de cada grupo, somas de cada valor, tamanho de cada grupo).
+    """
+    order = np.lexsort(keys[::-1]) # lexsort ordena pela última chave primeiro
+    sorted_keys = [key[order] for key in keys]
+    change = np.zeros(len(order), dtype=bool)
+    if len(order):
+        change[0] = True
+        for key in sorted_keys:
+            change[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(change)
+    sums = [np.add.reduceat(value[order], starts) if len(starts) else value[:0] for value in values]
+    counts = np.diff(np.append(starts, len(order)))
+    return [key[starts] for key in sorted_keys], sums, counts
+
+
+@dataclass
+class Ledger:
+    """Lançamentos em colunas (arrays de mesmo tamanho)."""
+    condominium_id: np.ndarray # int64
+    month_index: np.ndarray # int64, ano * 12 + mês - 1
+    cents: np.ndarray # int64, com sinal (despesa < 0)
+    category: np.ndarray # int64, índice em `categories`
+    categories: List[str]
+
+    def __len__(self):
+        return len(self.cents)
+
+    @classmethod
+    def from_columns(cls, condominium_id, month_index, cents, category_codes, categories) -> "Ledger":
+        return cls(
+            condominium_id=np.asarray(condominium_id, dtype=np.int64),
+            month_index=np.asarray(month_index, dtype=np.int64),
+            cents=np.asarray(cents, dtype=np.int64),
+            category=np.asarray(category_codes, dtype=np.int64),
+            categories=list(categories),
+        )
+
+    def balances(self, period: str = "month") -> List[dict]:
+        """Receita, despesa, saldo e saldo acumulado por (condomínio, período), em centavos."""
+        if period not in PERIODS:
+            raise ValueError(f"Período inválido: {period}")
+        income = np.where(self.cents > 0, self.cents, 0)
+        expense = np.where(self.cents < 0, -self.cents, 0)
+        (condos, periods), (income, expense, balance), counts = _group_sums(
+            [self.condominium_id, _period_index(self.month_index, period)],
+            [income, expense, self.cents],
+        )
+        # Saldo acumulado por condomínio: cumsum geral menos o acumulado até o início de cada condomínio
+        running = np.cumsum(balance)
+        first = np.ones(len(condos), dtype=bool)
+        first[1:] = condos[1:] != condos[:-1]
+        group_start = np.maximum.accumulate(np.where(first, np.arange(len(condos)), 0))
+        offset = np.where(group_start > 0, running[group_start - 1], 0)
+        running = running - offset
+        return [
+            {
+                "condominium_id": int(condos[i]),
+                "period": _period_label(int(periods[i]), period),
+                "income_cents": int(income[i]),
+                "expense_cents": int(expense[i]),
+                "balance_cents": int(balance[i]),
+                "running_balance_cents": int(running[i]),
+                "records": int(counts[i]),
+            }
+            for i in range(len(condos))
+        ]
+
+    def by_category(self) -> List[dict]:
+        """Receita e despesa por (condomínio, categoria), em centavos."""
+        income = np.where(self.cents > 0, self.cents, 0)
+        expense = np.where(self.cents < 0, -self.cents, 0)
+        (condos, categories), (income, expense), counts = _group_sums(
+            [self.condominium_id, self.category], [income, expense]
+        )
+        return [
+            {
+                "condominium_id": int(condos[i]),
+                "category": self.categories[int(categories[i])],
+                "income_cents": int(income[i]),
+                "expense_cents": int(expense[i]),
+                "records": int(counts[i]),
+            }
+            for i in range(len(condos))
+        ]
+
+
+async def load_ledger(
+    db: AsyncSession,
+    condominium_ids: Optional[Iterable[int]] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> Ledger:
+    """Lê os lançamentos (de todos os condomínios ou dos informados) em lotes, direto para arrays."""
+    stmt = select(Record.condominium_id, _MONTH_INDEX, _SIGNED_CENTS, Record.category).where(
+        Record.condominium_id.isnot(None), Record.date.isnot(None), Record.amount_cents.isnot(None)
+    )
+    if condominium_ids is not None:
+        stmt = stmt.where(Record.condominium_id.in_(list(condominium_ids)))
+    if start is not None:
+        stmt = stmt.where(Record.date >= start)
+    if end is not None:
+        stmt = stmt.where(Record.date <= end)
+
+    condos, months, cents, codes = [], [], [], []
+    category_codes: Dict[Optional[str], int] = {}
+    result = await db.stream(stmt.execution_options(yield_per=REPORT_BATCH_SIZE))
+    async for partition in result.partitions():
+        columns = list(zip(*partition))
+        condos.append(np.fromiter(columns[0], dtype=np.int64, count=len(partition)))
+        months.append(np.fromiter(columns[1], dtype=np.int64, count=len(partition)))
+        cents.append(np.fromiter(columns[2], dtype=np.int64, count=len(partition)))
+        # Poucas categorias distintas: o dict de códigos fica pequeno
+        codes.append(np.fromiter(
+            (category_codes.setdefault(name or NO_CATEGORY, len(category_codes)) for name in columns[3]),
+            dtype=np.int64, count=len(partition),
+        ))
+
+    def concat(parts):
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    return Ledger.from_columns(concat(condos), concat(months), concat(cents), concat(codes), list(category_codes))
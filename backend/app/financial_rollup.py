@@ -0,0 +1,214 @@
+# backend/app/financial_rollup.py
+#
+# Totais mensais pré-agregados por (condomínio, mês, tipo) para o dashboard financeiro,
+# em centavos inteiros (ver money.py): somas exatas, sem erro acumulado de float.
+# - Manutenção incremental: um listener de after_flush em toda Session do ORM transforma
+#   os FinancialRecord inseridos/alterados/removidos em deltas e aplica com um único
+#   upsert (total = total + delta), na mesma transação do lançamento.
+# - Escritas fora do ORM (UPDATE/INSERT em lote, importação) devem chamar
+#   apply_deltas() ou rebuild() para os condomínios afetados.
+# - rebuild() (ou `python -m app.financial_rollup`) recalcula tudo a partir de
+#   financial_records; a migração 0009 faz a carga inicial.
+# - /financial/dashboard-stats lê só as linhas dos meses pedidos: O(meses).
+
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, cast, delete, event, func, inspect, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import database, models
+
+Record = models.FinancialRecord
+Rollup = models.FinancialMonthlyRollup
+
+INCOME, EXPENSE = "Receita", "Despesa"
+
+_TRACKED = ("condominium_id", "date", "type", "amount_cents")
+
+# (condominium_id, mês, tipo) -> [delta do total em centavos, delta de registros]
+Deltas = Dict[Tuple[int, date, str], List[int]]
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_of(column):
+    """Primeiro dia do mês de `column`, no SQL do dialeto em uso."""
+    if database.IS_SQLITE:
+        return func.date(column, "start of month")
+    return cast(func.date_trunc("month", column), Date)
+
+
+def _add(deltas: Deltas, values: dict, sign: int):
+    if values["condominium_id"] is None or values["date"] is None or values["type"] is None:
+        return
+    key = (values["condominium_id"], month_start(values["date"]), values["type"])
+    delta = deltas.setdefault(key, [0, 0])
+    delta[0] += sign * (values["amount_cents"] or 0)
+    delta[1] += sign
+
+
+def _old_values(state) -> Optional[dict]:
+    """Valores de antes do flush (None se algum não estava carregado: aí só um rebuild resolve)."""
+    values = {}
+    for attr in _TRACKED:
+        history = state.attrs[attr].history
+        if history.deleted:
+            values[attr] = history.deleted[0]
+        elif history.unchanged:
+            values[attr] = history.unchanged[0]
+        elif history.added:
+            return None
+        else:
+            values[attr] = None
+    return values
+
+
+def _changed(state) -> bool:
+    return any(state.attrs[attr].history.has_changes() for attr in _TRACKED)
+
+
+def apply_deltas_sync(conn, deltas: Deltas):
+    """Soma os deltas nos totais (upsert), numa conexão síncrona."""
+    rows = [
+        {"condominium_id": cid, "month": month, "type": type_, "total_cents": total, "total": total / 100, "records": records}
+        for (cid, month, type_), (total, records) in deltas.items() if total or records
+    ]
+    if not rows:
+        return
+    stmt = database.dialect_insert(Rollup.__table__).values(rows)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=["condominium_id", "month", "type"],
+        set_={
+            "total_cents": Rollup.total_cents + stmt.excluded.total_cents,
+            "total": (Rollup.total_cents + stmt.excluded.total_cents) / 100.0,
+            "records": Rollup.records + stmt.excluded.records,
+        },
+    ))
+
+
+async def apply_deltas(db: AsyncSession, deltas: Deltas):
+    await db.run_sync(lambda session: apply_deltas_sync(session.connection(), deltas))
+
+
+def deltas_for(records: Iterable[dict]) -> Deltas:
+    """Deltas de inserção de lançamentos (dicts com condominium_id, date, type e amount_cents)."""
+    deltas: Deltas = {}
+    for values in records:
+        _add(deltas, values, +1)
+    return deltas
+
+
+def rebuild_statements(condominium_ids: Optional[Iterable[int]] = None) -> list:
+    """DELETE + INSERT ... SELECT que recalculam os totais (de todos ou de alguns condomínios)."""
+    month = _month_of(Record.date)
+    source = select(
+        Record.condominium_id, month, Record.type, func.sum(Record.amount_cents),
+        func.sum(Record.amount_cents) / 100.0, func.count()
+    ).where(
+        Record.condominium_id.isnot(None), Record.date.isnot(None), Record.type.isnot(None)
+    ).group_by(Record.condominium_id, month, Record.type)
+    clear = delete(Rollup)
+    if condominium_ids is not None:
+        condominium_ids = list(condominium_ids)
+        source = source.where(Record.condominium_id.in_(condominium_ids))
+        clear = clear.where(Rollup.condominium_id.in_(condominium_ids))
+    fill = insert(Rollup).from_select(["condominium_id", "month", "type", "total_cents", "total", "records"], source)
+    return [clear, fill]
+
+
+async def rebuild(db: AsyncSession, condominium_ids: Optional[Iterable[int]] = None):
+    """Recalcula os totais em lote (na transação do chamador)."""
+    for statement in rebuild_statements(condominium_ids):
+        await db.execute(statement)
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_rollup(session: Session, flush_context):
+    # No after_flush, new/dirty/deleted e o histórico dos atributos ainda são os de antes do flush
+    deltas: Deltas = {}
+    stale = set()
+    for obj in session.new:
+        if isinstance(obj, Record):
+            _add(deltas, {attr: getattr(obj, attr) for attr in _TRACKED}, +1)
+    for obj in session.dirty:
+        if isinstance(obj, Record) and obj not in session.deleted:
+            state = inspect(obj)
+            if not _changed(state):
+                continue
+            old = _old_values(state)
+            if old is None:
+                stale.add(obj.condominium_id)
+                stale.update(state.attrs.condominium_id.history.deleted)
+                continue
+            _add(deltas, old, -1)
+            _add(deltas, {attr: getattr(obj, attr) for attr in _TRACKED}, +1)
+    for obj in session.deleted:
+        if isinstance(obj, Record):
+            old = _old_values(inspect(obj))
+            if old is None:
+                stale.add(obj.condominium_id)
+            else:
+                _add(deltas, old, -1)
+    if not deltas and not stale:
+        return
+    conn = session.connection()
+    apply_deltas_sync(conn, deltas)
+    stale.discard(None)
+    if stale:
+        for statement in rebuild_statements(stale):
+            conn.execute(statement)
+
+
+# --- LEITURA (dashboard) ---
+
+async def monthly_totals(
+    db: AsyncSession, condominium_id: int, first_month: date, last_month: date
+) -> Dict[date, Dict[str, int]]:
+    """{mês: {tipo: total em centavos}} dos meses entre first_month e last_month (inclusive)."""
+    rows = await db.execute(
+        select(Rollup.month, Rollup.type, Rollup.total_cents).where(
+            Rollup.condominium_id == condominium_id,
+            Rollup.month >= first_month,
+            Rollup.month <= last_month,
+        )
+    )
+    totals: Dict[date, Dict[str, int]] = {}
+    for month, type_, total in rows:
+        totals.setdefault(month, {})[type_] = total or 0
+    return totals
+
+
+def chart_data(totals: Dict[date, Dict[str, int]], first_month: date, months: int) -> List[dict]:
+    """Série mensal pronta para o gráfico (meses sem lançamentos entram zerados).
+
+    As contas são em centavos; os valores em reais só são gerados na saída.
+    """
+    data = []
+    for offset in range(months):
+        month = add_months(first_month, offset)
+        income = totals.get(month, {}).get(INCOME, 0)
+        expense = totals.get(month, {}).get(EXPENSE, 0)
+        data.append({
+            "month": f"{month:%Y-%m}",
+            "income": income / 100,
+            "expense": expense / 100,
+            "balance": (income - expense) / 100,
+        })
+    return data
+
+
+if __name__ == "__main__":
+    # Recalcula todos os totais: python -m app.financial_rollup
+    with database.engine.begin() as conn:
+        for statement in rebuild_statements():
+            conn.execute(statement)
+    print("Totais mensais financeiros recalculados.")
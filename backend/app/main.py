@@ -1,13 +1,21 @@
 from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from typing import List
-from .routers import documents, financial, work_orders, condominiums, users, condominium, alerts
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Optional
+from datetime import datetime
+from contextlib import asynccontextmanager
+from .routers import documents, financial, work_orders, condominiums, users, alerts
 
 import json
 # Importações internas
-from . import models, schemas, crud, database, auth
+from . import models, schemas, crud, database, auth, exports, condominium_cache, route_check, query_budget
+from .utils.storage import store_uploads, delete_stored
+from .utils.pdf_extractor import shutdown_pdf_pool
+from .document_indexer import index_queue
+from .scheduler import scheduler
+from .notifications import dispatcher
 
 # --- NOVAS IMPORTAÇÕES (ROUTERS) ---
 # Importamos os arquivos que criamos nas pastas 'routers'
@@ -15,7 +23,29 @@ from . import models, schemas, crud, database, auth
 
 # Cria tabelas no banco (apenas para dev)
 #models.Base.metadata.create_all(bind=database.engine)
-app = FastAPI(title="CondoManager API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Rotas registradas depois de outra que já casa com o mesmo caminho nunca são alcançadas
+    route_check.check_routes(app.routes)
+    # Subida: retoma documentos que ficaram pendentes de indexação
+    try:
+        await index_queue.requeue_unfinished()
+    except Exception as e:
+        print(f"Falha ao retomar a fila de indexação: {e}")
+    # Scheduler interno (só o worker que pegar o lock executa os jobs; execuções
+    # interrompidas são retomadas no primeiro tick)
+    scheduler.start()
+    # Workers do outbox de notificações (rodam em todos os processos)
+    dispatcher.start()
+    yield
+    # Desligamento: para o scheduler, as filas e o pool de processos do pypdf
+    await scheduler.stop()
+    await dispatcher.stop()
+    await index_queue.stop()
+    shutdown_pdf_pool()
+
+app = FastAPI(title="CondoManager API", lifespan=lifespan)
 
 # Configuração de CORS
 app.add_middleware(
@@ -26,6 +56,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Orçamento de comandos SQL por request (desenvolvimento/testes; ver query_budget.py)
+if query_budget.QUERY_BUDGET_MODE != "off":
+    query_budget.install(database.engine, database.async_engine.sync_engine)
+    app.add_middleware(query_budget.QueryBudgetMiddleware)
+
 # --- REGISTRO DOS ROUTERS ---
 # É aqui que "ligamos" os novos módulos ao app principal
 app.include_router(documents.router)
@@ -33,7 +68,6 @@ app.include_router(financial.router)
 app.include_router(work_orders.router)
 app.include_router(condominiums.router)
 app.include_router(users.router)
-app.include_router(condominium.router)
 app.include_router(alerts.router)
 # ----------------------------
 
@@ -41,29 +75,75 @@ app.include_router(alerts.router)
 # --- ROTAS DE AUTENTICAÇÃO (Mantidas no main por simplicidade, ou movidas para auth.py) ---
 
 @app.post("/token", response_model=schemas.Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = crud.get_user_by_email(db, form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.password_hash):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(database.get_db)):
+    user = await crud.get_user_by_email(db, form_data.username)
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await auth.verify_password_async(form_data.password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Custo do bcrypt mudou (BCRYPT_ROUNDS/BCRYPT_TARGET_MS): regrava o hash de forma transparente
+        user.password_hash = new_hash
+        await db.commit()
     access_token = auth.create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/users/", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_db)):
+    db_user = await crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    return await crud.create_user(db=db, user=user)
+
+# --- MÉTRICAS INTERNAS (Dimensionamento do pool por worker) ---
+# Mesmo acesso do /alerts/run-scheduler: X-Scheduler-Token (coletor de métricas) ou Programador
+@app.get("/internal/metrics", include_in_schema=False)
+def internal_metrics(_: None = Depends(alerts.require_scheduler_access)):
+    return {
+        "db_pool": database.get_pool_stats(),
+        "password_hashing": auth.password_hasher.stats(),
+        "document_index_queue": {"pending": index_queue.pending()},
+        "scheduler": scheduler.stats(),
+        "notifications": dispatcher.snapshot(),
+        "condominium_cache": condominium_cache.response_cache.stats(),
+        "query_budget": query_budget.stats.snapshot(),
+    }
 
 # --- OUTRAS ROTAS ANTIGAS ---
 # Se você tiver rotas soltas de Vistoria (upload) aqui, recomendo mover 
 # para um arquivo routers/inspections.py futuramente para organizar, 
 # mas se estiverem aqui, deixe-as abaixo.
 
+def _photo_for_item(item: dict, stored_files: list):
+    """Associa a foto ao item: por 'photo_filename' (nome do arquivo enviado) ou 'photo_index'."""
+    filename = item.get('photo_filename')
+    if filename:
+        return next((f for f in stored_files if f.filename == filename), None)
+    index = item.get('photo_index')
+    if isinstance(index, int) and 0 <= index < len(stored_files):
+        return stored_files[index]
+    return None
+
+@app.get("/inspections/items/export", summary="Exportar Itens de Vistoria (NDJSON/CSV em streaming)")
+async def export_inspection_items(
+    format: str = "ndjson",
+    condominium_id: Optional[int] = None,
+    updated_since: Optional[datetime] = None,
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
+):
+    """Itens de vistoria do condomínio (ou só os alterados após updated_since), enviados em lotes."""
+    stmt = select(*models.InspectionItem.__table__.columns)
+    condominium_id = exports.export_condominium_id(current_user, condominium_id)
+    if condominium_id is not None:
+        stmt = stmt.where(models.InspectionItem.condominium_id == condominium_id)
+    stmt = exports.incremental(stmt, models.InspectionItem, updated_since)
+    return exports.export_response(stmt, format, "inspection_items")
+
 @app.post("/inspections/upload")
 async def create_inspection_with_files(
     condominium_id: int = Form(...),
@@ -71,8 +151,8 @@ async def create_inspection_with_files(
     ia_analysis: str = Form(""),
     items_json: str = Form(...),
     files: List[UploadFile] = File(None), 
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(database.get_db)
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_db)
 ):
     # 1. Parse do JSON dos itens
     try:
@@ -80,7 +160,20 @@ async def create_inspection_with_files(
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Formato JSON inválido para itens da vistoria.")
 
-    # 2. Criação da Vistoria base
+    # 2. Armazena as fotos ANTES de abrir a transação (não segura conexão do pool durante o upload).
+    # Cada arquivo é copiado em blocos para o storage, com paralelismo limitado.
+    # Se a transação abaixo falhar, os arquivos gravados aqui são removidos (except no fim).
+    stored_files = await store_uploads(files or [], prefix=f"inspections/{condominium_id}")
+    try:
+        return await _save_inspection(db, current_user, condominium_id, is_custom, ia_analysis, items_data, stored_files)
+    except BaseException:
+        await db.rollback()
+        await delete_stored(stored_files)
+        raise
+
+async def _save_inspection(db: AsyncSession, current_user, condominium_id, is_custom, ia_analysis, items_data, stored_files):
+    """Vistoria, itens e OSs numa transação (as fotos já estão no storage)."""
+    # 3. Criação da Vistoria base
     db_inspection = models.Inspection(
         surveyor_id=current_user.id,
         condominium_id=condominium_id,
@@ -88,44 +181,50 @@ async def create_inspection_with_files(
         ia_analysis=ia_analysis
     )
     db.add(db_inspection)
-    db.flush() # Força o DB a gerar o ID da vistoria
+    await db.flush() # Força o DB a gerar o ID da vistoria
 
-    # 3. Processamento dos Itens e Geração da OS
+    # 4. Monta os Itens da Vistoria
+    item_rows = []
     for item in items_data:
         
-        # Simulação de upload de foto (substituir por lógica real de storage)
-        photo_url = "url_simulada_storage" 
-        
-        # Normaliza o status para evitar erros de Case Sensitivity
-        status_item = item.get('status', '').lower()
-        
-        # Salva o Item da Vistoria
-        db_item = models.InspectionItem(
-            inspection_id=db_inspection.id,
-            name=item.get('name'),
-            status=status_item, # Salva o status normalizado
-            observation=item.get('observation'),
-            photo_url=photo_url
-        )
-        db.add(db_item)
-        db.flush() # Garante que o ID do item é gerado para a OS
+        stored_photo = _photo_for_item(item, stored_files)
         
-        # 4. GERAÇÃO DA ORDEM DE SERVIÇO (OS) SE NECESSÁRIO
-        # Condição: status deve ser "ruim" (agora em minúsculo)
-        if status_item == 'ruim':
-            print("--- DEBUG (OS): Condição 'ruim' Atingida. Tentando criar OS. ---") 
-            
-            # 🚨 Chamada para a criação da OS no crud.py
-            crud.create_work_order(
-                db=db,
-                title=f"Ação Imediata: {item.get('name')}",
-                description=f"Item {item.get('name')} avaliado como Ruim na vistoria ID {db_inspection.id}.",
-                item_id=db_item.id # Vincula a OS ao item de vistoria
-            )
-
-    db.commit() # Salva todas as alterações (vistoria, itens, OSs)
+        item_rows.append({
+            "inspection_id": db_inspection.id,
+            "condominium_id": condominium_id,
+            "name": item.get('name'),
+            # Normaliza o status para evitar erros de Case Sensitivity
+            "status": item.get('status', '').lower(),
+            "observation": item.get('observation'),
+            "photo_url": stored_photo.url if stored_photo else None,
+        })
+
+    # 5. Inserção em lote: um INSERT ... RETURNING para todos os itens
+    created_items = await crud.bulk_create_inspection_items(db, item_rows)
+
+    # 6. GERAÇÃO DAS ORDENS DE SERVIÇO (OS) PARA ITENS "ruim" (também em lote)
+    work_order_rows = [
+        {
+            "title": f"Ação Imediata: {row.name}",
+            "description": f"Item {row.name} avaliado como Ruim na vistoria ID {db_inspection.id}.",
+            "item_id": row.id, # Vincula a OS ao item de vistoria
+            "condominium_id": condominium_id,
+        }
+        for row in created_items
+        if row.status == 'ruim'
+    ]
+    work_order_ids = await crud.bulk_create_work_orders(db, work_order_rows)
+
+    await db.commit() # Salva todas as alterações (vistoria, itens, OSs)
     
-    return {"status": "success", "inspection_id": db_inspection.id, "message": "Vistoria e Ordens de Serviço (se necessário) criadas com sucesso."}
+    return {
+        "status": "success",
+        "inspection_id": db_inspection.id,
+        "message": "Vistoria e Ordens de Serviço (se necessário) criadas com sucesso.",
+        "work_orders_created": len(work_order_ids),
+        "files": [f.metrics() for f in stored_files],
+        "total_bytes": sum(f.bytes for f in stored_files),
+    }
 
 
 
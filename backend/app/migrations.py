@@ -0,0 +1,238 @@
+# backend/app/migrations.py
+#
+# Alterações de schema que o create_all não faz sozinho: colunas novas em tabelas
+# existentes, índices especiais (GIN, parciais), busca textual, backfills...
+# Cada migração roda uma única vez (registrada em schema_migrations), no prestart.
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+
+def add_column(table: str, column: str, ddl: str):
+    """ADD COLUMN idempotente (o SQLite não tem IF NOT EXISTS, e num banco novo o
+    create_all já criou a coluna a partir do modelo)."""
+    def step(conn: Connection):
+        if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return step
+
+
+def _backfill_financial_hashes(conn: Connection):
+    from .financial_import import backfill_hashes
+    backfill_hashes(conn)
+
+
+# (nome, {dialeto ou "all": [comandos SQL ou funções(conn)]}) — sempre acrescentar no FINAL da lista.
+MIGRATIONS = [
+    ("0001_documents_full_text_search", {
+        # Coluna tsvector gerada (mantida pelo próprio PostgreSQL a cada INSERT/UPDATE)
+        # com stemming em português + índice GIN.
+        "postgresql": [
+            """
+            ALTER TABLE documents ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('portuguese', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('portuguese', coalesce(content_text, '')), 'B')
+            ) STORED
+            """,
+            "CREATE INDEX IF NOT EXISTS ix_documents_search_vector ON documents USING GIN (search_vector)",
+        ],
+        # Fallback local/testes: tabela FTS5 de conteúdo externo, sincronizada por triggers.
+        "sqlite": [
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                title, content_text, content='documents', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS documents_fts_ai AFTER INSERT ON documents BEGIN
+                INSERT INTO documents_fts(rowid, title, content_text) VALUES (new.id, new.title, new.content_text);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS documents_fts_ad AFTER DELETE ON documents BEGIN
+                INSERT INTO documents_fts(documents_fts, rowid, title, content_text)
+                VALUES ('delete', old.id, old.title, old.content_text);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS documents_fts_au AFTER UPDATE ON documents BEGIN
+                INSERT INTO documents_fts(documents_fts, rowid, title, content_text)
+                VALUES ('delete', old.id, old.title, old.content_text);
+                INSERT INTO documents_fts(rowid, title, content_text) VALUES (new.id, new.title, new.content_text);
+            END
+            """,
+            "INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')",
+        ],
+    }),
+    ("0002_documents_index_status", {
+        # Documentos antigos já foram extraídos durante o upload: ficam como "indexado"
+        "all": [
+            add_column("documents", "index_status", "VARCHAR DEFAULT 'indexado'"),
+            add_column("documents", "index_error", "TEXT"),
+        ],
+    }),
+    ("0003_documents_content_hash", {
+        "all": [
+            add_column("documents", "content_hash", "VARCHAR(64)"),
+            "CREATE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)",
+        ],
+    }),
+    ("0004_work_orders_keyset_indexes", {
+        # A paginação por cursor de GET /work-orders/ não aceita chave nula
+        "all": [
+            "UPDATE work_orders SET created_at = COALESCE(closed_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL",
+            "UPDATE work_orders SET status = 'Pendente' WHERE status IS NULL",
+            "CREATE INDEX IF NOT EXISTS ix_work_orders_status_created_id ON work_orders (status, created_at DESC, id DESC)",
+            "CREATE INDEX IF NOT EXISTS ix_work_orders_created_id ON work_orders (created_at DESC, id DESC)",
+            "CREATE INDEX IF NOT EXISTS ix_work_orders_provider_created_id ON work_orders (provider_id, created_at DESC, id DESC)",
+            "CREATE INDEX IF NOT EXISTS ix_inspection_items_condominium_id ON inspection_items (condominium_id)",
+        ],
+    }),
+    ("0005_work_orders_condominium_id", {
+        "all": [
+            add_column("work_orders", "condominium_id", "INTEGER REFERENCES condominiums(id)"),
+            # Backfill: condomínio do item (ou, em itens antigos, da vistoria)
+            """
+            UPDATE work_orders SET condominium_id = (
+                SELECT COALESCE(ii.condominium_id, i.condominium_id)
+                FROM inspection_items ii LEFT JOIN inspections i ON i.id = ii.inspection_id
+                WHERE ii.id = work_orders.item_id
+            )
+            WHERE condominium_id IS NULL AND item_id IS NOT NULL
+            """,
+            "CREATE INDEX IF NOT EXISTS ix_work_orders_condominium_id ON work_orders (condominium_id)",
+            "CREATE INDEX IF NOT EXISTS ix_work_orders_condo_status_created_id ON work_orders (condominium_id, status, created_at DESC, id DESC)",
+            "CREATE INDEX IF NOT EXISTS ix_work_orders_condo_created_id ON work_orders (condominium_id, created_at DESC, id DESC)",
+        ],
+    }),
+    ("0006_updated_at_for_exports", {
+        # Linhas antigas: melhor aproximação disponível (ou a data da migração)
+        "all": [
+            add_column("work_orders", "updated_at", "TIMESTAMP"),
+            "UPDATE work_orders SET updated_at = COALESCE(closed_at, created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL",
+            add_column("inspection_items", "updated_at", "TIMESTAMP"),
+            """
+            UPDATE inspection_items SET updated_at = COALESCE(
+                (SELECT i.date FROM inspections i WHERE i.id = inspection_items.inspection_id), CURRENT_TIMESTAMP
+            ) WHERE updated_at IS NULL
+            """,
+            add_column("financial_records", "updated_at", "TIMESTAMP"),
+            "UPDATE financial_records SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL",
+            add_column("maintenance_alerts", "updated_at", "TIMESTAMP"),
+            "UPDATE maintenance_alerts SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS ix_work_orders_updated_at ON work_orders (updated_at)",
+            "CREATE INDEX IF NOT EXISTS ix_inspection_items_updated_at ON inspection_items (updated_at)",
+            "CREATE INDEX IF NOT EXISTS ix_financial_records_updated_at ON financial_records (updated_at)",
+            "CREATE INDEX IF NOT EXISTS ix_maintenance_alerts_updated_at ON maintenance_alerts (updated_at)",
+        ],
+    }),
+    ("0007_maintenance_alerts_unsent_indexes", {
+        # Índices parciais só com os alertas ainda não enviados (ver alert_scheduler.py).
+        # O predicado precisa ser escrito como o SQLAlchemy escreve o filtro em cada banco.
+        "all": [
+            "UPDATE maintenance_alerts SET alert_sent_1month = COALESCE(alert_sent_1month, false), "
+            "alert_sent_1week = COALESCE(alert_sent_1week, false), alert_sent_1day = COALESCE(alert_sent_1day, false) "
+            "WHERE alert_sent_1month IS NULL OR alert_sent_1week IS NULL OR alert_sent_1day IS NULL",
+        ],
+        "postgresql": [
+            f"CREATE INDEX IF NOT EXISTS ix_maintenance_alerts_unsent_{name} ON maintenance_alerts (due_date) WHERE alert_sent_{name} = false"
+            for name in ("1month", "1week", "1day")
+        ],
+        "sqlite": [
+            f"CREATE INDEX IF NOT EXISTS ix_maintenance_alerts_unsent_{name} ON maintenance_alerts (due_date) WHERE alert_sent_{name} = 0"
+            for name in ("1month", "1week", "1day")
+        ],
+    }),
+    ("0008_maintenance_alerts_recurrence", {
+        # Recorrência por period_years (ver recurrence.py): cada ocorrência aponta para a
+        # próxima; o índice parcial cobre só a última ocorrência de cada série recorrente.
+        "all": [
+            add_column("maintenance_alerts", "next_alert_id", "INTEGER"),
+            "CREATE INDEX IF NOT EXISTS ix_maintenance_alerts_due_date ON maintenance_alerts (due_date)",
+            "CREATE INDEX IF NOT EXISTS ix_maintenance_alerts_series_heads ON maintenance_alerts (due_date) "
+            "WHERE next_alert_id IS NULL AND period_years > 0",
+        ],
+    }),
+    ("0009_financial_monthly_rollups", {
+        # Carga inicial dos totais mensais (depois mantidos por financial_rollup.py)
+        "postgresql": [
+            "DELETE FROM financial_monthly_rollups",
+            "INSERT INTO financial_monthly_rollups (condominium_id, month, type, total, records) "
+            "SELECT condominium_id, CAST(date_trunc('month', date) AS DATE), type, SUM(amount), COUNT(*) "
+            "FROM financial_records WHERE condominium_id IS NOT NULL AND date IS NOT NULL AND type IS NOT NULL "
+            "GROUP BY 1, 2, 3",
+        ],
+        "sqlite": [
+            "DELETE FROM financial_monthly_rollups",
+            "INSERT INTO financial_monthly_rollups (condominium_id, month, type, total, records) "
+            "SELECT condominium_id, date(date, 'start of month'), type, SUM(amount), COUNT(*) "
+            "FROM financial_records WHERE condominium_id IS NOT NULL AND date IS NOT NULL AND type IS NOT NULL "
+            "GROUP BY 1, 2, 3",
+        ],
+    }),
+    ("0010_financial_integer_cents", {
+        # Valores em centavos inteiros (ver money.py); amount/total (float) viram espelhos legados
+        "all": [
+            add_column("financial_records", "amount_cents", "BIGINT"),
+            add_column("financial_records", "category", "VARCHAR"),
+            "UPDATE financial_records SET amount_cents = CAST(ROUND(amount * 100) AS BIGINT) "
+            "WHERE amount_cents IS NULL AND amount IS NOT NULL",
+            "UPDATE financial_records SET amount = amount_cents / 100.0 WHERE amount_cents IS NOT NULL",
+            "CREATE INDEX IF NOT EXISTS ix_financial_records_condo_date ON financial_records (condominium_id, date)",
+            add_column("financial_monthly_rollups", "total_cents", "BIGINT"),
+            "DELETE FROM financial_monthly_rollups",
+        ],
+        "postgresql": [
+            "INSERT INTO financial_monthly_rollups (condominium_id, month, type, total_cents, total, records) "
+            "SELECT condominium_id, CAST(date_trunc('month', date) AS DATE), type, SUM(amount_cents), "
+            "SUM(amount_cents) / 100.0, COUNT(*) "
+            "FROM financial_records WHERE condominium_id IS NOT NULL AND date IS NOT NULL AND type IS NOT NULL "
+            "GROUP BY 1, 2, 3",
+        ],
+        "sqlite": [
+            "INSERT INTO financial_monthly_rollups (condominium_id, month, type, total_cents, total, records) "
+            "SELECT condominium_id, date(date, 'start of month'), type, SUM(amount_cents), "
+            "SUM(amount_cents) / 100.0, COUNT(*) "
+            "FROM financial_records WHERE condominium_id IS NOT NULL AND date IS NOT NULL AND type IS NOT NULL "
+            "GROUP BY 1, 2, 3",
+        ],
+    }),
+    ("0011_financial_records_dedup_hash", {
+        # Deduplicação da importação de extratos (ver financial_import.py)
+        "all": [
+            add_column("financial_records", "dedup_hash", "VARCHAR(64)"),
+            _backfill_financial_hashes,
+            "CREATE INDEX IF NOT EXISTS ix_financial_records_dedup ON financial_records (condominium_id, dedup_hash)",
+        ],
+    }),
+    ("0012_documents_index_claimed_at", {
+        # Recuperação de documentos presos em "processando" (ver document_indexer.py)
+        "all": [
+            add_column("documents", "index_claimed_at", "TIMESTAMP"),
+        ],
+    }),
+]
+
+
+def run_migrations(engine: Engine):
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations (name VARCHAR PRIMARY KEY, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT name FROM schema_migrations"))}
+
+    for name, statements in MIGRATIONS:
+        if name in applied:
+            continue
+        print(f"Aplicando migração {name}...")
+        # Uma transação por migração: se falhar, nada dela fica pela metade
+        with engine.begin() as conn:
+            for statement in statements.get("all", []) + statements.get(dialect, []):
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(text(statement))
+            conn.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"), {"name": name})
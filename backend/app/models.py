@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Float, Date
-from sqlalchemy.orm import relationship, declarative_base # Garantir que o Base está sendo usado corretamente
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Float, Date, BigInteger, Index, JSON, UniqueConstraint
+from sqlalchemy.orm import relationship, declarative_base, validates # Garantir que o Base está sendo usado corretamente
 from datetime import datetime
 from .database import Base # Assumindo que Base é importado de .database
 
+# Relações com lazy="raise_on_sql": carregamento implícito (N+1) é erro; quem precisa de uma
+# relação declara na consulta (selectinload/joinedload ou refresh com o nome do atributo).
+# Contagem de comandos por request em desenvolvimento/testes: ver query_budget.py.
+
 class Condominium(Base):
     __tablename__ = "condominiums"
 
@@ -19,12 +23,13 @@ class Condominium(Base):
     secondary_color = Column(String, default="#4CAF50")
     
     # Relações
-    users = relationship("User", back_populates="condominium")
-    inspections = relationship("Inspection", back_populates="condominium")
-    inspection_items = relationship("InspectionItem", back_populates="condominium")
-    maintenance_alerts = relationship("MaintenanceAlert", back_populates="condominium")
-    financials = relationship("FinancialRecord", back_populates="condominium")
-    documents = relationship("Document", back_populates="condominium")
+    users = relationship("User", back_populates="condominium", lazy="raise_on_sql")
+    inspections = relationship("Inspection", back_populates="condominium", lazy="raise_on_sql")
+    inspection_items = relationship("InspectionItem", back_populates="condominium", lazy="raise_on_sql")
+    maintenance_alerts = relationship("MaintenanceAlert", back_populates="condominium", lazy="raise_on_sql")
+    financials = relationship("FinancialRecord", back_populates="condominium", lazy="raise_on_sql")
+    documents = relationship("Document", back_populates="condominium", lazy="raise_on_sql")
+    work_orders = relationship("WorkOrder", back_populates="condominium", lazy="raise_on_sql")
 
 class User(Base):
     __tablename__ = "users"
@@ -38,11 +43,11 @@ class User(Base):
     role = Column(String) 
     
     condominium_id = Column(Integer, ForeignKey("condominiums.id"), nullable=True)
-    condominium = relationship("Condominium", back_populates="users")
+    condominium = relationship("Condominium", back_populates="users", lazy="raise_on_sql")
     
-    inspections = relationship("Inspection", back_populates="surveyor")
-    sent_messages = relationship("Message", back_populates="user") # ⬅️ CORRIGIDO: Referencia a classe Message
-    inspection_messages = relationship("ChatMessage", back_populates="sender")
+    inspections = relationship("Inspection", back_populates="surveyor", lazy="raise_on_sql")
+    sent_messages = relationship("Message", back_populates="user", lazy="raise_on_sql") # ⬅️ CORRIGIDO: Referencia a classe Message
+    inspection_messages = relationship("ChatMessage", back_populates="sender", lazy="raise_on_sql")
 
 class ServiceProvider(Base):
     __tablename__ = "service_providers"
@@ -52,7 +57,7 @@ class ServiceProvider(Base):
     profession = Column(String)
     cnpj = Column(String)
     
-    work_orders = relationship("WorkOrder", back_populates="provider")
+    work_orders = relationship("WorkOrder", back_populates="provider", lazy="raise_on_sql")
 
 class Inspection(Base):
     __tablename__ = "inspections"
@@ -66,10 +71,10 @@ class Inspection(Base):
     surveyor_id = Column(Integer, ForeignKey("users.id"))
     condominium_id = Column(Integer, ForeignKey("condominiums.id"))
     
-    surveyor = relationship("User", back_populates="inspections")
-    condominium = relationship("Condominium", back_populates="inspections")
-    items = relationship("InspectionItem", back_populates="inspection", cascade="all, delete-orphan")
-    messages = relationship("ChatMessage", back_populates="inspection")
+    surveyor = relationship("User", back_populates="inspections", lazy="raise_on_sql")
+    condominium = relationship("Condominium", back_populates="inspections", lazy="raise_on_sql")
+    items = relationship("InspectionItem", back_populates="inspection", cascade="all, delete-orphan", lazy="raise_on_sql")
+    messages = relationship("ChatMessage", back_populates="inspection", lazy="raise_on_sql")
 
 class InspectionItem(Base):
     __tablename__ = "inspection_items"
@@ -81,13 +86,15 @@ class InspectionItem(Base):
     status = Column(String)
     photo_url = Column(String, nullable=True)
     observation = Column(Text, nullable=True)
+    # Alterado por último em (exportações incrementais, ver exports.py)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     inspection_id = Column(Integer, ForeignKey("inspections.id"))
-    inspection = relationship("Inspection", back_populates="items")
-    condominium = relationship("Condominium", back_populates="inspection_items") # ⬅️ CORRIGIDO: back_populates
+    inspection = relationship("Inspection", back_populates="items", lazy="raise_on_sql")
+    condominium = relationship("Condominium", back_populates="inspection_items", lazy="raise_on_sql") # ⬅️ CORRIGIDO: back_populates
     
     # Define o relacionamento com a OS
-    work_order = relationship("WorkOrder", uselist=False, back_populates="item", cascade="all, delete-orphan")
+    work_order = relationship("WorkOrder", uselist=False, back_populates="item", cascade="all, delete-orphan", lazy="raise_on_sql")
 
 class WorkOrder(Base):
     __tablename__ = "work_orders"
@@ -99,22 +106,29 @@ class WorkOrder(Base):
     # ❌ ERRO DE SINTAXE: 'title' duplicado
     # title = Column(String)
     description = Column(Text)
+    # (status, created_at, id) e (created_at, id): chaves da paginação por cursor (migrações 0004/0005)
     status = Column(String, default="Pendente")
     created_at = Column(DateTime, default=datetime.utcnow)
     closed_at = Column(DateTime, nullable=True)
+    # Alterado por último em (exportações incrementais, ver exports.py)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     photo_before_url = Column(String, nullable=True)
     photo_after_url = Column(String, nullable=True)
     
     item_id = Column(Integer, ForeignKey("inspection_items.id"), nullable=True)
     provider_id = Column(Integer, ForeignKey("service_providers.id"), nullable=True)
+    # Copiado do item da vistoria (ou informado na OS manual): a listagem filtra direto
+    # por aqui, sem JOIN com inspection_items (backfill na migração 0005)
+    condominium_id = Column(Integer, ForeignKey("condominiums.id"), nullable=True, index=True)
     
     # Define o relacionamento com o InspectionItem
-    item = relationship("InspectionItem", back_populates="work_order") 
-    provider = relationship("ServiceProvider", back_populates="work_orders")
+    item = relationship("InspectionItem", back_populates="work_order", lazy="raise_on_sql") 
+    provider = relationship("ServiceProvider", back_populates="work_orders", lazy="raise_on_sql")
+    condominium = relationship("Condominium", back_populates="work_orders", lazy="raise_on_sql")
     
     # 🚨 CORRIGIDO: Referencia a classe Message (definida abaixo)
-    messages = relationship("Message", back_populates="work_order", cascade="all, delete-orphan") 
+    messages = relationship("Message", back_populates="work_order", cascade="all, delete-orphan", lazy="raise_on_sql") 
 
 # 🚨 CLASSE CHAT MESSAGE (Mudar o nome para Message para evitar conflito com a nova Message)
 class ChatMessage(Base): # Renomeado de ChatMessage para evitar conflito
@@ -127,20 +141,49 @@ class ChatMessage(Base): # Renomeado de ChatMessage para evitar conflito
     inspection_id = Column(Integer, ForeignKey("inspections.id"))
     sender_id = Column(Integer, ForeignKey("users.id"))
     
-    inspection = relationship("Inspection", back_populates="messages")
-    sender = relationship("User", back_populates="inspection_messages")
+    inspection = relationship("Inspection", back_populates="messages", lazy="raise_on_sql")
+    sender = relationship("User", back_populates="inspection_messages", lazy="raise_on_sql")
 
 class FinancialRecord(Base):
     __tablename__ = "financial_records"
     
+    __table_args__ = (
+        Index("ix_financial_records_condo_date", "condominium_id", "date"), # Relatórios por período
+        Index("ix_financial_records_dedup", "condominium_id", "dedup_hash"), # Importação de extratos
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String)
+    # Valor exato em centavos (ver money.py). Sempre positivo; o sinal vem de type.
+    amount_cents = Column(BigInteger)
+    # Legado: espelho em float de amount_cents (exportações/clientes antigos). Não usar em contas.
     amount = Column(Float)
     type = Column(String) 
+    category = Column(String, nullable=True) # Ex: "Água", "Folha", "Taxa condominial"
     date = Column(Date)
+    # SHA-256 de (data, valor, descrição, ocorrência): deduplicação na importação (financial_import.py)
+    dedup_hash = Column(String(64), nullable=True)
+    # Alterado por último em (exportações incrementais, ver exports.py)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     condominium_id = Column(Integer, ForeignKey("condominiums.id"))
-    condominium = relationship("Condominium", back_populates="financials")
+    condominium = relationship("Condominium", back_populates="financials", lazy="raise_on_sql")
+
+    @validates("amount_cents")
+    def _sync_amount(self, key, cents):
+        self.amount = cents / 100 if cents is not None else None
+        return cents
+
+# Totais mensais pré-agregados de financial_records (mantidos por financial_rollup.py)
+class FinancialMonthlyRollup(Base):
+    __tablename__ = "financial_monthly_rollups"
+
+    condominium_id = Column(Integer, primary_key=True)
+    month = Column(Date, primary_key=True) # Primeiro dia do mês
+    type = Column(String, primary_key=True) # Receita | Despesa
+    total_cents = Column(BigInteger, default=0)
+    total = Column(Float, default=0.0) # Legado: espelho de total_cents
+    records = Column(Integer, default=0)
 
 class Document(Base):
     __tablename__ = "documents"
@@ -149,9 +192,78 @@ class Document(Base):
     title = Column(String)
     file_path = Column(String)
     content_text = Column(Text)
+    # SHA-256 do PDF: arquivos iguais compartilham o mesmo objeto no storage e o texto extraído
+    content_hash = Column(String(64), index=True, nullable=True)
+    # Extração do texto roda em background: pendente -> processando -> indexado | erro
+    index_status = Column(String, default="pendente")
+    index_error = Column(Text, nullable=True)
+    # Quando o worker pegou o documento: "processando" antigo demais = worker caiu (ver document_indexer)
+    index_claimed_at = Column(DateTime, nullable=True)
+    # search_vector (tsvector gerado + índice GIN) é criado pela migração 0001 e usado só em search.py
     
     condominium_id = Column(Integer, ForeignKey("condominiums.id"))
-    condominium = relationship("Condominium", back_populates="documents")
+    condominium = relationship("Condominium", back_populates="documents", lazy="raise_on_sql")
+    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan", lazy="raise_on_sql")
+
+class DocumentContent(Base):
+    """Cache por hash do conteúdo: texto extraído (por página) e trechos de um PDF.
+
+    Um mesmo regimento enviado para vários condomínios (ou reenviado com outro título)
+    é extraído pelo pypdf uma única vez.
+    """
+    __tablename__ = "document_contents"
+
+    content_hash = Column(String(64), primary_key=True)
+    storage_key = Column(String) # Objeto único no storage, referenciado por vários Documents
+    size_bytes = Column(BigInteger)
+    pages = Column(JSON) # [texto da página 1, texto da página 2, ...]
+    chunks = Column(JSON) # [[página, texto], ...] (ver passages.chunk_pages)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# --- ÍNDICE DE PASSAGENS (BM25) ---
+# Os documentos são quebrados em trechos (por página/parágrafo) com um índice invertido
+# e as estatísticas do BM25 por condomínio, atualizados a cada novo documento (ver passages.py).
+class DocumentChunk(Base):
+    __tablename__ = "document_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
+    condominium_id = Column(Integer, ForeignKey("condominiums.id"), index=True)
+    page = Column(Integer) # Página do PDF (começando em 1)
+    position = Column(Integer) # Ordem do trecho dentro do documento
+    text = Column(Text)
+    length = Column(Integer) # Número de termos indexados (dl do BM25)
+
+    document = relationship("Document", back_populates="chunks", lazy="raise_on_sql")
+
+class ChunkTerm(Base):
+    """Lista invertida: termo -> trechos onde aparece, com a frequência (tf)."""
+    __tablename__ = "chunk_terms"
+    __table_args__ = (
+        Index("ix_chunk_terms_condo_term", "condominium_id", "term"),
+    )
+
+    chunk_id = Column(Integer, ForeignKey("document_chunks.id", ondelete="CASCADE"), primary_key=True)
+    term = Column(String, primary_key=True)
+    condominium_id = Column(Integer)
+    tf = Column(Integer)
+    chunk_length = Column(Integer) # Copiado do trecho: o ranking não precisa de JOIN
+
+class TermStat(Base):
+    """Document frequency (df) de cada termo, por condomínio."""
+    __tablename__ = "term_stats"
+
+    condominium_id = Column(Integer, primary_key=True)
+    term = Column(String, primary_key=True)
+    df = Column(Integer, default=0)
+
+class CorpusStat(Base):
+    """Totais do corpus de cada condomínio (N e comprimento médio dos trechos)."""
+    __tablename__ = "corpus_stats"
+
+    condominium_id = Column(Integer, primary_key=True)
+    chunk_count = Column(Integer, default=0)
+    total_length = Column(BigInteger, default=0)
 
 # 🚨 CLASSE MESSAGE (Mensagens vinculadas à OS)
 class Message(Base):
@@ -165,8 +277,8 @@ class Message(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relacionamentos (Back_populates)
-    work_order = relationship("WorkOrder", back_populates="messages")
-    user = relationship("User", back_populates="sent_messages") # ⬅️ CORRIGIDO: back_populates
+    work_order = relationship("WorkOrder", back_populates="messages", lazy="raise_on_sql")
+    user = relationship("User", back_populates="sent_messages", lazy="raise_on_sql") # ⬅️ CORRIGIDO: back_populates
 
 class MaintenanceAlert(Base):
     __tablename__ = "maintenance_alerts"
@@ -176,14 +288,64 @@ class MaintenanceAlert(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     type = Column(String)
-    due_date = Column(Date)
+    due_date = Column(Date, index=True)
     
     period_years = Column(Integer) # COLUNA ADICIONADA
+    # Próxima ocorrência já criada pela recorrência (NULL = esta é a última da série)
+    next_alert_id = Column(Integer, nullable=True)
     
     alert_sent_1month = Column(Boolean, default=False)
     alert_sent_1week = Column(Boolean, default=False)
     alert_sent_1day = Column(Boolean, default=False)
+    # Alterado por último em (exportações incrementais, ver exports.py)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     condominium_id = Column(Integer, ForeignKey("condominiums.id"))
-    condominium = relationship("Condominium", back_populates="maintenance_alerts")
+    condominium = relationship("Condominium", back_populates="maintenance_alerts", lazy="raise_on_sql")
+
+# --- SCHEDULER INTERNO (ver scheduler.py) ---
+# Cada execução de um job (run_key = janela do intervalo) é dividida em shards por
+# condomínio; o shard concluído grava seu checkpoint na mesma transação do trabalho,
+# então uma execução interrompida é retomada só com os shards que faltam.
+class SchedulerRun(Base):
+    __tablename__ = "scheduler_runs"
 
+    job = Column(String, primary_key=True)
+    run_key = Column(String, primary_key=True)
+    shards = Column(Integer)
+    status = Column(String, default="running") # running | done | failed
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Float, nullable=True)
+    error = Column(Text, nullable=True)
+
+class SchedulerShard(Base):
+    __tablename__ = "scheduler_shards"
+
+    job = Column(String, primary_key=True)
+    run_key = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    finished_at = Column(DateTime, default=datetime.utcnow)
+    result = Column(JSON, nullable=True)
+
+# --- OUTBOX DE NOTIFICAÇÕES (ver notifications.py) ---
+# O job de alertas grava aqui, na mesma transação que marca alert_sent_*, uma linha por
+# (alerta, prazo); os workers de notificação drenam a tabela de forma independente.
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        UniqueConstraint("alert_id", "threshold", name="uq_notification_outbox_alert_threshold"), # Deduplicação
+        Index("ix_notification_outbox_due", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    alert_id = Column(Integer, ForeignKey("maintenance_alerts.id", ondelete="CASCADE"))
+    threshold = Column(String) # 1month | 1week | 1day
+    provider = Column(String) # Transporte (email, push, stub...)
+    status = Column(String, default="pending") # pending | sending | sent | failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
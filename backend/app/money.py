@@ -0,0 +1,78 @@
+# backend/app/money.py
+#
+# Valores monetários em centavos inteiros (BigInteger no banco). Conversões sempre por
+# Decimal: float só entra como entrada legada e é arredondado uma única vez.
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Union
+
+CENT = Decimal("0.01")
+
+Money = Union[int, str, float, Decimal]
+
+
+def _normalize(text: str) -> str:
+    """Texto com separadores de milhar/decimal (brasileiro ou americano) -> "1234.56".
+
+    Com os dois separadores, o último é o decimal. Com um só: repetido ou seguido de
+    exatamente três dígitos é milhar ("1.234.567", "1.500": leitura brasileira, nunca R$ 1,50);
+    senão é decimal ("1234,56" / "1234.5"). Grupos de milhar fora do padrão são rejeitados.
+    """
+    sign = text[0] if text[:1] in ("-", "+") else ""
+    text = text[len(sign):]
+    present = [sep for sep in (",", ".") if sep in text]
+    if not present:
+        return sign + text
+    if len(present) == 2:
+        decimal = max(present, key=text.rfind)
+        thousands = "." if decimal == "," else ","
+    elif text.count(present[0]) > 1 or len(text.rsplit(present[0], 1)[1]) == 3:
+        decimal, thousands = None, present[0]
+    else:
+        decimal, thousands = present[0], None
+    if decimal is not None:
+        if text.count(decimal) > 1:
+            raise ValueError(f"Valor monetário inválido: {sign + text!r}")
+        integer, fraction = text.rsplit(decimal, 1)
+    else:
+        integer, fraction = text, ""
+    if thousands is not None:
+        groups = integer.split(thousands)
+        # "0.500" / ",500" não são milhar válidos: erro em vez de adivinhar
+        if not (1 <= len(groups[0]) <= 3 and groups[0].isdigit() and groups[0] != "0"
+                and all(len(group) == 3 for group in groups[1:])):
+            raise ValueError(f"Valor monetário inválido: {sign + text!r}")
+        integer = "".join(groups)
+    return sign + integer + ("." + fraction if decimal is not None else "")
+
+
+def to_cents(value: Money) -> int:
+    """Centavos a partir de Decimal/str ou float; meio centavo arredonda para cima.
+
+    >>> to_cents("1.234,56"), to_cents("1,234.56"), to_cents("1234,56"), to_cents("1234.56")
+    (123456, 123456, 123456, 123456)
+    >>> to_cents("R$ 1.234.567"), to_cents("-0,05"), to_cents(0.1)
+    (123456700, -5, 10)
+    >>> to_cents("1.500"), to_cents("1,500"), to_cents("R$ 1.500"), to_cents("1.5"), to_cents("1,50")
+    (150000, 150000, 150000, 150, 150)
+    >>> to_cents("1.23,45")
+    Traceback (most recent call last):
+    ValueError: Valor monetário inválido: '1.23,45'
+    """
+    if isinstance(value, bool):
+        raise ValueError("Valor monetário inválido.")
+    if isinstance(value, str):
+        value = _normalize(value.strip().replace("R$", "").replace(" ", ""))
+    elif isinstance(value, float):
+        value = repr(value) # 0.1 vira "0.1", não 0.1000000000000000055...
+    try:
+        amount = Decimal(value)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Valor monetário inválido: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Valor monetário inválido: {value!r}")
+    return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> Decimal:
+    return (Decimal(cents) / 100).quantize(CENT)
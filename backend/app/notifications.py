@@ -0,0 +1,330 @@
+# backend/app/notifications.py
+#
+# Entrega das notificações dos alertas de manutenção (padrão outbox).
+# - O job de alertas (alert_scheduler.py) só grava linhas em notification_outbox, na
+#   mesma transação que marca alert_sent_*; a chave única (alert_id, threshold) evita
+#   notificação duplicada mesmo se o job rodar de novo.
+# - Um pool de workers (em todos os processos) reivindica lotes da tabela com
+#   FOR UPDATE SKIP LOCKED, agrupa por provedor e envia em lote, respeitando o limite
+#   de envios/s de cada provedor. Falhas voltam para a fila com backoff exponencial.
+# - A vazão de entrega não depende do scheduler: ele só acorda os workers.
+# - Transporte "stub" (padrão) guarda as mensagens em memória, para testes locais.
+
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, event, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import database, models
+
+Outbox = models.NotificationOutbox
+
+NOTIFICATION_PROVIDER = os.getenv("NOTIFICATION_PROVIDER", "stub") # Provedor das novas notificações
+NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", "2"))
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "100"))
+NOTIFICATION_POLL_SECONDS = float(os.getenv("NOTIFICATION_POLL_SECONDS", "5"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "8"))
+NOTIFICATION_BACKOFF_SECONDS = float(os.getenv("NOTIFICATION_BACKOFF_SECONDS", "30")) # Dobra a cada tentativa
+NOTIFICATION_BACKOFF_MAX_SECONDS = float(os.getenv("NOTIFICATION_BACKOFF_MAX_SECONDS", "21600"))
+# Lote em "sending" há mais que isso (worker caiu no meio do envio) volta a ser reivindicável
+NOTIFICATION_CLAIM_TIMEOUT_SECONDS = float(os.getenv("NOTIFICATION_CLAIM_TIMEOUT_SECONDS", "300"))
+# Limite de envios por segundo, por provedor. Ex: "email=10,push=50" (sem limite se ausente)
+NOTIFICATION_RATE_LIMITS = {
+    name.strip(): float(rate)
+    for name, rate in (
+        item.split("=", 1) for item in os.getenv("NOTIFICATION_RATE_LIMITS", "").split(",") if "=" in item
+    )
+}
+
+THRESHOLD_LABELS = {"1month": "30 dias", "1week": "7 dias", "1day": "1 dia"}
+
+
+@dataclass
+class Notification:
+    outbox_id: int
+    alert_id: int
+    threshold: str
+    recipients: List[str]
+    subject: str
+    body: str
+
+
+# --- TRANSPORTES ---
+
+class StubTransport:
+    """Transporte local: guarda as mensagens em memória (e pode simular falhas)."""
+
+    def __init__(self):
+        self.sent: List[Notification] = []
+        self.fail_next = 0 # Quantas das próximas mensagens devem falhar
+
+    async def send_batch(self, messages: Sequence[Notification]) -> List[Optional[str]]:
+        """Envia o lote; retorna, por mensagem, None (entregue) ou a mensagem de erro."""
+        errors = []
+        for message in messages:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                errors.append("falha simulada")
+            else:
+                self.sent.append(message)
+                errors.append(None)
+        return errors
+
+
+TRANSPORTS = {"stub": StubTransport()}
+
+
+def register_transport(name: str, transport):
+    """Registra um provedor (objeto com `async send_batch(messages) -> [erro ou None]`)."""
+    TRANSPORTS[name] = transport
+
+
+class RateLimiter:
+    """Token bucket por provedor (por processo: divida o limite pelo número de workers)."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, n: int):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # Lote maior que o bucket: espera encher e deixa o saldo negativo
+                if self.tokens >= min(n, self.rate):
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((min(n, self.rate) - self.tokens) / self.rate)
+
+
+# --- OUTBOX ---
+
+async def enqueue_alerts(db: AsyncSession, fired: Dict[str, List[int]], provider: str = NOTIFICATION_PROVIDER) -> int:
+    """Grava as notificações dos alertas marcados (na transação do chamador).
+
+    (alert_id, threshold) já presente é ignorado. Os workers são acordados depois do commit.
+    """
+    rows = [
+        {"alert_id": alert_id, "threshold": threshold, "provider": provider}
+        for threshold, ids in fired.items() for alert_id in ids
+    ]
+    if not rows:
+        return 0
+    await db.execute(
+        database.dialect_insert(Outbox.__table__).values(rows)
+        .on_conflict_do_nothing(index_elements=["alert_id", "threshold"])
+    )
+    event.listen(db.sync_session, "after_commit", lambda session: dispatcher.wake(), once=True)
+    return len(rows)
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = min(NOTIFICATION_BACKOFF_SECONDS * 2 ** (attempts - 1), NOTIFICATION_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2)) # Jitter: não retenta tudo junto
+
+
+async def _claim(db: AsyncSession, limit: int) -> List[Outbox]:
+    """Reivindica até `limit` notificações vencidas (as travadas por outro worker são puladas)."""
+    now = datetime.utcnow()
+    due = or_(
+        and_(Outbox.status == "pending", Outbox.next_attempt_at <= now),
+        and_(Outbox.status == "sending", Outbox.claimed_at < now - timedelta(seconds=NOTIFICATION_CLAIM_TIMEOUT_SECONDS)),
+    )
+    ids = (await db.execute(
+        select(Outbox.id).where(due).order_by(Outbox.next_attempt_at).limit(limit)
+        .with_for_update(skip_locked=True)
+    )).scalars().all()
+    if not ids:
+        return []
+    claimed = (await db.execute(
+        update(Outbox).where(Outbox.id.in_(ids), due)
+        .values(status="sending", claimed_at=now, attempts=Outbox.attempts + 1)
+        .returning(Outbox.id, Outbox.alert_id, Outbox.threshold, Outbox.provider, Outbox.attempts)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    return claimed
+
+
+async def _build_messages(db: AsyncSession, claimed) -> List[Notification]:
+    """Monta as mensagens do lote com duas consultas (alertas e destinatários)."""
+    alert_ids = {row.alert_id for row in claimed}
+    alerts = {
+        alert.id: alert for alert in (await db.execute(
+            select(models.MaintenanceAlert.id, models.MaintenanceAlert.type, models.MaintenanceAlert.due_date,
+                   models.MaintenanceAlert.condominium_id)
+            .where(models.MaintenanceAlert.id.in_(alert_ids))
+        ))
+    }
+    condo_ids = {alert.condominium_id for alert in alerts.values()}
+    recipients: Dict[int, List[str]] = {}
+    for condominium_id, email in await db.execute(
+        select(models.User.condominium_id, models.User.email)
+        .where(models.User.condominium_id.in_(condo_ids), models.User.email.isnot(None))
+    ):
+        recipients.setdefault(condominium_id, []).append(email)
+
+    messages = []
+    for row in claimed:
+        alert = alerts.get(row.alert_id)
+        if alert is None:
+            continue
+        days = (alert.due_date - date.today()).days
+        messages.append(Notification(
+            outbox_id=row.id,
+            alert_id=row.alert_id,
+            threshold=row.threshold,
+            recipients=recipients.get(alert.condominium_id, []),
+            subject=f"Aviso de {THRESHOLD_LABELS.get(row.threshold, row.threshold)}: {alert.type}",
+            body=f"O prazo de {alert.type} vence em {alert.due_date:%d/%m/%Y} ({'hoje' if days <= 0 else f'em {days} dia(s)'}).",
+        ))
+    return messages
+
+
+# --- WORKERS ---
+
+@dataclass
+class DispatchStats:
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    batches: int = 0
+    last_batch_at: Optional[datetime] = None
+    by_provider: Dict[str, int] = field(default_factory=dict)
+
+
+class NotificationDispatcher:
+    """Pool de workers que drena notification_outbox em lotes."""
+
+    def __init__(self, workers: int = NOTIFICATION_WORKERS, batch_size: int = NOTIFICATION_BATCH_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.stats = DispatchStats()
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if not self._tasks:
+            self._wakeup = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _limiter(self, provider: str) -> Optional[RateLimiter]:
+        rate = NOTIFICATION_RATE_LIMITS.get(provider)
+        if not rate:
+            return None
+        if provider not in self._limiters:
+            self._limiters[provider] = RateLimiter(rate)
+        return self._limiters[provider]
+
+    async def _worker(self):
+        while True:
+            try:
+                if await self.dispatch_once():
+                    continue # Pode haver mais: segue sem esperar
+            except Exception as e:
+                print(f"ERRO NO ENVIO DE NOTIFICAÇÕES: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=NOTIFICATION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch_once(self) -> int:
+        """Reivindica e envia um lote. Retorna quantas notificações foram processadas."""
+        async with database.AsyncSessionLocal() as db:
+            claimed = await _claim(db, self.batch_size)
+            if not claimed:
+                return 0
+            attempts = {row.id: row.attempts for row in claimed}
+            by_provider: Dict[str, list] = {}
+            for row in claimed:
+                by_provider.setdefault(row.provider, []).append(row)
+
+            results: Dict[int, Optional[str]] = {}
+            for provider, rows in by_provider.items():
+                transport = TRANSPORTS.get(provider)
+                if transport is None:
+                    results.update((row.id, f"Provedor desconhecido: {provider}") for row in rows)
+                    continue
+                messages = await _build_messages(db, rows)
+                # Alerta removido entre o enfileiramento e o envio: nada a entregar
+                results.update((row.id, None) for row in rows)
+                limiter = self._limiter(provider)
+                if limiter is not None:
+                    await limiter.acquire(len(messages))
+                try:
+                    errors = await transport.send_batch(messages)
+                except Exception as e:
+                    errors = [str(e) or type(e).__name__] * len(messages)
+                results.update((message.outbox_id, error) for message, error in zip(messages, errors))
+                self.stats.by_provider[provider] = self.stats.by_provider.get(provider, 0) + len(messages)
+
+            await self._record(db, results, attempts)
+        self.stats.batches += 1
+        self.stats.last_batch_at = datetime.utcnow()
+        return len(claimed)
+
+    async def _record(self, db: AsyncSession, results: Dict[int, Optional[str]], attempts: Dict[int, int]):
+        now = datetime.utcnow()
+        sent = [outbox_id for outbox_id, error in results.items() if error is None]
+        if sent:
+            await db.execute(
+                update(Outbox).where(Outbox.id.in_(sent))
+                .values(status="sent", sent_at=now, last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+        retried = failed = 0
+        for outbox_id, error in results.items():
+            if error is None:
+                continue
+            if attempts[outbox_id] >= NOTIFICATION_MAX_ATTEMPTS:
+                values = {"status": "failed", "last_error": error[:500]}
+                failed += 1
+            else:
+                values = {"status": "pending", "last_error": error[:500],
+                          "next_attempt_at": now + _backoff(attempts[outbox_id])}
+                retried += 1
+            await db.execute(
+                update(Outbox).where(Outbox.id == outbox_id).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+        self.stats.sent += len(sent)
+        self.stats.retried += retried
+        self.stats.failed += failed
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "sent": self.stats.sent,
+            "retried": self.stats.retried,
+            "failed": self.stats.failed,
+            "batches": self.stats.batches,
+            "last_batch_at": self.stats.last_batch_at.isoformat() if self.stats.last_batch_at else None,
+            "by_provider": self.stats.by_provider,
+        }
+
+
+dispatcher = NotificationDispatcher()
@@ -0,0 +1,225 @@
+# backend/app/passages.py
+#
+# Índice de passagens dos documentos com ranking BM25 (Python puro).
+# - Na indexação, cada documento vira trechos (página -> parágrafos) e o índice invertido
+#   (chunk_terms) e as estatísticas (term_stats, corpus_stats) do condomínio são
+#   incrementados. Nada é reconstruído.
+# - Na busca, só as listas invertidas dos termos da pergunta são lidas; o texto é
+#   carregado apenas para os top-k trechos.
+
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import database, models
+
+# Parâmetros clássicos do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+CHUNK_TARGET_CHARS = 800
+CHUNK_MAX_CHARS = 1500
+
+STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "como", "da", "das", "de", "do", "dos", "e", "ela", "ele", "em",
+    "entre", "era", "essa", "esse", "esta", "este", "eu", "foi", "ha", "isso", "ja", "la", "mais",
+    "mas", "me", "mesmo", "na", "nas", "nao", "no", "nos", "num", "numa", "o", "os", "ou", "para",
+    "pela", "pelas", "pelo", "pelos", "por", "qual", "quais", "quando", "que", "quem", "se", "sem",
+    "ser", "seu", "seus", "so", "sua", "suas", "tem", "ter", "um", "uma", "umas", "uns", "voce",
+    "posso", "pode", "podem", "sobre", "onde",
+}
+
+_WORD_RE = re.compile(r"\w+")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas, sem acentos, sem stopwords e com o plural simples removido."""
+    folded = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+    tokens = []
+    for word in _WORD_RE.findall(folded):
+        if len(word) < 2 or word in STOPWORDS or (word.isdigit() and len(word) > 4):
+            continue
+        if len(word) > 4 and word.endswith("s"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def _split_long(paragraph: str) -> List[str]:
+    if len(paragraph) <= CHUNK_MAX_CHARS:
+        return [paragraph]
+    parts, current = [], ""
+    for sentence in _SENTENCE_RE.split(paragraph):
+        if current and len(current) + len(sentence) > CHUNK_TARGET_CHARS:
+            parts.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        parts.append(current)
+    # Frases gigantes (sem pontuação) são cortadas no limite
+    return [p[i:i + CHUNK_MAX_CHARS] for p in parts for i in range(0, len(p), CHUNK_MAX_CHARS)]
+
+
+def chunk_pages(pages: List[str]) -> List[tuple]:
+    """Quebra as páginas em trechos de ~CHUNK_TARGET_CHARS. Retorna [(página, texto)]."""
+    chunks = []
+    for page_number, page_text in enumerate(pages, start=1):
+        # O pypdf nem sempre separa parágrafos por linha em branco: usamos as duas regras
+        paragraphs = [p.strip() for p in _PARAGRAPH_RE.split(page_text) if p.strip()]
+        if len(paragraphs) <= 1:
+            paragraphs = [line.strip() for line in page_text.splitlines() if line.strip()]
+        current = ""
+        for paragraph in paragraphs:
+            for piece in _split_long(paragraph):
+                if current and len(current) + len(piece) > CHUNK_TARGET_CHARS:
+                    chunks.append((page_number, current))
+                    current = ""
+                current = f"{current}\n{piece}" if current else piece
+        if current:
+            chunks.append((page_number, current))
+    return chunks
+
+
+async def index_document(
+    db: AsyncSession, document_id: int, condominium_id: int, pages: List[str], chunks: Optional[List[tuple]] = None
+) -> int:
+    """Indexa um documento novo de forma incremental (na transação do chamador).
+
+    `chunks` permite reaproveitar trechos já calculados (cache por hash do conteúdo).
+    Retorna o número de trechos criados.
+    """
+    if chunks is None:
+        chunks = chunk_pages(pages)
+    if not chunks:
+        return 0
+
+    # 1. Trechos (um INSERT multi-linha)
+    tokenized = [tokenize(text) for _, text in chunks]
+    result = await db.execute(
+        insert(models.DocumentChunk).returning(models.DocumentChunk.id, models.DocumentChunk.position),
+        [
+            {
+                "document_id": document_id,
+                "condominium_id": condominium_id,
+                "page": page,
+                "position": position,
+                "text": text,
+                "length": len(tokenized[position]),
+            }
+            for position, (page, text) in enumerate(chunks)
+        ]
+    )
+    chunk_ids = {row.position: row.id for row in result}
+
+    # 2. Lista invertida + df dos termos deste documento
+    postings = []
+    doc_df = Counter()
+    for position, tokens in enumerate(tokenized):
+        counts = Counter(tokens)
+        doc_df.update(counts.keys())
+        for term, tf in counts.items():
+            postings.append({
+                "chunk_id": chunk_ids[position],
+                "term": term,
+                "condominium_id": condominium_id,
+                "tf": tf,
+                "chunk_length": len(tokens),
+            })
+    if postings:
+        await db.execute(insert(models.ChunkTerm), postings)
+
+    # 3. Estatísticas do condomínio (upsert incremental)
+    if doc_df:
+        stmt = database.dialect_insert(models.TermStat)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["condominium_id", "term"],
+                set_={"df": models.TermStat.df + stmt.excluded.df},
+            ),
+            [{"condominium_id": condominium_id, "term": term, "df": df} for term, df in doc_df.items()]
+        )
+
+    stmt = database.dialect_insert(models.CorpusStat).values(
+        condominium_id=condominium_id,
+        chunk_count=len(chunks),
+        total_length=sum(len(tokens) for tokens in tokenized),
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["condominium_id"],
+        set_={
+            "chunk_count": models.CorpusStat.chunk_count + stmt.excluded.chunk_count,
+            "total_length": models.CorpusStat.total_length + stmt.excluded.total_length,
+        },
+    ))
+    return len(chunks)
+
+
+async def search_passages(db: AsyncSession, condominium_id: int, question: str, k: int = 5) -> List[dict]:
+    """Top-k trechos do condomínio para a pergunta, ranqueados por BM25."""
+    terms = list(dict.fromkeys(tokenize(question)))
+    if not terms:
+        return []
+
+    corpus = await db.get(models.CorpusStat, condominium_id)
+    if not corpus or not corpus.chunk_count:
+        return []
+    n_chunks = corpus.chunk_count
+    avg_length = (corpus.total_length / n_chunks) or 1.0
+
+    df_rows = await db.execute(
+        select(models.TermStat.term, models.TermStat.df).where(
+            models.TermStat.condominium_id == condominium_id,
+            models.TermStat.term.in_(terms),
+        )
+    )
+    idf = {
+        term: math.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+        for term, df in df_rows
+    }
+    if not idf:
+        return []
+
+    # Só as listas invertidas dos termos presentes no corpus
+    postings = await db.execute(
+        select(models.ChunkTerm.chunk_id, models.ChunkTerm.term, models.ChunkTerm.tf, models.ChunkTerm.chunk_length).where(
+            models.ChunkTerm.condominium_id == condominium_id,
+            models.ChunkTerm.term.in_(list(idf)),
+        )
+    )
+    scores = Counter()
+    for chunk_id, term, tf, length in postings:
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * (length or 0) / avg_length)
+        scores[chunk_id] += idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+
+    top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+    if not top:
+        return []
+
+    # Texto apenas dos trechos vencedores
+    rows = await db.execute(
+        select(
+            models.DocumentChunk.id, models.DocumentChunk.document_id, models.DocumentChunk.page,
+            models.DocumentChunk.text, models.Document.title,
+        ).join(models.Document, models.Document.id == models.DocumentChunk.document_id).where(
+            models.DocumentChunk.id.in_([chunk_id for chunk_id, _ in top])
+        )
+    )
+    by_id = {row.id: row for row in rows}
+    return [
+        {
+            "document_id": by_id[chunk_id].document_id,
+            "title": by_id[chunk_id].title,
+            "page": by_id[chunk_id].page,
+            "text": by_id[chunk_id].text,
+            "score": round(score, 4),
+        }
+        for chunk_id, score in top if chunk_id in by_id
+    ]
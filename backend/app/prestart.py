@@ -7,6 +7,7 @@ sys.path.append(os.getcwd())
 
 from app.database import engine, Base
 from app import models # Garante que todos os modelos sejam importados
+from app.migrations import run_migrations
 
 # 1. Correção Crítica do Prefixo (necessário se o Render não fizer isso)
 db_url = os.getenv("DATABASE_URL")
@@ -17,3 +18,7 @@ print("Verificando e criando tabelas ausentes no banco de dados...")
 # Este comando cria apenas as tabelas que ainda não existem
 Base.metadata.create_all(bind=engine)
 print("Criação de tabelas concluída.")
+
+# 2. Migrações que o create_all não cobre (colunas novas, índices especiais, busca textual)
+run_migrations(engine)
+print("Migrações concluídas.")
@@ -0,0 +1,162 @@
+# backend/app/query_budget.py
+#
+# Orçamento de comandos SQL por request (desenvolvimento e testes): pega N+1 antes da produção.
+# - Um listener de before_cursor_execute nos engines (sync e async) conta os comandos do
+#   request em andamento (ContextVar). Só é instalado com o modo ligado: em produção
+#   (QUERY_BUDGET_MODE=off, o padrão) não há custo nenhum.
+# - Acima do orçamento: "log" avisa com a rota, o total e o SQL mais repetido (o sintoma
+#   típico de N+1); "raise" troca a resposta por um 500 (se ela ainda não começou a ser
+#   enviada), para o teste falhar.
+# - Toda resposta leva X-Query-Count. Rotas que fazem muitos comandos de propósito (ex:
+#   importação em lotes) declaram o próprio limite com dependencies=[query_budget(n)]
+#   (None = sem limite).
+# Complementa o lazy="raise_on_sql" das relações em models.py: carregamento implícito já é
+# erro, então cada rota declara selectinload/joinedload; aqui se pega o resto (consultas
+# em laço feitas à mão).
+
+import json
+import os
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Depends
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off").lower() # off | log | raise
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "10"))
+
+_current: ContextVar[Optional["QueryCounter"]] = ContextVar("query_counter", default=None)
+
+
+class QueryCounter:
+    """Comandos SQL de um request."""
+
+    def __init__(self, budget: Optional[int]):
+        self.budget = budget
+        self.total = 0
+        self.statements: Counter = Counter()
+        self.active = True # Tarefas criadas durante o request herdam o contexto: param de contar no fim dele
+
+    def add(self, statement: str):
+        if self.active:
+            self.total += 1
+            self.statements[statement] += 1
+
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.total > self.budget
+
+    def most_repeated(self):
+        return self.statements.most_common(1)[0] if self.statements else (None, 0)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    if counter is not None:
+        counter.add(statement)
+
+
+def install(*engines):
+    """Liga a contagem nos engines informados (idempotente)."""
+    for engine in engines:
+        if not event.contains(engine, "before_cursor_execute", _count_statement):
+            event.listen(engine, "before_cursor_execute", _count_statement)
+
+
+def query_budget(limit: Optional[int]):
+    """Dependência de rota que troca o orçamento do request (None = sem limite)."""
+    async def set_budget():
+        counter = _current.get()
+        if counter is not None:
+            counter.budget = limit
+    return Depends(set_budget)
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.max_by_route: dict = {}
+        self.violations = 0
+        self.last_violation: Optional[dict] = None
+
+    def record(self, route: str, counter: QueryCounter, violation: Optional[dict]):
+        with self._lock:
+            self.max_by_route[route] = max(self.max_by_route.get(route, 0), counter.total)
+            if violation:
+                self.violations += 1
+                self.last_violation = violation
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "mode": QUERY_BUDGET_MODE,
+                "default_budget": QUERY_BUDGET_DEFAULT,
+                "violations": self.violations,
+                "last_violation": self.last_violation,
+                "max_by_route": dict(self.max_by_route),
+            }
+
+
+stats = _Stats()
+
+
+def _route_path(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "?")
+
+
+class QueryBudgetMiddleware:
+    """Middleware ASGI que conta os comandos SQL de cada request e aplica o orçamento."""
+
+    def __init__(self, app, mode: str = QUERY_BUDGET_MODE, budget: Optional[int] = QUERY_BUDGET_DEFAULT):
+        self.app = app
+        self.mode = mode
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = QueryCounter(self.budget)
+        token = _current.set(counter)
+        replaced = False
+
+        async def send_wrapper(message):
+            nonlocal replaced
+            if replaced:
+                return # A resposta original foi trocada pelo erro de orçamento
+            if message["type"] == "http.response.start":
+                if counter.over_budget() and self.mode == "raise":
+                    replaced = True
+                    body = json.dumps({"detail": self._describe(scope, counter)}).encode()
+                    await send({
+                        "type": "http.response.start", "status": 500,
+                        "headers": [(b"content-type", b"application/json"), (b"x-query-count", str(counter.total).encode())],
+                    })
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                MutableHeaders(scope=message)["X-Query-Count"] = str(counter.total)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            counter.active = False
+            _current.reset(token)
+            violation = None
+            if counter.over_budget():
+                violation = {"route": _route_path(scope), "queries": counter.total, "budget": counter.budget}
+                if not replaced:
+                    # "log", ou comandos feitos depois de a resposta começar (streaming)
+                    print(f"AVISO: {self._describe(scope, counter)}")
+            stats.record(_route_path(scope), counter, violation)
+
+    @staticmethod
+    def _describe(scope, counter: QueryCounter) -> str:
+        statement, times = counter.most_repeated()
+        statement = " ".join((statement or "").split())[:200]
+        return (f"{scope.get('method')} {_route_path(scope)}: {counter.total} comandos SQL "
+                f"(orçamento {counter.budget}); mais repetido ({times}x): {statement}")
@@ -0,0 +1,177 @@
+# backend/app/recurrence.py
+#
+# Recorrência dos alertas de manutenção a partir de period_years.
+# - Cada alerta recorrente é uma ocorrência; next_alert_id aponta para a seguinte. A
+#   "cabeça" da série é a ocorrência com next_alert_id NULL (índice parcial, migração 0008).
+# - Materialização preguiçosa e em lote: quando o vencimento da cabeça passa, o job
+#   "alert_recurrence" do scheduler cria a próxima ocorrência (um INSERT em lote + um
+#   UPDATE em lote por shard). Nunca há mais de uma ocorrência futura por série no banco,
+#   e como period_years >= 1 ela nasce bem antes dos avisos de 30 dias.
+# - Ocorrências mais distantes são só projetadas (calendário, "próximos N dias"), sem
+#   gravar anos de linhas futuras.
+
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .scheduler import Job, scheduler
+
+Alert = models.MaintenanceAlert
+
+RECURRENCE_INTERVAL = float(os.getenv("RECURRENCE_INTERVAL", "86400")) # Diário
+RECURRENCE_SHARDS = int(os.getenv("RECURRENCE_SHARDS", "4"))
+RECURRENCE_BATCH_SIZE = int(os.getenv("RECURRENCE_BATCH_SIZE", "1000"))
+
+# Cabeças de série recorrente (mesmo predicado do índice parcial)
+_SERIES_HEAD = (Alert.next_alert_id.is_(None), Alert.period_years > 0)
+
+_HEAD_COLUMNS = (Alert.id, Alert.type, Alert.due_date, Alert.period_years, Alert.condominium_id)
+
+
+def add_years(day: date, years: int) -> date:
+    """Mesma data `years` anos depois (29/02 vira 28/02 em ano não bissexto)."""
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        return day.replace(year=day.year + years, day=28)
+
+
+def _first_cycle(due_date: date, period_years: int, today: date) -> int:
+    """Primeiro ciclo da série que vence hoje ou depois (séries atrasadas pulam os perdidos)."""
+    cycles = 1
+    while add_years(due_date, cycles * period_years) < today:
+        cycles += 1
+    return cycles
+
+
+def next_due_date(due_date: date, period_years: int, today: date) -> date:
+    return add_years(due_date, _first_cycle(due_date, period_years, today) * period_years)
+
+
+def project(head, until: date, today: date) -> Iterator[date]:
+    """Vencimentos futuros de uma série (a partir da cabeça) até `until`, sem gravar nada."""
+    cycles = _first_cycle(head.due_date, head.period_years, today)
+    due = add_years(head.due_date, cycles * head.period_years)
+    while due <= until:
+        yield due
+        cycles += 1
+        due = add_years(head.due_date, cycles * head.period_years)
+
+
+async def materialize_due(
+    db: AsyncSession,
+    today: Optional[date] = None,
+    shard: int = 0,
+    shards: int = 1,
+    batch_size: int = RECURRENCE_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Cria a próxima ocorrência das séries cujo vencimento já passou (na transação do chamador)."""
+    today = today or date.today()
+    conditions = [*_SERIES_HEAD, Alert.due_date < today]
+    if shards > 1:
+        conditions.append(func.coalesce(Alert.condominium_id, 0) % shards == shard)
+
+    created = 0
+    while True:
+        heads = (await db.execute(
+            select(*_HEAD_COLUMNS).where(*conditions).order_by(Alert.due_date, Alert.id).limit(batch_size)
+        )).all()
+        if not heads:
+            break
+        new_ids = (await db.execute(
+            insert(Alert).returning(Alert.id, sort_by_parameter_order=True),
+            [
+                {
+                    "type": head.type,
+                    "due_date": next_due_date(head.due_date, head.period_years, today),
+                    "period_years": head.period_years,
+                    "condominium_id": head.condominium_id,
+                    "alert_sent_1month": False,
+                    "alert_sent_1week": False,
+                    "alert_sent_1day": False,
+                }
+                for head in heads
+            ],
+        )).scalars().all()
+        # A ocorrência antiga deixa de ser cabeça (sai do índice parcial e desta consulta)
+        await db.execute(
+            update(Alert.__table__).where(Alert.__table__.c.id == bindparam("head_id"))
+            .values(next_alert_id=bindparam("new_id")),
+            [{"head_id": head.id, "new_id": new_id} for head, new_id in zip(heads, new_ids)],
+        )
+        created += len(heads)
+        if len(heads) < batch_size:
+            break
+    return {"created": created}
+
+
+def _occurrence(alert, due_date: Optional[date] = None) -> dict:
+    """Ocorrência gravada (`alert`) ou projetada a partir dela (com `due_date`)."""
+    projected = due_date is not None
+    return {
+        "id": None if projected else alert.id,
+        "type": alert.type,
+        "due_date": due_date if projected else alert.due_date,
+        "period_years": alert.period_years,
+        "condominium_id": alert.condominium_id,
+        "alert_sent_1month": False if projected else bool(alert.alert_sent_1month),
+        "alert_sent_1week": False if projected else bool(alert.alert_sent_1week),
+        "alert_sent_1day": False if projected else bool(alert.alert_sent_1day),
+        "projected": projected,
+        "source_alert_id": alert.id if projected else None,
+    }
+
+
+async def projected_occurrences(
+    db: AsyncSession,
+    until: date,
+    today: Optional[date] = None,
+    condominium_id: Optional[int] = None,
+) -> List[dict]:
+    """Ocorrências futuras (ainda não materializadas) até `until`, projetadas das cabeças de série."""
+    today = today or date.today()
+    # Período mínimo de 1 ano: cabeças que vencem depois de until - 1 ano não projetam nada
+    stmt = select(*_HEAD_COLUMNS).where(*_SERIES_HEAD, Alert.due_date <= add_years(until, -1))
+    if condominium_id is not None:
+        stmt = stmt.where(Alert.condominium_id == condominium_id)
+    return [
+        _occurrence(head, due_date)
+        for head in await db.execute(stmt)
+        for due_date in project(head, until, today)
+    ]
+
+
+async def upcoming(
+    db: AsyncSession,
+    days: int,
+    today: Optional[date] = None,
+    condominium_id: Optional[int] = None,
+) -> List[dict]:
+    """Vencimentos nos próximos `days` dias (todos os condomínios, ou só um): as ocorrências
+    gravadas vêm por faixa do índice em due_date; as das séries, projetadas das cabeças."""
+    today = today or date.today()
+    until = today + timedelta(days=days)
+    stmt = select(Alert).where(Alert.due_date >= today, Alert.due_date <= until)
+    if condominium_id is not None:
+        stmt = stmt.where(Alert.condominium_id == condominium_id)
+    occurrences = [_occurrence(alert) for alert in (await db.execute(stmt)).scalars()]
+    occurrences += await projected_occurrences(db, until, today, condominium_id)
+    occurrences.sort(key=lambda o: (o["due_date"], o["condominium_id"] or 0))
+    return occurrences
+
+
+async def _run_shard(db: AsyncSession, shard: int, shards: int) -> Dict[str, int]:
+    return await materialize_due(db, shard=shard, shards=shards)
+
+
+recurrence_job = Job(
+    name="alert_recurrence",
+    interval=RECURRENCE_INTERVAL,
+    run_shard=_run_shard,
+    shards=RECURRENCE_SHARDS,
+)
+scheduler.register(recurrence_job)
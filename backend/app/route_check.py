@@ -0,0 +1,87 @@
+# backend/app/route_check.py
+#
+# Checagem da tabela de rotas na subida: acha rotas que nunca são alcançadas porque uma
+# rota registrada antes (mesmo método) já casa com o caminho delas. O Starlette testa as
+# rotas na ordem de registro e para na primeira que casa; a sombreada só custa uma entrada
+# a mais percorrida em cada request (ex: dois routers com o mesmo prefixo, ou
+# "/x/{id}" registrado antes de "/x/export").
+# ROUTE_CHECK_STRICT=true faz a subida falhar em vez de só avisar.
+
+import os
+import re
+from typing import Iterable, List, NamedTuple
+
+try: # FastAPI recente guarda os routers incluídos aninhados; iter_route_contexts achata a tabela
+    from fastapi.routing import iter_route_contexts
+except ImportError: # Versões antigas copiam as rotas para app.routes
+    iter_route_contexts = None
+
+ROUTE_CHECK_STRICT = os.getenv("ROUTE_CHECK_STRICT", "false").lower() == "true"
+
+_PARAM = re.compile(r"{([^}:]+)(?::([^}]+))?}")
+
+# Valor de exemplo por conversor de parâmetro do Starlette
+_SAMPLES = {None: "sample", "str": "sample", "path": "sample", "int": "1", "float": "1.0", "uuid": "00000000-0000-0000-0000-000000000000"}
+
+
+class ShadowedRoute(NamedTuple):
+    path: str
+    methods: frozenset
+    endpoint: str
+    shadowed_by_path: str
+    shadowed_by_endpoint: str
+
+    def __str__(self):
+        methods = ",".join(sorted(self.methods))
+        return (f"{methods} {self.path} ({self.endpoint}) nunca é alcançada: "
+                f"{self.shadowed_by_path} ({self.shadowed_by_endpoint}) casa antes")
+
+
+def _sample_path(path: str) -> str:
+    """Caminho concreto que casa com `path` (parâmetros trocados por valores de exemplo)."""
+    return _PARAM.sub(lambda m: _SAMPLES.get(m.group(2), "sample"), path)
+
+
+def _flatten(routes: Iterable) -> list:
+    routes = list(routes)
+    return list(iter_route_contexts(routes)) if iter_route_contexts else routes
+
+
+def _name(route) -> str:
+    endpoint = route.endpoint
+    return f"{getattr(endpoint, '__module__', '?')}.{getattr(endpoint, '__qualname__', route.name)}"
+
+
+def find_shadowed_routes(routes: Iterable) -> List[ShadowedRoute]:
+    """Rotas HTTP cujo caminho já é capturado, para todos os métodos delas, por rotas anteriores."""
+    earlier = []
+    shadowed = []
+    for route in _flatten(routes):
+        if not getattr(route, "methods", None) or getattr(route, "path_regex", None) is None:
+            continue # Mount, WebSocket etc.
+        sample = _sample_path(route.path)
+        uncovered = set(route.methods) - {"HEAD"}
+        blockers = []
+        for previous in earlier:
+            if previous.path_regex.match(sample) and uncovered & previous.methods:
+                uncovered -= previous.methods
+                blockers.append(previous)
+                if not uncovered:
+                    break
+        if not uncovered and blockers:
+            shadowed.append(ShadowedRoute(
+                route.path, frozenset(set(route.methods) - {"HEAD"}), _name(route),
+                blockers[0].path, _name(blockers[0]),
+            ))
+        earlier.append(route)
+    return shadowed
+
+
+def check_routes(routes: Iterable, strict: bool = ROUTE_CHECK_STRICT) -> List[ShadowedRoute]:
+    """Avisa (ou, com strict, falha) se houver rotas sombreadas."""
+    shadowed = find_shadowed_routes(routes)
+    for item in shadowed:
+        print(f"AVISO: rota sombreada: {item}")
+    if shadowed and strict:
+        raise RuntimeError(f"{len(shadowed)} rota(s) sombreada(s); veja os avisos acima.")
+    return shadowed
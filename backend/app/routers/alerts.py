@@ -1,21 +1,58 @@
 # backend/app/routers/alerts.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import date, timedelta # ⬅️ Importar timedelta
-from .. import database, models, auth, schemas
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from datetime import date, datetime, timedelta # ⬅️ Importar timedelta
+from typing import Optional
+from .. import alert_scheduler, database, exports, models, auth, recurrence, schemas
+from ..query_budget import query_budget
+from ..scheduler import scheduler
+from ..serialization import ListSerializer
 from sqlalchemy.exc import IntegrityError
 
 router = APIRouter(prefix="/alerts", tags=["Maintenance Alerts & Scheduler"])
 
 get_db = database.get_db
 
+occurrence_list = ListSerializer(schemas.MaintenanceAlertOccurrence)
+
+ALERT_PROJECTION_MAX_YEARS = int(os.getenv("ALERT_PROJECTION_MAX_YEARS", "10"))
+
+# Token do cron externo (opcional). Sem ele, só Programadores autenticados disparam o scheduler.
+SCHEDULER_TOKEN = os.getenv("SCHEDULER_TOKEN")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+
+async def require_scheduler_access(
+    x_scheduler_token: Optional[str] = Header(None),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_db),
+):
+    if x_scheduler_token is not None:
+        if SCHEDULER_TOKEN and hmac.compare_digest(x_scheduler_token, SCHEDULER_TOKEN):
+            return
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token do scheduler inválido.")
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    current_user = await auth.get_current_user(token, db)
+    if current_user.role != 'Programador':
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas Programadores podem executar o scheduler ou ver as métricas internas.")
+
 # --- ROTA 1: CRIAÇÃO (Chamada pelo App Flutter) ---
 @router.post("/", response_model=schemas.MaintenanceAlertResponse, status_code=201, summary="Cadastrar novo Aviso de Manutenção")
-def create_maintenance_alert(
+async def create_maintenance_alert(
     alert: schemas.MaintenanceAlertCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
 ):
     """Permite cadastrar um novo prazo de manutenção (seguro, PPCI, etc.)."""
     
@@ -29,10 +66,10 @@ def create_maintenance_alert(
     # 3. TRATAMENTO DE ERRO CRÍTICO
     try:
         db.add(db_alert)
-        db.commit() # 🚨 O CRASH DE FK OCORRE AQUI
-        db.refresh(db_alert)
+        await db.commit() # 🚨 O CRASH DE FK OCORRE AQUI
+        await db.refresh(db_alert)
     except IntegrityError as e:
-        db.rollback() 
+        await db.rollback() 
         # A mensagem de erro que o Render esconde é capturada e retornada de forma limpa.
         raise HTTPException(
             status_code=400, 
@@ -42,68 +79,78 @@ def create_maintenance_alert(
     return db_alert
 
 
-# --- ROTA 2: SCHEDULER (Chamada pelo CRON JOB do Render) ---
-@router.get("/run-scheduler", summary="Executar Verificação Diária de Vencimentos", include_in_schema=False)
-def run_daily_scheduler(db: Session = Depends(get_db)):
+# --- ROTA 2: SCHEDULER (execução manual; o scheduler interno já roda o job sozinho) ---
+@router.get(
+    "/run-scheduler",
+    summary="Executar Verificação Diária de Vencimentos",
+    include_in_schema=False,
+    dependencies=[query_budget(None)], # Todos os shards do job no mesmo request
+)
+async def run_daily_scheduler(_: None = Depends(require_scheduler_access)):
     """
-    Esta rota é chamada diariamente por um Cron Job externo.
-    Verifica se os prazos de manutenção atingiram 30, 7 ou 1 dia de antecedência.
+    Dispara agora o job de vencimentos (30, 7 ou 1 dia de antecedência) do scheduler interno.
+    Exige o header X-Scheduler-Token (SCHEDULER_TOKEN) ou um Programador autenticado.
     """
-    
-    today = date.today()
-    
-    # 1. Buscar todos os alertas que AINDA NÃO VENCERAM e que NÃO FORAM FINALIZADOS.
-    # Assumimos que o due_date é sempre no futuro.
-    alerts = db.query(models.MaintenanceAlert).filter(
-        models.MaintenanceAlert.due_date >= today
-    ).all()
-    
-    updated_alerts = []
+    run_key = f"manual-{datetime.utcnow():%Y%m%dT%H%M%S.%f}"
+    fired = await scheduler.run_job(alert_scheduler.alerts_job.name, run_key=run_key)
 
-    for alert in alerts:
-        # Calcular a diferença em dias entre o vencimento e hoje
-        days_to_due = (alert.due_date - today).days
-        
-        updated = False
-        
-        # 🚨 AVALIAÇÃO DE PRAZOS (Usamos <= para garantir que o alerta dispare se for hoje ou menos)
+    updated_alerts = sorted({alert_id for ids in fired.values() for alert_id in ids})
+    return {
+        "status": "Scheduler finished",
+        "alerts_dispatched": len(updated_alerts),
+        "updated_ids": updated_alerts,
+        "thresholds": {name: len(ids) for name, ids in fired.items()},
+    }
 
-        # 1. Alerta de 1 Mês (30 dias)
-        if days_to_due <= 30 and not alert.alert_sent_1month:
-            alert.alert_sent_1month = True
-            updated = True
-        
-        # 2. Alerta de 1 Semana (7 dias)
-        if days_to_due <= 7 and not alert.alert_sent_1week:
-            alert.alert_sent_1week = True
-            updated = True
-            
-        # 3. Alerta de 1 Dia
-        if days_to_due <= 1 and not alert.alert_sent_1day:
-            alert.alert_sent_1day = True
-            updated = True
-
-        if updated:
-            db.add(alert)
-            updated_alerts.append(alert.id)
-            
-    db.commit()
-    
-    return {"status": "Scheduler finished", "alerts_dispatched": len(updated_alerts), "updated_ids": updated_alerts}
+@router.get("/export", summary="Exportar Alertas de Manutenção (NDJSON/CSV em streaming)")
+async def export_maintenance_alerts(
+    format: str = "ndjson",
+    condominium_id: Optional[int] = None,
+    updated_since: Optional[datetime] = None,
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
+):
+    """Alertas do condomínio (ou só os alterados após updated_since), enviados em lotes."""
+    stmt = select(*models.MaintenanceAlert.__table__.columns)
+    condominium_id = exports.export_condominium_id(current_user, condominium_id)
+    if condominium_id is not None:
+        stmt = stmt.where(models.MaintenanceAlert.condominium_id == condominium_id)
+    stmt = exports.incremental(stmt, models.MaintenanceAlert, updated_since)
+    return exports.export_response(stmt, format, "maintenance_alerts")
+
+@router.get("/upcoming", response_model=list[schemas.MaintenanceAlertOccurrence], summary="Vencimentos dos Próximos N Dias")
+async def list_upcoming_alerts(
+    days: int = Query(30, ge=0, le=366 * ALERT_PROJECTION_MAX_YEARS),
+    condominium_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
+):
+    """Vencimentos (gravados e projetados por period_years) de todos os condomínios, para
+    Programadores, ou do condomínio do usuário."""
+    if current_user.role != 'Programador':
+        # Mesma regra das exportações: sem condomínio vinculado não cai no "todos" (None)
+        if current_user.condominium_id is None:
+            raise HTTPException(status_code=403, detail="Usuário sem condomínio vinculado.")
+        if condominium_id is not None and condominium_id != current_user.condominium_id:
+            raise HTTPException(status_code=403, detail="Não autorizado a acessar alertas deste condomínio.")
+        condominium_id = current_user.condominium_id
+    return occurrence_list.response(await recurrence.upcoming(db, days, condominium_id=condominium_id))
 
 @router.get(
     "/list/{condominium_id}",
-    response_model=list[schemas.MaintenanceAlertResponse],
+    response_model=list[schemas.MaintenanceAlertOccurrence],
     status_code=status.HTTP_200_OK,
     summary="Listar Alertas de Manutenção por Condomínio"
 )
-def list_maintenance_alerts(
+async def list_maintenance_alerts(
     condominium_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    projected_until: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
 ):
     """
     Busca todos os alertas de manutenção ativos para um condomínio específico.
+    Com projected_until, inclui no calendário as próximas ocorrências das séries
+    recorrentes (period_years) até essa data, sem gravá-las (projected=true).
     """
     
     # 🚨 Adicionar Lógica de Segurança
@@ -115,9 +162,19 @@ def list_maintenance_alerts(
         )
         
     # Busca os alertas no banco de dados.
-    alerts = db.query(models.MaintenanceAlert).filter(
+    result = await db.execute(select(models.MaintenanceAlert).where(
         models.MaintenanceAlert.condominium_id == condominium_id
-    ).order_by(models.MaintenanceAlert.due_date).all()
-    
-    # Retorna a lista, que será serializada pelo Pydantic (response_model)
-    return alerts
+    ).order_by(models.MaintenanceAlert.due_date))
+    alerts = result.scalars().all()
+
+    if projected_until is None:
+        # Validação única por alerta e JSON pré-renderizado (ver serialization.py)
+        return occurrence_list.response(alerts)
+
+    max_until = recurrence.add_years(date.today(), ALERT_PROJECTION_MAX_YEARS)
+    if projected_until > max_until:
+        raise HTTPException(status_code=400, detail=f"projected_until deve ser no máximo {max_until.isoformat()}.")
+    calendar = occurrence_list.from_objects(alerts)
+    calendar += await recurrence.projected_occurrences(db, projected_until, condominium_id=condominium_id)
+    calendar.sort(key=lambda occurrence: occurrence["due_date"])
+    return occurrence_list.response(calendar)
@@ -1,68 +1,122 @@
 # backend/app/routers/condominiums.py
+#
+# Todas as rotas de /condominiums (listagem, criação, tema/detalhes e alteração).
+# Antes havia um segundo router (condominium.py) com o mesmo prefixo e as mesmas rotas:
+# o primeiro registrado ganhava e o outro só aumentava a tabela de rotas.
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from .. import database, models, auth, schemas
+from .. import condominium_cache
+from ..serialization import ListSerializer
 
-router = APIRouter(prefix="/condominiums", tags=["Condominium Management"])
+router = APIRouter(prefix="/condominiums", tags=["Condominiums"])
 
 get_db = database.get_db
 
-@router.get("/", response_model=list[schemas.CondominiumResponse], summary="Listar Condomínios acessíveis")
-def list_condominiums(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+condominium_list = ListSerializer(schemas.CondominiumResponse)
+
+CREATOR_ROLES = ['Programador', 'Administrativo']
+
+@router.get("/", response_model=list[schemas.CondominiumResponse], summary="Listar Condomínios Acessíveis")
+async def list_condominiums(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
 ):
     """
     Lista todos os condomínios acessíveis ao usuário logado.
-    Programadores veem todos; outros perfis veem apenas o(s) vinculado(s).
+    Programadores veem todos; outros perfis veem apenas o vinculado.
+    Resposta cacheada com ETag (304 com If-None-Match).
     """
-    
-    if current_user.role == 'Programador':
-        # Permite que Programadores vejam todos
-        condos = db.query(models.Condominium).all()
-    else:
-        # Perfis normais veem apenas o seu condomínio vinculado
-        condos = db.query(models.Condominium).filter(
-            models.Condominium.id == current_user.condominium_id
-        ).all()
-        
-    return condos
-
-@router.post("/", response_model=schemas.CondominiumResponse, status_code=status.HTTP_201_CREATED)
-def create_condominium(
-    condo: schemas.CondominiumCreate, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user) # Protegido por autenticação
+
+    # Programador vê todos os condomínios; usuários comuns, apenas o vinculado
+    scope = condominium_cache.ALL if current_user.role == 'Programador' else current_user.condominium_id
+
+    async def load() -> bytes:
+        stmt = select(models.Condominium)
+        if scope is not condominium_cache.ALL:
+            stmt = stmt.where(models.Condominium.id == scope) # Filtra pelo ID vinculado ao usuário
+        result = await db.execute(stmt)
+        return condominium_list.render(condominium_list.validate(condominium_list.from_objects(result.scalars().all())))
+
+    return await condominium_cache.cached_response(request, condominium_cache.list_key(scope), load)
+
+@router.post("/", response_model=schemas.CondominiumResponse, status_code=status.HTTP_201_CREATED, summary="Criar um novo Condomínio")
+async def create_condominium(
+    condo: schemas.CondominiumCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user) # Protegido por autenticação
 ):
     """Cria um novo registro de condomínio (necessário antes de criar usuários/vistorias)."""
-    
-    # 1. Checa se o CNPJ já existe
-    db_condo = db.query(models.Condominium).filter(models.Condominium.cnpj == condo.cnpj).first()
-    if db_condo:
-        raise HTTPException(status_code=400, detail="CNPJ já registrado.")
 
-    if current_user.role not in ['Programador', 'Administrativo']:
+    # 1. Restrição por perfil (antes de qualquer consulta)
+    if current_user.role not in CREATOR_ROLES:
          raise HTTPException(status_code=403, detail="Acesso negado. Apenas Programadores ou Administradores podem criar condomínios.")
-    
-    # 2. Cria a instância do modelo
+
+    # 2. Checa se o CNPJ já existe
+    if await db.scalar(select(models.Condominium.id).where(models.Condominium.cnpj == condo.cnpj)):
+        raise HTTPException(status_code=400, detail="CNPJ já registrado.")
+
+    # 3. Cria a instância do modelo. Com expire_on_commit=False o objeto continua carregado
+    # depois do commit (o id vem do INSERT e os defaults são aplicados no flush): não precisa
+    # de refresh nem de buscar de novo pelo CNPJ.
     db_condo = models.Condominium(**condo.model_dump())
-    
+
     db.add(db_condo)
-    db.commit()
-    db.refresh(db_condo)
-    db_condo = db.query(models.Condominium).filter(models.Condominium.cnpj == condo.cnpj).first()
+    await db.commit()
+    condominium_cache.invalidate(db_condo.id)
     return db_condo
 
-@router.get("/{condominium_id}", response_model=schemas.CondominiumResponse)
-def get_condominium(
-    condominium_id: int, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+@router.get("/{condominium_id}", response_model=schemas.CondominiumResponse, summary="Obter Configuração de Tema do Condomínio")
+async def get_condo_config(
+    condominium_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
 ):
-    """Busca detalhes de um condomínio específico."""
-    db_condo = db.query(models.Condominium).filter(models.Condominium.id == condominium_id).first()
-    if db_condo is None:
-        raise HTTPException(status_code=404, detail="Condomínio não encontrado")
-    
+    """
+    Retorna os detalhes do condomínio, incluindo cores e URL do logo.
+    Requer autenticação e verifica se o usuário pertence a este condomínio.
+    Resposta cacheada com ETag: o app reenvia If-None-Match e recebe 304 se o tema não mudou.
+    """
+
+    # 1. Verifica a autorização (Obrigatório para segurança; não depende do banco)
+    if current_user.condominium_id != condominium_id:
+        # Se for o Programador (que precisa ver todos), ignore a restrição
+        if current_user.role != 'Programador':
+             raise HTTPException(status_code=403, detail="Acesso negado.")
+
+    # 2. Busca o condomínio (só em cache miss)
+    async def load() -> bytes:
+        condo = await db.get(models.Condominium, condominium_id)
+        if not condo:
+            raise HTTPException(status_code=404, detail="Condomínio não encontrado.")
+        return schemas.CondominiumResponse.model_validate(condo).model_dump_json().encode()
+
+    return await condominium_cache.cached_response(request, condominium_cache.condominium_key(condominium_id), load)
+
+@router.patch("/{condominium_id}", response_model=schemas.CondominiumResponse, summary="Atualizar Condomínio (tema, logo, dados)")
+async def update_condominium(
+    condominium_id: int,
+    changes: schemas.CondominiumUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
+):
+    """Altera só os campos enviados. Programador/Administrativo alteram qualquer condomínio; Síndico, o seu."""
+
+    if current_user.role not in ['Programador', 'Administrativo']:
+        if current_user.role != 'Sindico' or current_user.condominium_id != condominium_id:
+            raise HTTPException(status_code=403, detail="Acesso negado.")
+
+    db_condo = await db.get(models.Condominium, condominium_id)
+    if not db_condo:
+        raise HTTPException(status_code=404, detail="Condomínio não encontrado.")
+
+    for field, value in changes.model_dump(exclude_unset=True).items():
+        setattr(db_condo, field, value)
+    await db.commit()
+    # Próximo GET recarrega do banco e gera um ETag novo
+    condominium_cache.invalidate(condominium_id)
     return db_condo
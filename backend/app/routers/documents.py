@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from .. import database, models, schemas, auth
-from ..utils.pdf_extractor import extract_text_from_pdf
+import os
+from .. import database, models, schemas, auth, search, passages, document_indexer
+from ..utils.storage import delete_stored
 
 router = APIRouter(prefix="/documents", tags=["Documents & AI"])
 
@@ -12,69 +12,96 @@ async def upload_document(
     title: str = Form(...),
     condominium_id: int = Form(...),
     file: UploadFile = File(...),
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_db)
 ):
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Apenas PDFs são permitidos.")
 
-    # 1. Extrair Texto para a IA
-    extracted_text = await extract_text_from_pdf(file)
+    # 1. Grava o PDF em disco, em blocos (não fica inteiro na memória), já calculando o SHA-256
+    spooled = await document_indexer.spool_upload(file)
+    spool = spooled.path
+    stored = None
+    try:
+        # 2. Storage deduplicado: o mesmo arquivo é guardado uma vez só, para todos os Documents
+        file_path, stored = await document_indexer.store_content(db, spooled)
 
-    # 2. Salvar metadados no Banco
-    # (Em produção, salve o arquivo no S3/Supabase Storage e guarde a URL em file_path)
-    fake_path = f"storage/{file.filename}" 
-    
-    db_doc = models.Document(
-        title=title,
-        file_path=fake_path,
-        content_text=extracted_text, # O texto puro fica salvo aqui para busca
-        condominium_id=condominium_id
-    )
-    db.add(db_doc)
-    db.commit()
+        db_doc = models.Document(
+            title=title,
+            file_path=file_path,
+            content_text=None, # Preenchido pela indexação (cache ou background)
+            content_hash=spooled.content_hash,
+            condominium_id=condominium_id,
+            index_status="pendente"
+        )
+        db.add(db_doc)
+
+        # 3. Arquivo já extraído antes (outro condomínio, outro título): usa o cache, sem pypdf
+        content = await db.get(models.DocumentContent, spooled.content_hash)
+        if content is not None:
+            await document_indexer.index_from_cache(db, db_doc, content)
+        else:
+            # O spool vai para o caminho definitivo antes do commit: documento "pendente"
+            # commitado sempre tem o arquivo para a fila (ou para o requeue após um crash)
+            await db.flush()
+            os.replace(spool, document_indexer.spool_path(db_doc.id))
+            spool = document_indexer.spool_path(db_doc.id)
+        await db.commit()
+    except BaseException:
+        # Nada foi commitado: sem spool nem arquivo novo no storage sobrando
+        await db.rollback()
+        document_indexer.discard_file(spool)
+        if stored is not None:
+            await delete_stored([stored])
+        raise
+
+    if content is not None:
+        document_indexer.discard_file(spool)
+        return {"status": "Documento salvo e indexado", "id": db_doc.id, "index_status": db_doc.index_status}
+
+    # 4. Extração do texto (pool de processos) + índice de passagens ficam para a fila
+    document_indexer.index_queue.enqueue(db_doc.id)
     
-    return {"status": "Documento indexado com sucesso", "id": db_doc.id}
+    return {"status": "Documento recebido; indexação em andamento", "id": db_doc.id, "index_status": db_doc.index_status}
+
+@router.get("/{document_id}/status", response_model=dict)
+async def get_document_status(document_id: int, db: AsyncSession = Depends(database.get_db)):
+    """Situação da indexação: pendente, processando, indexado ou erro."""
+    db_doc = await db.get(models.Document, document_id)
+    if not db_doc:
+        raise HTTPException(status_code=404, detail="Documento não encontrado.")
+    return {"id": db_doc.id, "index_status": db_doc.index_status, "index_error": db_doc.index_error}
 
 @router.get("/ask")
-def ask_ai(question: str, condominium_id: int, db: Session = Depends(database.get_db)):
+async def ask_ai(question: str, condominium_id: int, top_k: int = Query(5, ge=1, le=20), db: AsyncSession = Depends(database.get_db)):
     """
     Simula uma IA buscando respostas nos documentos do condomínio.
     """
-    # 1. Busca simples por palavras-chave (Para MVP)
-    # Divide a pergunta em palavras chaves (ignorando 'de', 'para', etc se quiser melhorar)
-    keywords = [w for w in question.split() if len(w) > 3]
-    
-    if not keywords:
+    if not search.keywords(question):
         return {"answer": "Por favor, faça uma pergunta mais específica."}
 
-    # 2. Procura documentos que contenham as palavras
-    filters = []
-    for word in keywords:
-        filters.append(models.Document.content_text.ilike(f"%{word}%"))
-    
-    # Busca docs que tenham pelo menos uma das palavras chaves no texto
-    results = db.query(models.Document).filter(
-        models.Document.condominium_id == condominium_id,
-        or_(*filters)
-    ).all()
+    # 1. Top-k trechos pelo índice de passagens (BM25)
+    top_passages = await passages.search_passages(db, condominium_id, question, k=top_k)
+    if top_passages:
+        found_snippets = [
+            f"No documento '{p['title']}' (pág. {p['page']}): ...{' '.join(p['text'].split())}..."
+            for p in top_passages
+        ]
+        final_response = "Encontrei as seguintes informações:\n\n" + "\n\n".join(found_snippets)
+        return {"answer": final_response, "passages": top_passages}
+
+    # 2. Documentos antigos (sem trechos indexados): busca textual ranqueada
+    # (índice tsvector/GIN no Postgres, FTS5 no SQLite)
+    results = await search.search_documents(db, condominium_id, question)
 
     if not results:
         return {"answer": "Não encontrei informações sobre isso nos documentos cadastrados."}
 
-    # 3. Extrai o contexto (Snippet)
-    # Pega o trecho do texto onde a palavra aparece
+    # 3. O trecho (snippet) já vem do banco, em volta dos termos encontrados
     found_snippets = []
     for doc in results:
-        text_lower = doc.content_text.lower()
-        for word in keywords:
-            idx = text_lower.find(word.lower())
-            if idx != -1:
-                # Pega 100 caracteres antes e 300 depois
-                start = max(0, idx - 100)
-                end = min(len(doc.content_text), idx + 300)
-                snippet = doc.content_text[start:end].replace("\n", " ")
-                found_snippets.append(f"No documento '{doc.title}': ...{snippet}...")
-                break # Um snippet por documento é suficiente por enquanto
+        if doc['snippet']:
+            snippet = doc['snippet'].replace("\n", " ")
+            found_snippets.append(f"No documento '{doc['title']}': ...{snippet}...")
 
     if not found_snippets:
         return {"answer": "O termo consta nos documentos, mas não consegui extrair um contexto claro."}
@@ -1,51 +1,118 @@
 # Adicione em backend/app/routers/financial.py ou no main.py
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from typing import List
-from datetime import datetime, timedelta
-from .. import database, models, auth, schemas
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic_core import to_json
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import extract, select
+from typing import List, Optional
+from datetime import date, datetime
+from .. import database, exports, financial_import, financial_reports, financial_rollup, models, auth, schemas
+from ..query_budget import query_budget
 
 router = APIRouter(prefix="/financial", tags=["Financial"])
 
+DASHBOARD_CHART_MONTHS = 6
+
+@router.get("/export", summary="Exportar Lançamentos Financeiros (NDJSON/CSV em streaming)")
+async def export_financial_records(
+    format: str = "ndjson",
+    condominium_id: Optional[int] = None,
+    updated_since: Optional[datetime] = None,
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
+):
+    """Lançamentos do condomínio (ou só os alterados após updated_since), enviados em lotes."""
+    stmt = select(*models.FinancialRecord.__table__.columns)
+    condominium_id = exports.export_condominium_id(current_user, condominium_id)
+    if condominium_id is not None:
+        stmt = stmt.where(models.FinancialRecord.condominium_id == condominium_id)
+    stmt = exports.incremental(stmt, models.FinancialRecord, updated_since)
+    return exports.export_response(stmt, format, "financial_records")
+
+@router.post(
+    "/import",
+    summary="Importar Extrato (CSV/OFX) com Progresso em Streaming",
+    dependencies=[query_budget(None)], # Um lote por vez: o número de comandos cresce com o arquivo
+)
+async def import_financial_statement(
+    condominium_id: int = Form(...),
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    category: Optional[str] = Form(None),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
+):
+    """Importa os lançamentos do extrato (duplicados são ignorados).
+    A resposta é NDJSON: uma linha de progresso por lote (linhas/s, inseridas, duplicadas,
+    inválidas) e a última com done=true e os erros de validação."""
+    if current_user.role != 'Programador' and current_user.condominium_id != condominium_id:
+        raise HTTPException(status_code=403, detail="Não autorizado a importar dados deste condomínio.")
+    try:
+        fmt = financial_import.detect_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Arquivo temporário anônimo: apagado ao fechar, sem caminho para vazar se o cliente
+    # desconectar antes de o streaming começar (o gerador nem chega a rodar)
+    binary = await financial_import.spool_upload(file)
+    try:
+        rows = financial_import.read_file(binary, fmt)
+    except ValueError as e:
+        binary.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def progress_lines():
+        # Sessão própria: a importação continua depois que a rota retorna (streaming)
+        try:
+            async with database.AsyncSessionLocal() as db:
+                async for progress in financial_import.import_batches(db, condominium_id, rows, category):
+                    yield to_json(progress.as_dict()) + b"\n"
+        finally:
+            binary.close()
+
+    # O BackgroundTask fecha o arquivo também quando a resposta termina sem iterar o gerador
+    return StreamingResponse(progress_lines(), media_type="application/x-ndjson", background=BackgroundTask(binary.close))
+
+@router.get("/reports", summary="Relatório Financeiro por Período (mês, trimestre, ano)")
+async def get_financial_report(
+    period: str = "month",
+    condominium_id: Optional[List[int]] = Query(None),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
+):
+    """Saldos por período (com saldo acumulado) e quebra por categoria, em centavos.
+    Programadores podem pedir vários condomínios (ou todos); os demais só o seu."""
+    if period not in financial_reports.PERIODS:
+        raise HTTPException(status_code=400, detail=f"Período inválido. Use: {', '.join(financial_reports.PERIODS)}.")
+    if current_user.role != 'Programador':
+        if condominium_id and condominium_id != [current_user.condominium_id]:
+            raise HTTPException(status_code=403, detail="Não autorizado a acessar dados deste condomínio.")
+        condominium_id = [current_user.condominium_id]
+
+    ledger = await financial_reports.load_ledger(db, condominium_id, start, end)
+    return {
+        "period": period,
+        "balances": ledger.balances(period),
+        "categories": ledger.by_category(),
+    }
+
 @router.get("/dashboard-stats")
-def get_financial_stats(condominium_id: int, db: Session = Depends(database.get_db)):
-    # 1. Totais do Mês Atual
-    today = datetime.now()
-    month_start = today.replace(day=1, hour=0, minute=0, second=0)
-    
-    # Query base para o condomínio e mês atual
-    base_query = db.query(
-        models.FinancialRecord.type,
-        func.sum(models.FinancialRecord.amount).label("total")
-    ).filter(
-        models.FinancialRecord.condominium_id == condominium_id,
-        models.FinancialRecord.date >= month_start
-    ).group_by(models.FinancialRecord.type).all()
-
-    income = next((x.total for x in base_query if x.type == 'Receita'), 0.0)
-    expense = next((x.total for x in base_query if x.type == 'Despesa'), 0.0)
-    
-    # 2. Dados para o Gráfico (Últimos 6 meses)
-    # Lógica simplificada: Agrupar por mês
-    six_months_ago = today - timedelta(days=180)
-    chart_data_query = db.query(
-        func.to_char(models.FinancialRecord.date, 'YYYY-MM').label("month"),
-        models.FinancialRecord.type,
-        func.sum(models.FinancialRecord.amount)
-    ).filter(
-        models.FinancialRecord.condominium_id == condominium_id,
-        models.FinancialRecord.date >= six_months_ago
-    ).group_by("month", models.FinancialRecord.type).order_by("month").all()
-    
-    # Processar chart_data para formato JSON amigável ao Flutter
-    # ... (Lógica de transformação de dados omitida para brevidade)
-    
+async def get_financial_stats(condominium_id: int, db: AsyncSession = Depends(database.get_db)):
+    # Lê só os totais mensais pré-agregados (ver financial_rollup.py): O(meses), não O(lançamentos)
+    current_month = financial_rollup.month_start(date.today())
+    first_month = financial_rollup.add_months(current_month, -(DASHBOARD_CHART_MONTHS - 1))
+    totals = await financial_rollup.monthly_totals(db, condominium_id, first_month, current_month)
+
+    # Gráfico: um ponto por mês (últimos DASHBOARD_CHART_MONTHS meses, o atual por último)
+    chart_data = financial_rollup.chart_data(totals, first_month, DASHBOARD_CHART_MONTHS)
+    current = chart_data[-1]
+
     return {
         "current_month": {
-            "income": income,
-            "expense": expense,
-            "balance": income - expense
+            "income": current["income"],
+            "expense": current["expense"],
+            "balance": current["balance"]
         },
-        "chart_data": chart_data_query # O frontend irá tratar
+        "chart_data": chart_data
     }
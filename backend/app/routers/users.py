@@ -1,7 +1,7 @@
 # backend/app/routers/users.py
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from .. import database, models, auth, schemas
@@ -11,23 +11,26 @@ get_db = database.get_db
 
 # --- Endpoint de Leitura Rápida ---
 @router.get("/me", response_model=schemas.UserResponse, summary="Obter dados do usuário logado")
-def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
+async def read_users_me(
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
+):
     """Rota conveniente para o Frontend buscar seus próprios dados após o login."""
+    # O principal (em cache) já traz o perfil; update_user invalida o cache quando ele muda
     return current_user
 
 # --- PATCH Endpoint para VINCULAR CONDOMÍNIO (ID) ---
 @router.patch("/{user_id}", response_model=schemas.UserResponse, summary="Atualizar dados parciais do usuário")
-def update_user(
+async def update_user(
     user_id: int,
     user_update: schemas.UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
 ):
     # 1. Autorização: Apenas o próprio usuário (ou um Admin) pode se atualizar
     if current_user.id != user_id and current_user.role not in ["Programador", "Administrativo"]:
          raise HTTPException(status_code=403, detail="Permissão negada para atualizar este usuário.")
 
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.get(models.User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado.")
 
@@ -38,6 +41,9 @@ def update_user(
     for key, value in update_data.items():
         setattr(db_user, key, value)
 
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+
+    # 3. Invalida o cache de autenticação (role/condomínio podem ter mudado)
+    await auth.invalidate_user(db_user.email)
     return db_user
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
+import base64
+import json
 from typing import List, Optional
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func, case, text, or_
+from sqlalchemy import func, case, or_
 from sqlalchemy.orm import joinedload, outerjoin
 # Importa componentes internos
-from .. import database, models, auth, schemas 
+from .. import crud, database, exports, models, auth, schemas, work_order_queries
+from ..serialization import ListSerializer
 
 router = APIRouter(prefix="/work-orders", tags=["Work Orders"])
 
@@ -23,95 +26,132 @@ class WorkOrderPhotoUpdateSchema(BaseModel):
 # Dependência para o banco de dados
 get_db = database.get_db
 
+work_order_list = ListSerializer(schemas.WorkOrderResponse)
+
 ### ROTAS DE BUSCA E GESTÃO ###
 
-@router.get("/", response_model=List[schemas.WorkOrderResponse], summary="Listar Ordens de Serviço (SOLUÇÃO SQL BRUTA)")
-def list_work_orders(
+# --- PAGINAÇÃO POR CURSOR (KEYSET) ---
+# Em vez de OFFSET (que relê todas as linhas anteriores), o cursor guarda a chave de
+# ordenação da última linha da página: (status, created_at, id) ou (created_at, id).
+# Os índices compostos estão na migração 0004_work_orders_keyset_indexes.
+WORK_ORDERS_PAGE_SIZE = 100
+WORK_ORDERS_MAX_PAGE_SIZE = 500
+# Acima disso, a contagem exata fica cara: X-Total-Count passa a ser a estimativa do planner
+WORK_ORDERS_EXACT_COUNT_LIMIT = 10000
+
+def encode_cursor(row, sort_by: str) -> str:
+    key = [row.created_at.isoformat(), row.id]
+    if sort_by == "status":
+        key.insert(0, row.status)
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor: str, sort_by: str) -> dict:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort_by == "status":
+            status_value, created_at, last_id = key
+            return {"status": str(status_value), "created_at": datetime.fromisoformat(created_at), "id": int(last_id)}
+        created_at, last_id = key
+        return {"created_at": datetime.fromisoformat(created_at), "id": int(last_id)}
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+async def count_work_orders(db: AsyncSession, filters: dict):
+    """Total de OSs do filtro. Retorna (total, estimado)."""
+    stmt, params = work_order_queries.capped_count_query(filters, WORK_ORDERS_EXACT_COUNT_LIMIT + 1)
+    capped = (await db.execute(stmt, params)).scalar()
+    if capped <= WORK_ORDERS_EXACT_COUNT_LIMIT:
+        return capped, False
+    if database.IS_SQLITE:
+        return capped, True
+    return max(await work_order_queries.estimate_rows(db, filters), capped), True
+
+@router.get("/", response_model=List[schemas.WorkOrderResponse], summary="Listar Ordens de Serviço (paginação por cursor)")
+async def list_work_orders(
     condominium_id: Optional[int] = None,
     sort_by: str = "status",
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    status_filter: Optional[str] = Query(None, alias="status"),
+    provider_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(WORK_ORDERS_PAGE_SIZE, ge=1, le=WORK_ORDERS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
 ):
-    """Executa consulta SQL bruta com JOINs e filtros para garantir a listagem."""
-    
-    # Define a consulta SQL base com LEFT JOINs explícitos para carregar o nome do Condomínio
-    sql_base = """
-        SELECT 
-            wo.id, wo.title, wo.description, wo.status, wo.created_at, wo.closed_at, 
-            wo.photo_before_url, wo.photo_after_url, wo.item_id, wo.provider_id,
-            c.name AS condominium_name, c.id AS condominium_id
-        FROM public.work_orders wo
-        LEFT JOIN public.inspection_items ii ON wo.item_id = ii.id
-        LEFT JOIN public.condominiums c ON ii.condominium_id = c.id
+    """Lista uma página de OSs com filtros no banco.
+
+    A próxima página vem no header X-Next-Cursor (ausente na última página); com
+    include_total=true, o total vai em X-Total-Count (X-Total-Count-Estimated: true
+    quando é a estimativa do planner).
     """
-    
-    where_clauses = ["1=1"] # Condição base para filtros
-    
-    # 1. FILTRO DE SEGURANÇA (Para usuários não-Programadores)
+    if sort_by != "status":
+        sort_by = "created_at"
+
+    # 1. FILTRO DE SEGURANÇA (Para usuários não-Programadores) + filtros da tela.
+    # Consulta montada pelo work_order_queries: só bind parameters, SQL compilado em cache.
+    user_condo_id = None
     if current_user.role != 'Programador' and current_user.condominium_id is not None:
         user_condo_id = current_user.condominium_id
-        # A condição OR que inclui OSs manuais (NULL) e o Condomínio do usuário
-        where_clauses.append(f"""
-            (ii.condominium_id = {user_condo_id} OR wo.item_id IS NULL)
-        """)
-        
-    # 2. FILTRO POR DROPDOWN
-    if condominium_id is not None:
-        where_clauses.append(f"ii.condominium_id = {condominium_id}")
-
-    # 3. ORDENAÇÃO
-    order_clause = "wo.created_at DESC"
-    if sort_by == 'status':
-        order_clause = "wo.status, wo.created_at DESC" 
-    
-    # 4. EXECUÇÃO DO SQL BRUTO FINAL
-    sql_query = text(f"""
-        {sql_base}
-        WHERE {' AND '.join(where_clauses)}
-        ORDER BY {order_clause} 
-    """)
-
-    raw_results = db.execute(sql_query).fetchall()
-
-    # 5. MAPEAMENTO MANUAL PARA PYDANTIC/JSON
-    orders_serializable = []
-    for row in raw_results:
-        try:
-            # Mapeamento manual para Pydantic
-            orders_serializable.append(schemas.WorkOrderResponse(
-                id=row[0],
-                title=row[1],
-                description=row[2],
-                status=row[3],
-                
-                # Conversão segura de datas
-                created_at=row[4].isoformat() if row[4] else datetime.utcnow().isoformat(),
-                closed_at=row[5].isoformat() if row[5] else None, 
-                
-                photo_before_url=row[6],
-                photo_after_url=row[7],
-                item_id=row[8],
-                provider_id=row[9],
-                
-                condominium=None,
-            ).model_dump())
-        except Exception as e:
-            # Este print irá aparecer no log do Render, identificando o registro corrompido
-            print(f"DEBUG: FALHA DE SERIALIZAÇÃO NO REGISTRO ID {row[0]}. Erro: {e}")
-            # Ignoramos o registro e continuamos o loop
-            continue
-            
-    return orders_serializable
+    filters = work_order_queries.filter_params(
+        user_condo_id=user_condo_id,
+        condominium_id=condominium_id,
+        status=status_filter,
+        provider_id=provider_id,
+        created_from=created_from,
+        created_to=created_to,
+    )
+
+    # 2. TOTAL (opcional)
+    headers = {}
+    if include_total:
+        total, estimated = await count_work_orders(db, filters)
+        headers["X-Total-Count"] = str(total)
+        if estimated:
+            headers["X-Total-Count-Estimated"] = "true"
+
+    # 3. PÁGINA: uma linha a mais que o limite indica se existe próxima página
+    key = decode_cursor(cursor, sort_by) if cursor else None
+    sql_query, params = work_order_queries.list_query(filters, sort_by, limit + 1, key)
+
+    raw_results = (await db.execute(sql_query, params)).fetchall()
+    if len(raw_results) > limit:
+        raw_results = raw_results[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(raw_results[-1], sort_by)
+
+    # 4. SERIALIZAÇÃO: cada linha é validada uma única vez, direto da Row, e o JSON sai
+    # pronto (o FastAPI não revalida a lista). Registros corrompidos são ignorados e logados.
+    rows = [work_order_queries.list_item(row._mapping) for row in raw_results]
+    return work_order_list.response(rows, headers=headers, skip_invalid=True)
     
+@router.get("/export", summary="Exportar Ordens de Serviço (NDJSON/CSV em streaming)")
+async def export_work_orders(
+    format: str = "ndjson",
+    condominium_id: Optional[int] = None,
+    updated_since: Optional[datetime] = None,
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
+):
+    """Histórico completo (ou só o alterado após updated_since), enviado em lotes."""
+    scope = exports.export_condominium_id(current_user, condominium_id)
+    if current_user.role == 'Programador':
+        filters = work_order_queries.filter_params(condominium_id=scope)
+    else:
+        # Mesma visibilidade da listagem: o condomínio do usuário + OSs manuais (sem item)
+        filters = work_order_queries.filter_params(user_condo_id=scope)
+    stmt = exports.incremental(work_order_queries.export_query(filters), models.WorkOrder, updated_since)
+    return exports.export_response(stmt, format, "work_orders")
+
 @router.post("/{order_id}/close", response_model=schemas.WorkOrderResponse, summary="Concluir OS com Foto")
 async def close_wo_with_photo(
     order_id: int,
     data: WorkOrderPhotoUpdateSchema,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
 ):
     """Finaliza a OS, registrando a foto do serviço pronto."""
-    db_wo = db.query(models.WorkOrder).filter(models.WorkOrder.id == order_id).first()
+    # O SimpleCondo da resposta vem no mesmo SELECT (JOIN), sem refresh depois do commit
+    db_wo = await db.get(models.WorkOrder, order_id, options=[joinedload(models.WorkOrder.condominium)])
     if not db_wo:
         raise HTTPException(status_code=404, detail="Ordem de Serviço não encontrada")
 
@@ -121,26 +161,27 @@ async def close_wo_with_photo(
     if not db_wo.closed_at:
         db_wo.closed_at = datetime.utcnow()
         
-    db.commit()
-    db.refresh(db_wo)
+    await db.commit()
     return db_wo
 
 @router.post("/", response_model=schemas.WorkOrderResponse, status_code=201, summary="Criar Ordem de Serviço Manualmente")
 async def create_work_order(
     work_order: schemas.WorkOrderCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.UserPrincipal = Depends(auth.get_current_user)
 ):
     """Cria uma nova OS a partir de uma demanda administrativa."""
     
     db_wo = models.WorkOrder(**work_order.model_dump())
+    if db_wo.condominium_id is None:
+        db_wo.condominium_id = await crud.item_condominium_id(db, db_wo.item_id)
     
     try:
         db.add(db_wo)
-        db.commit()
-        db.refresh(db_wo)
+        await db.commit()
+        await db.refresh(db_wo, ["condominium"])
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         print(f"ERRO SQL INTEGRITY FAILED (ROLLBACK): {e.orig}") 
         raise HTTPException(
             status_code=400, 
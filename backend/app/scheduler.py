@@ -0,0 +1,336 @@
+# backend/app/scheduler.py
+#
+# Scheduler interno (substitui o cron externo chamando GET /alerts/run-scheduler).
+# - Só um worker executa os jobs: advisory lock do PostgreSQL (ou lock de arquivo no
+#   SQLite/local). Os demais ficam tentando a cada tick e assumem se o líder cair.
+# - Cada execução é dividida em shards por condomínio (condominium_id % shards),
+#   processados em paralelo, cada um na sua transação.
+# - Checkpoints: o shard grava scheduler_shards na mesma transação do trabalho; uma
+#   execução interrompida (crash, deploy) é retomada só com os shards que faltam.
+# - Métricas por job (duração, último sucesso, falhas) em /internal/metrics.
+
+import asyncio
+import os
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from . import database, models
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "30"))
+# "auto": advisory lock no PostgreSQL, arquivo no SQLite. No modo pgbouncer (transaction) o
+# lock de sessão ficaria preso a um backend qualquer do PgBouncer (dois líderes ou lock que
+# nunca é solto): a subida falha até haver SCHEDULER_DATABASE_URL (conexão direta ao
+# PostgreSQL, só para o lock) ou SCHEDULER_LOCK=file (com um volume compartilhado).
+SCHEDULER_LOCK = os.getenv("SCHEDULER_LOCK", "auto").lower()
+SCHEDULER_DATABASE_URL = os.getenv("SCHEDULER_DATABASE_URL")
+SCHEDULER_LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE", os.path.join(tempfile.gettempdir(), "condomanager-scheduler.lock"))
+SCHEDULER_LOCK_KEY = zlib.crc32(b"condomanager-scheduler") # Chave do pg_try_advisory_lock
+
+# Trabalho de um shard: (sessão, número do shard, total de shards) -> resultado (JSON)
+ShardFunc = Callable[[AsyncSession, int, int], Awaitable[dict]]
+# Junta os resultados dos shards no resultado da execução
+MergeFunc = Callable[[List[dict]], dict]
+
+
+def _merge_counts(results: List[dict]) -> dict:
+    merged = {}
+    for result in results:
+        for key, value in result.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+@dataclass
+class Job:
+    name: str
+    interval: float # Segundos entre execuções
+    run_shard: ShardFunc
+    shards: int = 1
+    merge: MergeFunc = _merge_counts
+
+
+@dataclass
+class JobMetrics:
+    runs: int = 0
+    failures: int = 0
+    last_started_at: Optional[datetime] = None
+    last_duration_ms: Optional[float] = None
+    last_success_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    last_result: dict = field(default_factory=dict)
+
+    def snapshot(self) -> dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_duration_ms": self.last_duration_ms,
+            "last_success_at": self.last_success_at.isoformat() if self.last_success_at else None,
+            "last_error": self.last_error,
+            # Listas (ex: ids marcados) saem só com o tamanho
+            "last_result": {k: len(v) if isinstance(v, list) else v for k, v in self.last_result.items()},
+        }
+
+
+# --- LOCKS (um único worker executa os jobs) ---
+
+class AdvisoryLock:
+    """pg_try_advisory_lock numa conexão dedicada: o lock vive enquanto a conexão viver.
+
+    A conexão fica em AUTOCOMMIT: a checagem periódica (SELECT 1) não deixa a sessão
+    "idle in transaction" (que o idle_in_transaction_session_timeout derrubaria, soltando
+    o lock e trocando de líder).
+    """
+
+    def __init__(self, key: int, engine: AsyncEngine):
+        self.key = key
+        self.engine = engine
+        self._conn = None
+
+    async def acquire(self) -> bool:
+        if self._conn is not None:
+            try:
+                await self._conn.execute(text("SELECT 1")) # Ainda somos o líder?
+                return True
+            except Exception:
+                await self.release()
+        conn = await self.engine.connect()
+        try:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})).scalar()
+        except Exception:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    async def release(self):
+        if self._conn is None:
+            return
+        try:
+            await self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+        except Exception:
+            pass # Conexão perdida: o servidor já liberou o lock
+        finally:
+            conn, self._conn = self._conn, None
+            await conn.close()
+
+
+class FileLock:
+    """Lock exclusivo de arquivo (flock/msvcrt), para testes locais com SQLite."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    async def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _lock_file(fd)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def release(self):
+        if self._fd is not None:
+            _unlock_file(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+
+try:
+    import fcntl
+
+    def _lock_file(fd):
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock_file(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+except ImportError: # Windows
+    import msvcrt
+
+    def _lock_file(fd):
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+    def _unlock_file(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def build_lock():
+    mode = SCHEDULER_LOCK
+    if mode == "auto":
+        mode = "file" if database.IS_SQLITE else "advisory"
+    if mode == "advisory":
+        if SCHEDULER_DATABASE_URL:
+            engine = create_async_engine(database._to_async_url(SCHEDULER_DATABASE_URL), poolclass=NullPool)
+        elif database.DB_POOL_MODE == "pgbouncer":
+            raise RuntimeError(
+                "Scheduler com DB_POOL_MODE=pgbouncer: advisory lock não funciona em modo transaction. "
+                "Defina SCHEDULER_DATABASE_URL (conexão direta) ou SCHEDULER_LOCK=file."
+            )
+        else:
+            engine = database.async_engine
+        return AdvisoryLock(SCHEDULER_LOCK_KEY, engine)
+    return FileLock(SCHEDULER_LOCK_FILE)
+
+
+# --- SCHEDULER ---
+
+class Scheduler:
+    def __init__(self, tick: float = SCHEDULER_TICK_SECONDS):
+        self.tick = tick
+        self.jobs: Dict[str, Job] = {}
+        self.metrics: Dict[str, JobMetrics] = {}
+        self.lock = None
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, job: Job):
+        self.jobs[job.name] = job
+        self.metrics.setdefault(job.name, JobMetrics())
+
+    def start(self):
+        if self._task is None and SCHEDULER_ENABLED:
+            self.lock = build_lock()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.lock is not None:
+            await self.lock.release()
+            self.is_leader = False
+
+    def run_key(self, job: Job, now: Optional[datetime] = None) -> str:
+        """Janela do intervalo (ex: interval=3600 -> uma execução por hora)."""
+        now = now or datetime.utcnow()
+        return str(int(now.timestamp() // job.interval))
+
+    async def resume_unfinished(self):
+        """Retoma as execuções que não terminaram (worker anterior caiu ou shard falhou)."""
+        async with database.AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(models.SchedulerRun.job, models.SchedulerRun.run_key).where(
+                    models.SchedulerRun.status != "done", models.SchedulerRun.job.in_(list(self.jobs))
+                ).order_by(models.SchedulerRun.started_at)
+            )).all()
+        for name, run_key in rows:
+            try:
+                await self.run_job(name, run_key=run_key)
+            except Exception as e:
+                print(f"ERRO AO RETOMAR {name} ({run_key}): {e}")
+
+    async def _loop(self):
+        while True:
+            try:
+                was_leader = self.is_leader
+                self.is_leader = await self.lock.acquire()
+                if self.is_leader and not was_leader:
+                    await self.resume_unfinished()
+                if self.is_leader:
+                    for job in list(self.jobs.values()):
+                        await self.run_job(job.name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"ERRO NO SCHEDULER: {e}")
+            await asyncio.sleep(self.tick)
+
+    async def _shards_done(self, job: Job, run_key: str) -> Optional[Dict[int, dict]]:
+        """Resultados dos shards já concluídos da execução (None se ela já terminou)."""
+        async with database.AsyncSessionLocal() as db:
+            run = await db.get(models.SchedulerRun, (job.name, run_key))
+            if run is None:
+                db.add(models.SchedulerRun(job=job.name, run_key=run_key, shards=job.shards, status="running"))
+                await db.commit()
+                return {}
+            if run.status == "done":
+                return None
+            rows = await db.execute(
+                select(models.SchedulerShard.shard, models.SchedulerShard.result).where(
+                    models.SchedulerShard.job == job.name, models.SchedulerShard.run_key == run_key
+                )
+            )
+            return {shard: result or {} for shard, result in rows}
+
+    async def _run_shard(self, job: Job, run_key: str, shard: int) -> dict:
+        async with database.AsyncSessionLocal() as db:
+            result = await job.run_shard(db, shard, job.shards)
+            # Checkpoint na mesma transação do trabalho do shard
+            db.add(models.SchedulerShard(job=job.name, run_key=run_key, shard=shard, result=result))
+            await db.commit()
+            return result
+
+    async def _finish(self, job: Job, run_key: str, status: str, duration_ms: float, error: Optional[str] = None):
+        async with database.AsyncSessionLocal() as db:
+            run = await db.get(models.SchedulerRun, (job.name, run_key))
+            if run is not None:
+                run.status = status
+                run.finished_at = datetime.utcnow()
+                run.duration_ms = duration_ms
+                run.error = error
+                await db.commit()
+
+    async def run_job(self, name: str, run_key: Optional[str] = None) -> Optional[dict]:
+        """Executa (ou retoma) a execução `run_key` do job. None se ela já estava concluída."""
+        job = self.jobs[name]
+        run_key = run_key or self.run_key(job)
+        done = await self._shards_done(job, run_key)
+        if done is None:
+            return None
+
+        metrics = self.metrics[name]
+        metrics.runs += 1
+        metrics.last_started_at = datetime.utcnow()
+        started = time.perf_counter()
+        pending = [shard for shard in range(job.shards) if shard not in done]
+        results = await asyncio.gather(
+            *(self._run_shard(job, run_key, shard) for shard in pending), return_exceptions=True
+        )
+        duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        metrics.last_duration_ms = duration_ms
+
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            # Os shards que deram certo ficam com checkpoint; o próximo tick refaz só os outros
+            metrics.failures += 1
+            metrics.last_error = str(errors[0])
+            await self._finish(job, run_key, "failed" if len(errors) == len(pending) else "running", duration_ms, str(errors[0])[:500])
+            raise errors[0]
+
+        merged = job.merge(list(done.values()) + list(results))
+        await self._finish(job, run_key, "done", duration_ms)
+        metrics.last_success_at = datetime.utcnow()
+        metrics.last_error = None
+        metrics.last_result = merged
+        return merged
+
+    def stats(self) -> dict:
+        return {
+            "enabled": SCHEDULER_ENABLED,
+            "leader": self.is_leader,
+            "jobs": {name: {"interval": job.interval, "shards": job.shards, **self.metrics[name].snapshot()}
+                     for name, job in self.jobs.items()},
+        }
+
+
+scheduler = Scheduler()
@@ -94,6 +94,7 @@ class WorkOrderCreate(BaseConfig):
     description: str
     item_id: Optional[int] = None
     provider_id: Optional[int] = None
+    condominium_id: Optional[int] = None # Se omitido, vem do item da vistoria
 
 class SimpleCondo(BaseModel):
     id: int
@@ -166,6 +167,12 @@ class MaintenanceAlertResponse(MaintenanceAlertBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+# Ocorrência do calendário: as projetadas (period_years) ainda não existem no banco
+class MaintenanceAlertOccurrence(MaintenanceAlertResponse):
+    id: Optional[int] = None
+    projected: bool = False
+    source_alert_id: Optional[int] = None # Alerta a partir do qual a ocorrência foi projetada
+
 class CondominiumBase(BaseModel):
     name: str
     cnpj: str
@@ -182,6 +189,16 @@ class CondominiumBase(BaseModel):
 class CondominiumCreate(CondominiumBase):
     pass
 
+# Alteração parcial (PATCH): só os campos enviados são gravados
+class CondominiumUpdate(BaseModel):
+    name: Optional[str] = None
+    address: Optional[str] = None
+    cleaning_company: Optional[str] = None
+    elevator_maintenance: Optional[str] = None
+    logo_url: Optional[str] = None
+    primary_color: Optional[str] = None
+    secondary_color: Optional[str] = None
+
 
 
 
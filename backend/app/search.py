@@ -0,0 +1,63 @@
+# backend/app/search.py
+#
+# Busca textual nos documentos do condomínio.
+# PostgreSQL: coluna tsvector gerada + índice GIN (stemming em português), ts_rank e ts_headline.
+# SQLite (testes locais): tabela FTS5 com bm25() e snippet().
+# Ver migração 0001_documents_full_text_search em migrations.py.
+
+import re
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import database
+
+# Os termos da pergunta são combinados com OU; o ranking coloca no topo quem casa mais termos.
+_PG_SEARCH = text("""
+    WITH q AS (
+        SELECT replace(plainto_tsquery('portuguese', :question)::text, '&', '|')::tsquery AS query
+    ),
+    top AS (
+        SELECT d.id, d.title, ts_rank(d.search_vector, q.query) AS rank
+        FROM documents d, q
+        WHERE d.condominium_id = :condominium_id AND d.search_vector @@ q.query
+        ORDER BY rank DESC
+        LIMIT :limit
+    )
+    -- ts_headline é caro (relê o texto): só roda para os documentos do topo
+    SELECT top.id, top.title, top.rank,
+           ts_headline('portuguese', d.content_text, q.query,
+                       'MaxFragments=1, MaxWords=60, MinWords=20, StartSel="", StopSel=""') AS snippet
+    FROM top JOIN documents d ON d.id = top.id, q
+    ORDER BY top.rank DESC
+""")
+
+_SQLITE_SEARCH = text("""
+    SELECT d.id, d.title, -bm25(documents_fts, 10.0, 1.0) AS rank,
+           snippet(documents_fts, 1, '', '', '', 60) AS snippet
+    FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+    WHERE documents_fts MATCH :question AND d.condominium_id = :condominium_id
+    ORDER BY rank DESC
+    LIMIT :limit
+""")
+
+
+def keywords(question: str) -> List[str]:
+    """Palavras relevantes da pergunta (ignora 'de', 'para', etc. pelo tamanho)."""
+    return [w for w in re.findall(r"\w+", question) if len(w) > 3]
+
+
+async def search_documents(db: AsyncSession, condominium_id: int, question: str, limit: int = 5) -> List[dict]:
+    """Retorna os documentos mais relevantes com um trecho (snippet) em volta dos termos."""
+    terms = keywords(question)
+    if not terms:
+        return []
+
+    if database.IS_SQLITE:
+        fts_query = " OR ".join(f'"{term}"' for term in terms)
+        result = await db.execute(_SQLITE_SEARCH, {"question": fts_query, "condominium_id": condominium_id, "limit": limit})
+    else:
+        result = await db.execute(_PG_SEARCH, {"question": " ".join(terms), "condominium_id": condominium_id, "limit": limit})
+
+    return [dict(row._mapping) for row in result]
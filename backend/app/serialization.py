@@ -0,0 +1,114 @@
+# backend/app/serialization.py
+#
+# Serialização das rotas de listagem.
+# O caminho padrão monta um modelo Pydantic por linha (ou lê os objetos ORM) e o FastAPI
+# ainda valida a lista inteira de novo contra o response_model antes de gerar o JSON.
+# Aqui cada linha é validada uma única vez, por um TypeAdapter sobre um TypedDict com os
+# mesmos campos/tipos do schema de resposta (sem instanciar um BaseModel por linha), e o
+# JSON é gerado pelo pydantic-core. A rota devolve a Response já pronta; o response_model
+# fica só para a documentação (OpenAPI).
+
+import logging
+import sys
+import typing
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+if sys.version_info >= (3, 12):
+    from typing import TypedDict
+else: # O pydantic só aceita o TypedDict do typing_extensions antes do 3.12
+    from typing_extensions import TypedDict
+
+logger = logging.getLogger(__name__)
+
+_TYPED_DICTS: Dict[type, type] = {}
+
+
+def _plain_annotation(annotation):
+    """Troca os BaseModel da anotação (inclusive dentro de Optional/List) pelos TypedDicts equivalentes."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return row_type(annotation)
+    args = typing.get_args(annotation)
+    if not args:
+        return annotation
+    plain = tuple(_plain_annotation(arg) for arg in args)
+    if plain == args:
+        return annotation
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        return typing.Union[plain]
+    return typing.get_origin(annotation)[plain] if origin in (list, dict, tuple) else annotation
+
+
+def row_type(model: Type[BaseModel]) -> type:
+    """TypedDict com os campos e tipos de `model` (criado uma vez por schema)."""
+    if model not in _TYPED_DICTS:
+        fields = {name: _plain_annotation(field.annotation) for name, field in model.model_fields.items()}
+        _TYPED_DICTS[model] = TypedDict(f"{model.__name__}Row", fields)
+    return _TYPED_DICTS[model]
+
+
+class ListSerializer:
+    """Valida e renderiza listas no formato de `model` (TypeAdapters criados uma vez, no import)."""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._defaults = {
+            name: field.get_default(call_default_factory=True)
+            for name, field in model.model_fields.items() if not field.is_required()
+        }
+        self._fields = tuple(model.model_fields)
+        self._row = TypeAdapter(row_type(model))
+        self._list = TypeAdapter(List[row_type(model)])
+
+    def from_objects(self, objects: Iterable[Any]) -> List[dict]:
+        """Dicts a partir de objetos ORM (campos ausentes no objeto recebem o default do schema)."""
+        missing = object()
+        rows = []
+        for obj in objects:
+            row = {}
+            for name in self._fields:
+                value = getattr(obj, name, missing)
+                row[name] = self._defaults.get(name) if value is missing else value
+            rows.append(row)
+        return rows
+
+    def validate(self, rows: List[Mapping], skip_invalid: bool = False) -> List[dict]:
+        """Valida todas as linhas numa única chamada ao pydantic-core.
+
+        As linhas precisam trazer todos os campos do schema (chaves extras são descartadas).
+        Com skip_invalid, linhas inválidas são descartadas (e logadas) em vez de derrubar a página.
+        """
+        try:
+            return self._list.validate_python(rows)
+        except ValidationError:
+            if not skip_invalid:
+                raise
+        items = []
+        for row in rows:
+            try:
+                items.append(self._row.validate_python(row))
+            except ValidationError as e:
+                logger.warning("Registro ignorado na serialização (%s, id %s): %s", self.model.__name__, row.get("id"), e)
+        return items
+
+    def render(self, items: List[dict]) -> bytes:
+        return self._list.dump_json(items)
+
+    def response(
+        self,
+        rows: Iterable[Any],
+        headers: Optional[Mapping[str, str]] = None,
+        skip_invalid: bool = False,
+    ) -> Response:
+        """Resposta JSON pré-renderizada (o FastAPI não revalida o que já é uma Response).
+
+        `rows` pode ter dicts (ex: montados das Rows de uma consulta) ou objetos ORM.
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        if rows and not isinstance(rows[0], Mapping):
+            rows = self.from_objects(rows)
+        body = self.render(self.validate(rows, skip_invalid=skip_invalid))
+        return Response(content=body, media_type="application/json", headers=headers)
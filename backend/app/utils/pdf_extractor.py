@@ -1,18 +1,66 @@
 from pypdf import PdfReader
 from fastapi import UploadFile
+from typing import List
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
 import io
+import multiprocessing
+import os
 
-async def extract_text_from_pdf(file: UploadFile) -> str:
+# --- EXTRAÇÃO PARALELA (fora do processo da API) ---
+# O pypdf é CPU puro (segura o GIL): cada faixa de páginas roda num processo do pool.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PDF_PAGES_PER_JOB = int(os.getenv("PDF_PAGES_PER_JOB", "25"))
+
+_pool = None
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # "spawn": não herda threads/event loop do uvicorn via fork
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def shutdown_pdf_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def count_pages(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+def extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Roda no processo do pool: lê o PDF do disco e extrai as páginas [start, stop)."""
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+async def extract_pages_parallel(path: str) -> List[str]:
+    """Extrai todas as páginas de um PDF em disco, em faixas paralelas no pool de processos."""
+    loop = asyncio.get_running_loop()
+    pool = get_pdf_pool()
+    total = await loop.run_in_executor(pool, count_pages, path)
+    ranges = [(start, min(start + PDF_PAGES_PER_JOB, total)) for start in range(0, total, PDF_PAGES_PER_JOB)]
+    parts = await asyncio.gather(*(
+        loop.run_in_executor(pool, extract_page_range, path, start, stop) for start, stop in ranges
+    ))
+    return [page for part in parts for page in part]
+
+def join_pages(pages: List[str]) -> str:
+    # Montagem com join (e não `text +=` página a página)
+    return "".join(page + "\n" for page in pages if page)
+
+async def extract_pages_from_pdf(file: UploadFile) -> List[str]:
+    """Texto de cada página (a posição na lista é o número da página - 1)."""
     content = await file.read()
     pdf_file = io.BytesIO(content)
     reader = PdfReader(pdf_file)
     
-    text = ""
-    for page in reader.pages:
-        extracted = page.extract_text()
-        if extracted:
-            text += extracted + "\n"
+    pages = [page.extract_text() or "" for page in reader.pages]
             
     # Retorna o cursor do arquivo para o início caso precise salvar no disco depois
     await file.seek(0) 
-    return text
\ No newline at end of file
+    return pages
+
+async def extract_text_from_pdf(file: UploadFile) -> str:
+    return join_pages(await extract_pages_from_pdf(file))
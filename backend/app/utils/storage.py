@@ -0,0 +1,210 @@
+import asyncio
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import BinaryIO, Iterator, List, Optional
+
+import requests
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+# --- CONFIGURAÇÃO DO STORAGE ---
+# STORAGE_BACKEND: "local" (padrão, também usado nos testes) ou "supabase"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "storage")
+STORAGE_PUBLIC_BASE_URL = os.getenv("STORAGE_PUBLIC_BASE_URL", "/storage")
+STORAGE_CHUNK_SIZE = int(os.getenv("STORAGE_CHUNK_SIZE", str(1024 * 1024))) # 1 MB por bloco
+UPLOAD_PARALLELISM = int(os.getenv("UPLOAD_PARALLELISM", "4"))
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "uploads")
+
+
+@dataclass
+class StoredFile:
+    filename: str
+    key: str
+    url: str
+    bytes: int
+    ms: float
+
+    def metrics(self) -> dict:
+        return asdict(self)
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    name = os.path.basename(filename or "") or "arquivo"
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name)
+
+
+def iter_chunks(src: BinaryIO, chunk_size: int = STORAGE_CHUNK_SIZE) -> Iterator[bytes]:
+    """Lê o arquivo em blocos: a memória usada não depende do tamanho do upload."""
+    src.seek(0)
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class StorageBackend:
+    """Interface dos backends de armazenamento de arquivos."""
+
+    def _write(self, key: str, src: BinaryIO, content_type: Optional[str]) -> int:
+        """Grava o conteúdo de src em blocos (roda numa thread) e retorna o total de bytes."""
+        raise NotImplementedError
+
+    def url_for(self, key: str) -> str:
+        raise NotImplementedError
+
+    def _delete(self, key: str):
+        """Remove o arquivo (sem erro se ele não existir)."""
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self._delete, key)
+
+    async def save(self, key: str, file: UploadFile) -> StoredFile:
+        # O UploadFile do Starlette já fica em disco (SpooledTemporaryFile) acima de 1 MB;
+        # aqui ele é copiado em blocos numa thread, sem bloquear o event loop.
+        started = time.perf_counter()
+        size = await run_in_threadpool(self._write, key, file.file, file.content_type)
+        return self._stored(file.filename or "", key, size, started)
+
+    async def save_path(self, key: str, path: str, content_type: Optional[str] = None) -> StoredFile:
+        """Mesmo que save(), mas a partir de um arquivo já gravado em disco (ex: spool)."""
+        started = time.perf_counter()
+
+        def write() -> int:
+            with open(path, "rb") as src:
+                return self._write(key, src, content_type)
+
+        size = await run_in_threadpool(write)
+        return self._stored(os.path.basename(path), key, size, started)
+
+    def _stored(self, filename: str, key: str, size: int, started: float) -> StoredFile:
+        return StoredFile(
+            filename=filename,
+            key=key,
+            url=self.url_for(key),
+            bytes=size,
+            ms=round((time.perf_counter() - started) * 1000, 3),
+        )
+
+
+class LocalStorageBackend(StorageBackend):
+    """Grava os arquivos no disco local (desenvolvimento e testes)."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def _write(self, key: str, src: BinaryIO, content_type: Optional[str]) -> int:
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.part"
+        size = 0
+        with open(tmp_path, "wb") as out:
+            for chunk in iter_chunks(src):
+                out.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, path) # Evita arquivos pela metade se o upload falhar
+        return size
+
+    def _delete(self, key: str):
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class SupabaseStorageBackend(StorageBackend):
+    """Envia os arquivos para o Supabase Storage em streaming (transfer-encoding chunked)."""
+
+    def __init__(self, url: str, service_key: str, bucket: str):
+        self.url = url.rstrip("/")
+        self.service_key = service_key
+        self.bucket = bucket
+
+    def _write(self, key: str, src: BinaryIO, content_type: Optional[str]) -> int:
+        sent = 0
+
+        def body():
+            nonlocal sent
+            for chunk in iter_chunks(src):
+                sent += len(chunk)
+                yield chunk
+
+        response = requests.post(
+            f"{self.url}/storage/v1/object/{self.bucket}/{key}",
+            data=body(),
+            headers={
+                "Authorization": f"Bearer {self.service_key}",
+                "Content-Type": content_type or "application/octet-stream",
+                "x-upsert": "true",
+            },
+            timeout=120,
+        )
+        response.raise_for_status()
+        return sent
+
+    def _delete(self, key: str):
+        response = requests.delete(
+            f"{self.url}/storage/v1/object/{self.bucket}/{key}",
+            headers={"Authorization": f"Bearer {self.service_key}"},
+            timeout=30,
+        )
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    def url_for(self, key: str) -> str:
+        return f"{self.url}/storage/v1/object/public/{self.bucket}/{key}"
+
+
+def build_storage() -> StorageBackend:
+    if STORAGE_BACKEND == "supabase":
+        return SupabaseStorageBackend(SUPABASE_URL, SUPABASE_SERVICE_KEY, SUPABASE_BUCKET)
+    return LocalStorageBackend(STORAGE_LOCAL_ROOT, STORAGE_PUBLIC_BASE_URL)
+
+
+storage = build_storage()
+
+
+async def store_uploads(files: List[UploadFile], prefix: str, parallelism: int = UPLOAD_PARALLELISM) -> List[StoredFile]:
+    """Armazena vários uploads em paralelo (no máximo `parallelism` ao mesmo tempo).
+
+    Retorna os arquivos na mesma ordem recebida.
+    """
+    semaphore = asyncio.Semaphore(parallelism)
+    batch = uuid.uuid4().hex # Evita colisão entre uploads com o mesmo nome de arquivo
+
+    async def store(index: int, file: UploadFile) -> StoredFile:
+        async with semaphore:
+            key = f"{prefix}/{batch}/{index}_{safe_filename(file.filename)}"
+            return await storage.save(key, file)
+
+    results = await asyncio.gather(*(store(i, f) for i, f in enumerate(files)), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        # Falhou algum: remove os que já foram gravados, para não sobrar arquivo sem vistoria
+        await delete_stored([r for r in results if isinstance(r, StoredFile)])
+        raise errors[0]
+    return results
+
+
+async def delete_stored(files: List[StoredFile]):
+    """Remove arquivos já armazenados (caminho de erro: a transação que os referenciava falhou)."""
+    for file in files:
+        try:
+            await storage.delete(file.key)
+        except Exception as e: # Limpeza é best effort: não mascara o erro original
+            print(f"Falha ao remover {file.key} do storage: {e}")
@@ -0,0 +1,133 @@
+# backend/app/work_order_queries.py
+#
+# Consultas da listagem de OSs (GET /work-orders/) montadas com o SQLAlchemy Core.
+# Todo valor vindo do request (condomínio, status, datas, cursor, limit) é um bind
+# parameter nomeado: existe um statement por *combinação* de filtros (montado uma vez e
+# guardado), nunca um por valor. Assim o SQLAlchemy reaproveita a compilação (compiled
+# cache do engine) e o asyncpg reaproveita o prepared statement no servidor (sem novo
+# parse/plan a cada condomínio).
+
+import json
+from functools import lru_cache
+from typing import Any, Mapping, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from . import models
+
+WorkOrder = models.WorkOrder
+
+# Filtros e ordenação só usam colunas de work_orders (condominium_id é desnormalizado):
+# a página sai de um range scan nos índices compostos, e o nome do condomínio vem por PK.
+# (montados uma única vez, na importação do módulo)
+_FROM = select(WorkOrder.id).select_from(WorkOrder)
+
+_LIST = (
+    select(
+        WorkOrder.id, WorkOrder.title, WorkOrder.description, WorkOrder.status,
+        WorkOrder.created_at, WorkOrder.closed_at, WorkOrder.photo_before_url,
+        WorkOrder.photo_after_url, WorkOrder.item_id, WorkOrder.provider_id,
+        models.Condominium.name.label("condominium_name"), WorkOrder.condominium_id,
+    )
+    .select_from(WorkOrder)
+    .outerjoin(models.Condominium, WorkOrder.condominium_id == models.Condominium.id)
+)
+# Nomes das colunas da listagem, na ordem do SELECT
+LIST_COLUMNS = tuple(_LIST.selected_columns.keys())
+
+
+def list_item(row: Mapping[str, Any]) -> dict:
+    """Linha da listagem (lida pelo nome da coluna, row._mapping) no formato de WorkOrderResponse."""
+    item = dict(row)
+    condo_id = item["condominium_id"]
+    item["condominium"] = {"id": condo_id, "name": item["condominium_name"]} if condo_id is not None else None
+    return item
+
+_ORDER_BY = {
+    "status": (WorkOrder.status, WorkOrder.created_at.desc(), WorkOrder.id.desc()),
+    "created_at": (WorkOrder.created_at.desc(), WorkOrder.id.desc()),
+}
+
+
+# Filtros suportados: nome do parâmetro -> condição com bind parameter nomeado
+_FILTERS = {
+    # Mesma regra de antes da desnormalização (ii.condominium_id = X OR wo.item_id IS NULL):
+    # OSs sem item (manuais) continuam visíveis para todos os condomínios; OS de item sem
+    # condomínio resolvido no backfill não vaza para os outros condomínios
+    "user_condo_id": or_(WorkOrder.condominium_id == bindparam("user_condo_id"), WorkOrder.item_id.is_(None)),
+    "condominium_id": WorkOrder.condominium_id == bindparam("condominium_id"),
+    "status": WorkOrder.status == bindparam("status"),
+    "provider_id": WorkOrder.provider_id == bindparam("provider_id"),
+    "created_from": WorkOrder.created_at >= bindparam("created_from"),
+    "created_to": WorkOrder.created_at < bindparam("created_to"),
+}
+
+# Linhas depois da chave do cursor, na mesma ordem do ORDER BY
+_AFTER_CREATED = or_(
+    WorkOrder.created_at < bindparam("cursor_created_at"),
+    and_(WorkOrder.created_at == bindparam("cursor_created_at"), WorkOrder.id < bindparam("cursor_id")),
+)
+_KEYSET = {
+    "status": or_(
+        WorkOrder.status > bindparam("cursor_status"),
+        and_(WorkOrder.status == bindparam("cursor_status"), _AFTER_CREATED),
+    ),
+    "created_at": _AFTER_CREATED,
+}
+
+
+def filter_params(**values) -> dict:
+    """Valores dos filtros informados (os None ficam de fora)."""
+    unknown = set(values) - set(_FILTERS)
+    if unknown:
+        raise ValueError(f"Filtros desconhecidos: {sorted(unknown)}")
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def _where(params: dict) -> list:
+    # Ordem fixa: a mesma combinação de filtros gera sempre o mesmo statement
+    return [clause for name, clause in _FILTERS.items() if name in params]
+
+
+@lru_cache(maxsize=None)
+def _list_statement(filters: frozenset, sort_by: str, keyset: bool) -> Select:
+    clauses = _where(dict.fromkeys(filters))
+    if keyset:
+        clauses.append(_KEYSET[sort_by])
+    return _LIST.where(*clauses).order_by(*_ORDER_BY[sort_by]).limit(bindparam("limit"))
+
+
+@lru_cache(maxsize=None)
+def _count_statement(filters: frozenset) -> Select:
+    return select(func.count()).select_from(_FROM.where(*_where(dict.fromkeys(filters))).limit(bindparam("cap")).subquery())
+
+
+def list_query(params: dict, sort_by: str, limit: int, key: Optional[dict] = None) -> Tuple[Select, dict]:
+    """Statement (montado uma vez por combinação de filtros) + parâmetros da página."""
+    values = dict(params, limit=limit)
+    if key is not None:
+        values.update({f"cursor_{name}": value for name, value in key.items()})
+    return _list_statement(frozenset(params), sort_by, key is not None), values
+
+
+def export_query(params: dict) -> Select:
+    """Todas as colunas de work_orders com os filtros (para exports.py, sem LIMIT)."""
+    return select(*WorkOrder.__table__.columns).where(*_where(params)).params(**params)
+
+
+def capped_count_query(params: dict, cap: int) -> Tuple[Select, dict]:
+    """count(*) de no máximo `cap` linhas: o custo não cresce com o tamanho da tabela."""
+    return _count_statement(frozenset(params)), dict(params, cap=cap)
+
+
+async def estimate_rows(db: AsyncSession, params: dict) -> int:
+    """Estimativa do planner do PostgreSQL para o filtro (sem executar a consulta)."""
+    stmt = _FROM.where(*_where(params)).params(**params)
+    # EXPLAIN não aceita bind parameters: os valores são renderizados (e escapados) pelo dialeto
+    sql = str(stmt.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}))
+    plan = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,119 @@
+"""Benchmark: relatórios financeiros por período com 1 milhão de lançamentos.
+
+Compara, no mesmo banco (500 condomínios, 5 anos, valores com centavos):
+  - antigo: objetos ORM de FinancialRecord + laço em Python somando floats por
+    (condomínio, mês), saldo acumulado e categorias;
+  - novo:   financial_reports.load_ledger (colunas direto para arrays, em lotes) +
+    Ledger.balances (mês, trimestre, ano) + Ledger.by_category, em centavos inteiros.
+
+Também mostra a diferença entre a soma em float e a soma exata em centavos.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_financial_reports
+    BENCH_ROWS=200000 python -m benchmarks.bench_financial_reports
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from sqlalchemy import select
+
+from app import database, financial_reports, models
+
+ROWS = int(os.getenv("BENCH_ROWS", "1000000"))
+CONDOMINIUMS = 500
+CATEGORIES = ["Taxa condominial", "Água", "Energia", "Folha", "Manutenção", "Seguro", None]
+
+
+def seed():
+    database.Base.metadata.create_all(bind=database.engine)
+    rng = random.Random(42)
+    first_day = date(2020, 1, 1)
+    with database.engine.begin() as conn:
+        conn.execute(models.Condominium.__table__.insert(), [
+            {"id": i, "name": f"Condomínio {i}", "cnpj": str(i)} for i in range(1, CONDOMINIUMS + 1)
+        ])
+        batch = []
+        for n in range(ROWS):
+            income = rng.random() < 0.45
+            cents = rng.randint(1_000, 2_500_000) # R$ 10,00 a R$ 25.000,00
+            batch.append({
+                "description": "bench",
+                "amount_cents": cents,
+                "amount": cents / 100,
+                "type": "Receita" if income else "Despesa",
+                "category": rng.choice(CATEGORIES),
+                "date": first_day + timedelta(days=rng.randrange(5 * 365)),
+                "condominium_id": rng.randint(1, CONDOMINIUMS),
+            })
+            if len(batch) == 50_000:
+                conn.execute(models.FinancialRecord.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(models.FinancialRecord.__table__.insert(), batch)
+
+
+async def old_report():
+    """Caminho por objeto ORM, somando floats."""
+    async with database.AsyncSessionLocal() as db:
+        records = (await db.execute(select(models.FinancialRecord))).scalars().all()
+        months, categories = {}, {}
+        for record in records:
+            key = (record.condominium_id, record.date.strftime("%Y-%m"))
+            totals = months.setdefault(key, {"income": 0.0, "expense": 0.0})
+            sign = 1 if record.type == "Receita" else -1
+            totals["income" if sign > 0 else "expense"] += record.amount
+            by_category = categories.setdefault((record.condominium_id, record.category), {"income": 0.0, "expense": 0.0})
+            by_category["income" if sign > 0 else "expense"] += record.amount
+        running, balances = {}, []
+        for (condominium_id, month), totals in sorted(months.items()):
+            balance = totals["income"] - totals["expense"]
+            running[condominium_id] = running.get(condominium_id, 0.0) + balance
+            balances.append((condominium_id, month, balance, running[condominium_id]))
+        return balances, categories
+
+
+async def new_report():
+    async with database.AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        ledger = await financial_reports.load_ledger(db)
+        loaded = time.perf_counter()
+        reports = {period: ledger.balances(period) for period in financial_reports.PERIODS}
+        categories = ledger.by_category()
+        return ledger, reports, categories, (loaded - started) * 1000, (time.perf_counter() - loaded) * 1000
+
+
+def main():
+    started = time.perf_counter()
+    seed()
+    print(f"{ROWS} lançamentos gerados em {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    old_balances, _ = asyncio.run(old_report())
+    old_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    ledger, reports, categories, load_ms, compute_ms = asyncio.run(new_report())
+    new_ms = (time.perf_counter() - started) * 1000
+
+    print(f"antigo (ORM + floats, mensal + categorias):    {old_ms:>9.0f} ms")
+    print(f"novo (arrays, mês/trimestre/ano + categorias): {new_ms:>9.0f} ms "
+          f"(leitura {load_ms:.0f} ms, cálculo {compute_ms:.0f} ms)")
+    print(f"ganho: {old_ms / new_ms:.1f}x")
+
+    exact = int(ledger.cents.sum())
+    float_total = sum(balance for _, _, balance, _ in old_balances)
+    print(f"saldo total exato: {exact / 100:.2f} | em float: {float_total!r} "
+          f"| diferença: {abs(float_total - exact / 100):.10f}")
+    print(f"linhas: mensal {len(reports['month'])}, trimestral {len(reports['quarter'])}, "
+          f"anual {len(reports['year'])}, categorias {len(categories)}")
+
+
+if __name__ == "__main__":
+    main()
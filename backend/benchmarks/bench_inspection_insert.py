@@ -0,0 +1,81 @@
+"""Benchmark: inserção de itens de vistoria um a um (flush por item) x em lote.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_inspection_insert
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_inspection_insert
+
+Sem DATABASE_URL usa um SQLite temporário. Em PostgreSQL a diferença é bem maior,
+porque cada flush é um round-trip de rede.
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from sqlalchemy import event
+
+from app import crud, database, models
+
+SIZES = (10, 100, 1000)
+
+statements = 0
+
+@event.listens_for(database.async_engine.sync_engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+def make_items(n):
+    # ~1 em cada 4 itens "ruim" gera uma OS
+    return [{"name": f"Item {i}", "status": "ruim" if i % 4 == 0 else "bom", "observation": None} for i in range(n)]
+
+
+async def per_item_path(db, inspection, items):
+    """Caminho antigo: add + flush por item, e mais um flush por OS."""
+    for item in items:
+        db_item = models.InspectionItem(inspection_id=inspection.id, name=item["name"], status=item["status"])
+        db.add(db_item)
+        await db.flush()
+        if item["status"] == "ruim":
+            await crud.create_work_order(db=db, title=f"Ação Imediata: {item['name']}", description="bench", item_id=db_item.id)
+
+
+async def bulk_path(db, inspection, items):
+    rows = [{"inspection_id": inspection.id, "condominium_id": inspection.condominium_id, **item} for item in items]
+    created = await crud.bulk_create_inspection_items(db, rows)
+    await crud.bulk_create_work_orders(db, [
+        {"title": f"Ação Imediata: {row.name}", "description": "bench", "item_id": row.id}
+        for row in created if row.status == "ruim"
+    ])
+
+
+async def run(path, n):
+    global statements
+    async with database.AsyncSessionLocal() as db:
+        inspection = models.Inspection(condominium_id=None, is_custom=False)
+        db.add(inspection)
+        await db.flush()
+        statements = 0
+        started = time.perf_counter()
+        await path(db, inspection, make_items(n))
+        await db.commit()
+        return (time.perf_counter() - started) * 1000, statements
+
+
+async def main():
+    async with database.async_engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.create_all)
+    print(f"{'itens':>6} | {'por item (ms)':>14} {'stmts':>6} | {'em lote (ms)':>13} {'stmts':>6} | {'ganho':>6}")
+    for n in SIZES:
+        old_ms, old_stmts = await run(per_item_path, n)
+        new_ms, new_stmts = await run(bulk_path, n)
+        print(f"{n:>6} | {old_ms:>14.1f} {old_stmts:>6} | {new_ms:>13.1f} {new_stmts:>6} | {old_ms / new_ms:>5.1f}x")
+    await database.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""Benchmark: tabela de rotas e criação de condomínio depois da consolidação dos routers.
+
+1. Roteamento: percorre a tabela de rotas como o Starlette (na ordem de registro, até a
+   primeira que casa com caminho e método) para uma amostra de requests, comparando:
+     - antigo: a tabela com o router de /condominiums registrado duas vezes (como quando
+       condominium.py e condominiums.py eram incluídos no main);
+     - novo:   a tabela atual do app.
+   Mostra rotas sombreadas (route_check), entradas percorridas e tempo por request.
+2. POST /condominiums/: comandos SQL por criação, antigo (refresh + nova busca pelo CNPJ
+   depois do commit) contra a rota atual.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_routing
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+
+from fastapi import FastAPI
+from sqlalchemy import event, select
+
+from app import auth, database, main, models, route_check, schemas
+from app.routers import alerts, condominiums, documents, financial, users, work_orders
+
+ROUNDS = 20_000
+
+# (método, caminho) de requests típicos do app
+REQUESTS = [
+    ("GET", "/condominiums/"),
+    ("GET", "/condominiums/1"),
+    ("GET", "/alerts/upcoming"),
+    ("GET", "/financial/dashboard-stats/1"),
+    ("POST", "/token"),
+    ("GET", "/internal/metrics"),
+]
+
+
+def legacy_app() -> FastAPI:
+    """Mesma ordem de include do main antigo, com /condominiums registrado duas vezes."""
+    app = FastAPI()
+    for router in (documents.router, financial.router, work_orders.router, condominiums.router,
+                   users.router, condominiums.router, alerts.router):
+        app.include_router(router)
+    for route in route_check._flatten(main.app.routes):
+        if getattr(route, "endpoint", None) and route.endpoint.__module__ == "app.main":
+            app.router.routes.append(route)
+    return app
+
+
+def scan(routes, method: str, path: str) -> int:
+    """Entradas testadas até achar a rota (como o Router do Starlette)."""
+    for checked, route in enumerate(routes, 1):
+        if route.path_regex.match(path) and method in route.methods:
+            return checked
+    return len(routes)
+
+
+def bench_routing(name: str, app: FastAPI):
+    routes = [r for r in route_check._flatten(app.routes) if getattr(r, "methods", None)]
+    shadowed = route_check.find_shadowed_routes(app.routes)
+    checked = sum(scan(routes, method, path) for method, path in REQUESTS)
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for method, path in REQUESTS:
+            scan(routes, method, path)
+    per_request = (time.perf_counter() - started) / (ROUNDS * len(REQUESTS)) * 1e6
+    print(f"{name:<7} rotas {len(routes):>3} | sombreadas {len(shadowed)} | "
+          f"entradas percorridas {checked:>3} | {per_request:.2f} µs/request")
+
+
+async def old_create(db, condo: schemas.CondominiumCreate):
+    if await db.scalar(select(models.Condominium).where(models.Condominium.cnpj == condo.cnpj)):
+        raise ValueError("CNPJ já registrado.")
+    db_condo = models.Condominium(**condo.model_dump())
+    db.add(db_condo)
+    await db.commit()
+    await db.refresh(db_condo)
+    return await db.scalar(select(models.Condominium).where(models.Condominium.cnpj == condo.cnpj))
+
+
+async def count_statements(create, cnpj: str) -> int:
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        async with database.AsyncSessionLocal() as db:
+            await create(db, schemas.CondominiumCreate(name="Bench", cnpj=cnpj))
+    finally:
+        event.remove(database.async_engine.sync_engine, "before_cursor_execute", listener)
+    return len(statements)
+
+
+async def new_create(db, condo: schemas.CondominiumCreate):
+    principal = auth.UserPrincipal(id=0, role="Programador", condominium_id=None)
+    return await condominiums.create_condominium(condo, db=db, current_user=principal)
+
+
+def run():
+    bench_routing("antigo", legacy_app())
+    bench_routing("novo", main.app)
+
+    database.Base.metadata.create_all(bind=database.engine)
+    old = asyncio.run(count_statements(old_create, "bench-old"))
+    new = asyncio.run(count_statements(new_create, "bench-new"))
+    print(f"POST /condominiums/: antigo {old} comandos SQL, novo {new}")
+
+
+if __name__ == "__main__":
+    run()
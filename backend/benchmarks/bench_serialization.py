@@ -0,0 +1,107 @@
+"""Benchmark: serialização da listagem de OSs (1k, 10k e 100k linhas).
+
+Compara, sem banco (as linhas já vêm prontas, como Rows do SQLAlchemy):
+  - antigo: WorkOrderResponse por linha + model_dump(), datas em ISO string, e a
+    lista validada de novo pelo response_model do FastAPI antes do JSON;
+  - novo:   serialization.ListSerializer (uma validação por linha + dump_json).
+
+Os dois caminhos passam por uma rota real do FastAPI (TestClient), então o tempo
+inclui o que o framework faz com o retorno de cada um.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_serialization
+"""
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import column, Integer, String, DateTime
+from sqlalchemy.engine import result as engine_result
+
+from app import schemas, work_order_queries
+from app.serialization import ListSerializer
+
+SIZES = (1_000, 10_000, 100_000)
+
+work_order_list = ListSerializer(schemas.WorkOrderResponse)
+
+
+def make_rows(n):
+    """Rows do SQLAlchemy com as mesmas colunas da consulta de work_order_queries."""
+    base = datetime(2024, 1, 1)
+    cols = (
+        column("id", Integer), column("title", String), column("description", String), column("status", String),
+        column("created_at", DateTime), column("closed_at", DateTime), column("photo_before_url", String),
+        column("photo_after_url", String), column("item_id", Integer), column("provider_id", Integer),
+        column("condominium_name", String), column("condominium_id", Integer),
+    )
+    data = [
+        (i, f"Ação Imediata: Item {i}", "Item avaliado como Ruim na vistoria.", "Pendente",
+         base + timedelta(minutes=i), None, None, None, i, None, "Residencial Bench", 1)
+        for i in range(n)
+    ]
+    # Monta Rows de verdade (mesmo tipo que a rota recebe do execute) sem ir ao banco
+    metadata = engine_result.SimpleResultMetaData([c.name for c in cols])
+    return [engine_result.Row(metadata, metadata._processors, metadata._key_to_index, row) for row in data]
+
+
+ROWS = {}
+
+app = FastAPI()
+
+
+@app.get("/old/{n}", response_model=List[schemas.WorkOrderResponse])
+def old_path(n: int):
+    orders_serializable = []
+    for row in ROWS[n]:
+        orders_serializable.append(schemas.WorkOrderResponse(
+            id=row[0],
+            title=row[1],
+            description=row[2],
+            status=row[3],
+            created_at=row[4].isoformat() if row[4] else datetime.utcnow().isoformat(),
+            closed_at=row[5].isoformat() if row[5] else None,
+            photo_before_url=row[6],
+            photo_after_url=row[7],
+            item_id=row[8],
+            provider_id=row[9],
+            condominium=None,
+        ).model_dump())
+    return orders_serializable
+
+
+@app.get("/new/{n}", response_model=List[schemas.WorkOrderResponse])
+def new_path(n: int):
+    keys = work_order_queries.LIST_COLUMNS
+    rows = [work_order_queries.list_item(dict(zip(keys, row))) for row in ROWS[n]]
+    return work_order_list.response(rows, skip_invalid=True)
+
+
+def timed(client, url):
+    started = time.perf_counter()
+    response = client.get(url)
+    elapsed = (time.perf_counter() - started) * 1000
+    assert response.status_code == 200, response.text
+    return elapsed, len(response.content)
+
+
+def main():
+    client = TestClient(app)
+    print(f"{'linhas':>7} | {'antigo (ms)':>11} | {'novo (ms)':>9} | {'ganho':>6} | {'bytes':>10}")
+    for n in SIZES:
+        ROWS[n] = make_rows(n)
+        timed(client, f"/old/{n}"), timed(client, f"/new/{n}") # aquecimento
+        old_ms, _ = timed(client, f"/old/{n}")
+        new_ms, size = timed(client, f"/new/{n}")
+        print(f"{n:>7} | {old_ms:>11.1f} | {new_ms:>9.1f} | {old_ms / new_ms:>5.1f}x | {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
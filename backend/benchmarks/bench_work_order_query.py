@@ -0,0 +1,112 @@
+"""Benchmark: custo de preparo por request da listagem de OSs.
+
+Compara o SQL antigo (texto montado com f-string, um texto diferente por condomínio)
+com o work_order_queries (bind parameters), alternando entre vários condomínios como
+acontece em produção. A tabela é pequena de propósito: o tempo medido é quase todo
+compilação (SQLAlchemy) + parse/plan (servidor), e não execução.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_work_order_query
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_work_order_query
+
+Sem DATABASE_URL usa um SQLite temporário. No PostgreSQL também é mostrado quantos
+prepared statements cada caminho deixou na conexão (pg_prepared_statements).
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import default
+
+from app import database, models, work_order_queries
+
+# Mais condomínios que o DB_QUERY_CACHE_SIZE padrão (500), como nas administradoras grandes
+CONDOMINIUMS = 1000
+REQUESTS = 5000
+PAGE_SIZE = 100
+
+cache_hits = 0
+
+@event.listens_for(database.async_engine.sync_engine, "before_cursor_execute")
+def _cache_hit(conn, cursor, statement, parameters, context, executemany):
+    global cache_hits
+    if context.cache_hit == default.CACHE_HIT:
+        cache_hits += 1
+
+
+def legacy_query(condominium_id: int):
+    """Como era antes: valores interpolados no texto do SQL."""
+    schema = "" if database.IS_SQLITE else "public."
+    return text(f"""
+        SELECT
+            wo.id, wo.title, wo.description, wo.status, wo.created_at, wo.closed_at,
+            wo.photo_before_url, wo.photo_after_url, wo.item_id, wo.provider_id,
+            c.name AS condominium_name, c.id AS condominium_id
+        FROM {schema}work_orders wo
+        LEFT JOIN {schema}inspection_items ii ON wo.item_id = ii.id
+        LEFT JOIN {schema}condominiums c ON ii.condominium_id = c.id
+        WHERE 1=1 AND (ii.condominium_id = {condominium_id} OR wo.item_id IS NULL)
+        ORDER BY wo.status, wo.created_at DESC
+        LIMIT {PAGE_SIZE + 1}
+    """)
+
+
+def legacy_request(condominium_id: int):
+    return legacy_query(condominium_id), {}
+
+
+def builder_request(condominium_id: int):
+    filters = work_order_queries.filter_params(user_condo_id=condominium_id)
+    return work_order_queries.list_query(filters, "status", PAGE_SIZE + 1)
+
+
+async def seed():
+    async with database.async_engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.create_all)
+    async with database.AsyncSessionLocal() as db:
+        for condo_id in range(1, CONDOMINIUMS + 1):
+            db.add(models.Condominium(id=condo_id, name=f"Condomínio {condo_id}", cnpj=f"bench-{condo_id}"))
+        await db.flush()
+        for condo_id in range(1, CONDOMINIUMS + 1):
+            item = models.InspectionItem(condominium_id=condo_id, name="Portão", status="ruim")
+            db.add(item)
+            await db.flush()
+            db.add(models.WorkOrder(title="Portão", description="bench", status="Pendente", item_id=item.id, condominium_id=condo_id))
+        await db.commit()
+
+
+async def run(build):
+    global cache_hits
+    cache_hits = 0
+    timings = []
+    async with database.async_engine.connect() as conn:
+        for i in range(REQUESTS):
+            started = time.perf_counter()
+            stmt, params = build(i % CONDOMINIUMS + 1)
+            (await conn.execute(stmt, params)).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        prepared = None
+        if not database.IS_SQLITE:
+            prepared = (await conn.execute(text("SELECT count(*) FROM pg_prepared_statements"))).scalar()
+    return statistics.median(timings), statistics.mean(timings), cache_hits, prepared
+
+
+async def main():
+    await seed()
+    print(f"{REQUESTS} requests alternando entre {CONDOMINIUMS} condomínios")
+    print(f"{'caminho':>10} | {'p50 (ms)':>9} {'média (ms)':>11} | {'cache SQLA':>10} | {'prepared':>8}")
+    for name, build in (("f-string", legacy_request), ("builder", builder_request)):
+        p50, mean, hits, prepared = await run(build)
+        prepared = "-" if prepared is None else prepared
+        print(f"{name:>10} | {p50:>9.3f} {mean:>11.3f} | {hits / REQUESTS:>9.0%} | {prepared:>8}")
+    await database.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())